@@ -48,11 +48,15 @@ class BiomedicalConcept:
         """
         self.ct_subsets.append(subset)
 
+    def to_dict(self):
+        """
+        :return: dictionary of the BC attributes included in the BC output
+        """
+        return {key: value for key, value in self.__dict__.items() if key != "ct_subsets"}
+
     def serialize_json(self):
         """
         serialize the current BC object as JSON
         :return: JSON serialization of the BC object
         """
-        bc_dict = self.__dict__
-        bc_dict.pop("ct_subsets")
-        return json.dumps(bc_dict)
+        return json.dumps(self.to_dict())
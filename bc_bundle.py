@@ -0,0 +1,231 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import json
+import gzip
+import zlib
+
+"""
+BCBundle writes many BCs to one JSON Lines (NDJSON) file, one serialized BC per line, instead of one JSON file per BC.
+Lines are buffered and written in blocks. When the bundle is compressed each block is written as its own gzip member,
+so the file is a valid gzip file and a single BC can be read by decompressing only the block that contains it. The
+index file records the block offset, the offset within the block, and the length of each BC keyed by conceptId. A BC
+added with the conceptId of a BC already in the bundle replaces it; the bundle is rewritten without the replaced BCs
+when it is closed so each conceptId has one line.
+"""
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+INDEX_FILE_EXT = ".idx.json"
+
+
+class BCBundle:
+    """
+    buffered, optionally gzip compressed, JSON Lines bundle of serialized BCs with a conceptId index
+    """
+    def __init__(self, file_name, compress=False, append=False, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        :param file_name: bundle file name
+        :param compress: write the bundle as gzip members
+        :param append: add to an existing bundle and its index instead of replacing them; the index is rebuilt from
+        the bundle if the index file is missing
+        :param block_size: number of uncompressed bytes buffered before a block is written
+        """
+        self.file_name = file_name
+        self.index_file_name = file_name + INDEX_FILE_EXT
+        self.compress = compress
+        self.block_size = block_size
+        self.index = {}                         # [block offset, offset in block, length] keyed by conceptId
+        self.replaced = 0                       # number of BCs in the bundle replaced by a BC with the same conceptId
+        if append and os.path.exists(file_name) and os.path.getsize(file_name) > 0:
+            if os.path.exists(self.index_file_name):
+                saved = read_index(file_name)
+            else:
+                saved = scan_bundle(file_name)
+                self.replaced = saved["lines"] - len(saved["bcs"])
+            if saved["compressed"] != compress:
+                raise ValueError(f"cannot append {'compressed' if compress else 'uncompressed'} BCs to the "
+                                 f"{'compressed' if saved['compressed'] else 'uncompressed'} bundle {file_name}")
+            self.index = saved["bcs"]
+        self._file = open(file_name, "ab" if append else "wb")
+        self._block_offset = self._file.tell()
+        self._buffer = []
+        self._buffer_size = 0
+
+    def add(self, concept_id, bc_json):
+        """
+        append a serialized BC to the bundle
+        :param concept_id: BC conceptId used as the index key
+        :param bc_json: BC serialized as a single line of JSON
+        """
+        line = bc_json.encode("utf-8") + b"\n"
+        if concept_id in self.index:
+            self.replaced += 1
+        if self.compress:
+            self.index[concept_id] = [self._block_offset, self._buffer_size, len(line) - 1]
+        else:
+            self.index[concept_id] = [0, self._block_offset + self._buffer_size, len(line) - 1]
+        self._buffer.append(line)
+        self._buffer_size += len(line)
+        if self._buffer_size >= self.block_size:
+            self._write_block()
+
+    def close(self):
+        """
+        write the buffered BCs and the index file; the bundle is rewritten if BCs were replaced
+        """
+        self._write_block()
+        self._file.close()
+        if self.replaced:
+            self._rewrite()
+        with open(self.index_file_name, "w", encoding="utf-8") as f:
+            json.dump({"compressed": self.compress, "bcs": self.index}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _rewrite(self):
+        """
+        rewrite the bundle with only the indexed BCs, dropping the lines of the replaced BCs
+        """
+        index = {"compressed": self.compress, "bcs": self.index}
+        temp_file_name = self.file_name + ".tmp"
+        with BCBundle(temp_file_name, self.compress, block_size=self.block_size) as bundle:
+            for concept_id, line in iter_bundle(self.file_name, index):
+                bundle.add(concept_id, line.decode("utf-8"))
+        os.replace(temp_file_name, self.file_name)
+        os.remove(bundle.index_file_name)
+        self.index = bundle.index
+        self.replaced = 0
+
+    def _write_block(self):
+        """
+        write the buffered lines as one block
+        """
+        if not self._buffer:
+            return
+        block = b"".join(self._buffer)
+        self._file.write(gzip.compress(block) if self.compress else block)
+        self._block_offset = self._file.tell()
+        self._buffer = []
+        self._buffer_size = 0
+
+
+def read_index(file_name):
+    """
+    :param file_name: bundle file name
+    :return: bundle index dictionary
+    """
+    with open(file_name + INDEX_FILE_EXT, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def scan_bundle(file_name):
+    """
+    rebuild the index of a bundle whose index file is missing by reading every BC in the bundle; a later BC with the
+    same conceptId replaces an earlier one
+    :param file_name: bundle file name
+    :return: bundle index dictionary with the number of BC lines in the bundle added as lines
+    """
+    with open(file_name, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"           # gzip member magic number
+        f.seek(0)
+        index = {"compressed": compressed, "bcs": {}, "lines": 0}
+        if not compressed:
+            offset = 0
+            for line in f:
+                index["bcs"][json.loads(line)["conceptId"]] = [0, offset, len(line) - 1]
+                index["lines"] += 1
+                offset += len(line)
+            return index
+        data = memoryview(f.read())
+    block_offset = 0
+    while block_offset < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        block = decompressor.decompress(data[block_offset:])
+        offset = 0
+        for line in block.splitlines(keepends=True):
+            index["bcs"][json.loads(line)["conceptId"]] = [block_offset, offset, len(line) - 1]
+            index["lines"] += 1
+            offset += len(line)
+        block_offset = len(data) - len(decompressor.unused_data)
+    return index
+
+
+def iter_bundle(file_name, index=None):
+    """
+    read the indexed BCs in the order they are stored in the bundle
+    :param file_name: bundle file name
+    :param index: bundle index dictionary (read from the index file if not provided)
+    :return: generator of (conceptId, serialized BC bytes) tuples
+    """
+    index = index if index else read_index(file_name)
+    block_offset, block = None, b""
+    with open(file_name, "rb") as f:
+        for concept_id, (bc_block_offset, offset, length) in sorted(index["bcs"].items(), key=lambda bc: bc[1]):
+            if not index["compressed"]:
+                f.seek(offset)
+                yield concept_id, f.read(length)
+                continue
+            if bc_block_offset != block_offset:
+                f.seek(bc_block_offset)
+                block_offset, block = bc_block_offset, _read_block(f)
+            yield concept_id, block[offset:offset + length]
+
+
+def _read_block(f):
+    """
+    :param f: bundle file positioned at the start of a gzip member
+    :return: the decompressed gzip member
+    """
+    decompressor = zlib.decompressobj(wbits=31)     # gzip member header and trailer
+    data = b""
+    while not decompressor.eof:
+        chunk = f.read(1 << 16)
+        if not chunk:
+            break
+        data += decompressor.decompress(chunk)
+    return data
+
+
+def read_bc(file_name, concept_id, index=None):
+    """
+    read one serialized BC from a bundle without reading the rest of the bundle
+    :param file_name: bundle file name
+    :param concept_id: BC conceptId
+    :param index: bundle index dictionary (read from the index file if not provided)
+    :return: the BC as a dictionary or None if the conceptId is not in the bundle
+    """
+    index = index if index else read_index(file_name)
+    if concept_id not in index["bcs"]:
+        return None
+    block_offset, offset, length = index["bcs"][concept_id]
+    with open(file_name, "rb") as f:
+        f.seek(block_offset if index["compressed"] else offset)
+        if not index["compressed"]:
+            return json.loads(f.read(length))
+        decompressor = zlib.decompressobj(wbits=31)     # gzip member header and trailer
+        data = b""
+        while len(data) < offset + length and not decompressor.eof:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                break
+            data += decompressor.decompress(chunk)
+        return json.loads(data[offset:offset + length])
@@ -18,6 +18,18 @@ SOFTWARE.
 import bc
 import os
 
+# BC role handler names used in the bc_roles config setting and the BCFactory methods that implement them
+ROLE_HANDLERS = {
+    "units": "_set_units",
+    "result": "_set_result",
+    "test_code": "_set_test_code",
+    "qualifier": "_set_qualifier",
+    "test_name": "_set_test_name",
+    "loinc_code": "_set_loinc_code",
+    "timing": "_set_timing"
+}
+
+
 class BCFactory:
     """ BCFactory creates a BC object using metadata extracted from the CMAP graph"""
     def __init__(self, cmap, config):
@@ -32,14 +44,19 @@ class BCFactory:
         self._node_types = {}
         self._qualifiers = []
         self._get_node_types()
+        self._role_handlers = self._get_role_handlers()
 
-    def save_bc(self, bc):
+    def save_bc(self, bc, bundle=None):
         """
-        serializes a BC object as JSON and writes it to a file
+        serializes a BC object as JSON and writes it to a file, or appends it to a bundle of BCs
         :param bc: a BC object
+        :param bundle: BCBundle the BC is appended to instead of writing a file for the BC
         """
         json_bc = bc.serialize_json()
-        file_name = os.path.join(self.cfg.data_path_dir, bc.designation.replace(" ", "_") + ".json")
+        if bundle is not None:
+            bundle.add(bc.conceptId, json_bc)
+            return
+        file_name = os.path.join(self.cfg.output_path_dir, bc.designation.replace(" ", "_") + ".json")
         with open(file_name, "w", encoding="utf-8") as fo:
             fo.write(json_bc)
 
@@ -50,7 +67,7 @@ class BCFactory:
         """
         for node_name, vertex in self.cmap.vertexes.items():
             if vertex.is_root:
-                self._set_name_c_code(vertex.label)
+                self._set_name_c_code(vertex)
             elif vertex.type == self._node_types["dec"]:
                 self._set_dec_attributes(vertex)
             # TODO process other vertext types as needed
@@ -59,32 +76,21 @@ class BCFactory:
 
     def _set_dec_attributes(self, vertex):
         """
-        for data element concept (DEC) typed nodes set the BC attributes based on the role
+        for data element concept (DEC) typed nodes set the BC attributes using the handler configured for the role
         :param vertex: node object from the graph created using the CMAP
         """
-        try:
-            # TODO fix hard coded roles
-            if vertex.role.lower() == "qualifier.variable.units":
-                self._set_units(vertex)
-            elif vertex.role.lower() == "qualifier.result":
-                self._set_result(vertex)
-            elif vertex.role.lower() == "topic.test_code":
-                self._set_test_code(vertex)
-            elif vertex.role.lower() == "topic":
-                self._set_qualifier(vertex)
-            elif vertex.role.lower() == "qualifier.synonym.name":
-                self._set_test_name(vertex)
-            elif vertex.role.lower() == "qualifier.synonym.loinc":
-                self._set_loinc_code(vertex)
-            elif vertex.role.lower() == "qualifier.record" or vertex.role.lower() == "qualifier.variable" or \
-                vertex.role.lower() == "qualifier.grouping":
-                self._set_qualifier(vertex)
-            elif vertex.role.lower() == "timing":
-                self._set_timing(vertex)
-            else:
-                print(f"not processing role: {vertex.role}")
-        except AttributeError:
+        role = getattr(vertex, "role", None)
+        if role is None:
             print(f"Concept {vertex.label} is missing the role attribute")
+            return
+        handler = self._role_handlers.get(role.strip().lower())
+        if handler is None:
+            print(f"not processing role: {role}")
+            return
+        try:
+            handler(vertex)
+        except AttributeError as e:
+            print(f"Concept {vertex.label} with role {role} is missing an attribute: {e}")
 
     def _set_timing(self, vertex):
         """
@@ -95,7 +101,7 @@ class BCFactory:
             if node[0].type == "Conceptual Domain":
                 qualifier = {}
                 self.kwargs["format"] = node[0].label.strip()
-                dec_concept, dec_name = self._concept_id_name_from_label(vertex.label)
+                dec_concept, dec_name = self._concept_id_name(vertex)
                 qualifier[dec_concept] = {"decName": dec_name, "decConceptId": dec_concept,
                                     "conceptualDomainType": "described",
                                     "conceptualDomainName": self.kwargs["format"],
@@ -111,7 +117,7 @@ class BCFactory:
         for node in vertex.target:
             qualifier = {}
             if node[0].type == "Conceptual Domain":
-                dec_concept, dec_name = self._concept_id_name_from_label(vertex.label)
+                dec_concept, dec_name = self._concept_id_name(vertex)
                 if node[0].ct_subset:
                     qualifier[dec_concept] = self._set_qualifier_subset(node[0].ct_subset, vertex, dec_concept, dec_name)
                 else:
@@ -154,9 +160,9 @@ class BCFactory:
         for node in vertex.target:
             qualifier = {}
             if node[0].type == "Conceptual Domain":
-                self.kwargs["test_cd"] = node[0].label.split("(")[0].strip()
-                self.kwargs["test_c_code"] = node[0].label.split("(")[1].strip()[:-1]
-                dec_concept, dec_name = self._concept_id_name_from_label(vertex.label)
+                self.kwargs["test_cd"] = node[0].concept_name
+                self.kwargs["test_c_code"] = node[0].c_code
+                dec_concept, dec_name = self._concept_id_name(vertex)
                 qualifier[dec_concept] = {"decName": dec_name, "decConceptId": dec_concept,
                                     "conceptualDomainType": "enumerated",
                                     "conceptualDomainName": self.kwargs["test_cd"],
@@ -174,9 +180,9 @@ class BCFactory:
         for node in vertex.target:
             if node[0].type == "Conceptual Domain":
                 qualifier = {}
-                self.kwargs["test_name"] = node[0].label.split("(")[0].strip()
-                test_name_c_code = node[0].label.split("(")[1].strip()[:-1]
-                dec_concept, dec_name = self._concept_id_name_from_label(vertex.label)
+                self.kwargs["test_name"] = node[0].concept_name
+                test_name_c_code = node[0].c_code
+                dec_concept, dec_name = self._concept_id_name(vertex)
                 terms = self._set_qualifier_terms(node[0].ct_subset.terms)
                 qualifier[dec_concept] = {"decName": dec_name, "decConceptId": dec_concept,
                                     "conceptualDomainType": "enumerated",
@@ -196,7 +202,7 @@ class BCFactory:
             if node[0].type == "Conceptual Domain":
                 qualifier = {}
                 self.kwargs["loinc"] = node[0].label.strip()
-                dec_concept, dec_name = self._concept_id_name_from_label(vertex.label)
+                dec_concept, dec_name = self._concept_id_name(vertex)
                 qualifier[dec_concept] = {"decName": dec_name, "decConceptId": dec_concept,
                                     "conceptualDomainType": "described",
                                     "conceptualDomainName": self.kwargs["loinc"],
@@ -213,7 +219,7 @@ class BCFactory:
             if node[0].type == "Conceptual Domain":
                 qualifier = {}
                 self.kwargs["result_type"] = node[0].label
-                dec_concept, dec_name = self._concept_id_name_from_label(vertex.label)
+                dec_concept, dec_name = self._concept_id_name(vertex)
                 qualifier[dec_concept] = {"decName": dec_name, "decConceptId": dec_concept,
                                     "conceptualDomainType": "described",
                                     "conceptualDomainName": self.kwargs["result_type"],
@@ -230,7 +236,7 @@ class BCFactory:
             if node[0].type == "Conceptual Domain":
                 qualifier = {}
                 unit_list = self._set_unit_list(node[0].ct_subset)
-                dec_concept, dec_name = self._concept_id_name_from_label(vertex.label)
+                dec_concept, dec_name = self._concept_id_name(vertex)
                 qualifier[dec_concept] = {"decName": dec_name, "decConceptId": dec_concept,
                                     "conceptualDomainType": "enumerated",
                                      "conceptualDomainName": node[0].ct_subset.name,
@@ -255,6 +261,18 @@ class BCFactory:
         self.kwargs["unit_list"] = unit_list
         return unit_list
 
+    def _get_role_handlers(self):
+        """
+        map the DEC roles in the bc_roles config setting to the methods that set the BC attributes for each role
+        :return: dictionary of bound methods keyed by lower case DEC role
+        """
+        role_handlers = {}
+        for role, handler_name in self.cfg.bc_roles.items():
+            if handler_name not in ROLE_HANDLERS:
+                raise ValueError(f"unknown BC role handler {handler_name} for role {role} in the configuration file")
+            role_handlers[role] = getattr(self, ROLE_HANDLERS[handler_name])
+        return role_handlers
+
     def _get_node_types(self):
         """
         loads the types of nodes that may be included in the graph generated from the CMAP
@@ -262,19 +280,19 @@ class BCFactory:
         for type in self.cfg.node_types:
             self._node_types[type.name] = type.label
 
-    def _set_name_c_code(self, label):
+    def _set_name_c_code(self, vertex):
         """
         uses the observation concept, or root node, label from the CMAP graph to set the BC name, label, and c-code
-        :param label: label from the root node, the observation concept node, in the CMAP
+        :param vertex: the root node, the observation concept node, in the CMAP
         """
-        self.kwargs["c_code"] = label.split("(")[1].strip()[:-1]
-        self.kwargs["name"] = label.split("(")[0].strip().replace(" ", "_").lower()
-        self.kwargs["label"] = label.split("(")[0].strip()
+        self.kwargs["c_code"] = vertex.c_code
+        self.kwargs["name"] = vertex.concept_name.replace(" ", "_").lower()
+        self.kwargs["label"] = vertex.concept_name
 
-    def _concept_id_name_from_label(self, label):
+    def _concept_id_name(self, vertex):
         """
         returns c_code and name as tuple
-        :param label: str - cmap node label
+        :param vertex: cmap node with the name and c-code parsed from its label
         :return: tuple - c_code and name
         """
-        return (label.split("(")[1].strip()[:-1], label.split("(")[0].strip().replace(" ", "_").lower())
+        return vertex.c_code, vertex.concept_name.replace(" ", "_").lower()
@@ -0,0 +1,116 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import json
+import glob
+import pickle
+import hashlib
+
+CACHE_VERSION = "5"                 # change when the cached graph format changes to invalidate existing entries
+DEFAULT_MAX_ENTRIES = 1000
+CACHE_FILE_EXT = ".cmap.pickle"
+
+
+class CmapCache:
+    """
+    on-disk cache of loaded CxlCmap graphs keyed by a hash of the CXL file content and the configuration settings;
+    the least recently used entries are removed when the cache holds more than max_entries graphs
+    """
+    def __init__(self, cache_dir, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        :param cache_dir: directory the cached graphs are saved in
+        :param max_entries: maximum number of cached graphs
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, config, cxl=None):
+        """
+        create the cache key from the CXL file content and the effective configuration
+        :param config: configuration object with config parameters
+        :param cxl: content of the CXL file as bytes if it has already been read
+        :return: hex digest string
+        """
+        key = hashlib.sha256(CACHE_VERSION.encode("utf-8"))
+        key.update(json.dumps(config.config, sort_keys=True).encode("utf-8"))
+        if cxl is not None:
+            key.update(cxl)
+            return key.hexdigest()
+        with open(config.data_file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                key.update(block)
+        return key.hexdigest()
+
+    def get(self, key, config):
+        """
+        return the cached graph for a key; the graph is attached to the given configuration
+        :param key: cache key created by get_key
+        :param config: configuration object with config parameters
+        :return: CxlCmap graph or None if the graph is not in the cache
+        """
+        file_name = self._get_file_name(key)
+        try:
+            with open(file_name, "rb") as f:
+                cmap = pickle.load(f)
+            os.utime(file_name)             # mark the entry as recently used
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self._remove(file_name)         # unreadable entries are treated as a cache miss
+            return None
+        cmap.config = config
+        cmap.cxl_file = config.data_file
+        return cmap
+
+    def put(self, key, cmap):
+        """
+        add a loaded graph to the cache and remove the least recently used entries
+        :param key: cache key created by get_key
+        :param cmap: loaded CxlCmap graph
+        """
+        file_name = self._get_file_name(key)
+        temp_file_name = f"{file_name}.{os.getpid()}.tmp"
+        with open(temp_file_name, "wb") as f:
+            pickle.dump(cmap, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file_name, file_name)
+        self._evict()
+
+    def _evict(self):
+        """
+        remove the least recently used entries when the cache holds more than max_entries graphs
+        """
+        entries = []
+        for file_name in glob.glob(os.path.join(self.cache_dir, "*" + CACHE_FILE_EXT)):
+            try:
+                entries.append((os.path.getmtime(file_name), file_name))
+            except OSError:
+                pass                        # removed by another process
+        entries.sort()
+        for mtime, file_name in entries[:max(len(entries) - self.max_entries, 0)]:
+            self._remove(file_name)
+
+    def _get_file_name(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_FILE_EXT)
+
+    @staticmethod
+    def _remove(file_name):
+        try:
+            os.remove(file_name)
+        except OSError:
+            pass
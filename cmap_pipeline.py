@@ -0,0 +1,216 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import configuration as CFG
+import cxl_cmap as CMAP
+import cxl_load as LOAD
+import cxl_batch as BATCH
+import graph_analysis as GA
+
+"""
+CmapPipeline processes a corpus of CXL files as three asyncio stages connected by bounded queues:
+- read: load the bytes of each CXL file in a thread
+- parse: build the graph from the CXL bytes in a pool of worker processes
+- write: create the outputs of each graph, each output in its own thread
+Reading the next files and writing the outputs of earlier files overlap with parsing. A stage waits when the queue to
+the next stage is full, so the number of CXL files and graphs held in memory is limited by the queue sizes and stage
+concurrency, not by the number of files in the corpus.
+"""
+
+DEFAULT_READERS = 2
+DEFAULT_WRITERS = 2
+DEFAULT_QUEUE_SIZE = 16
+
+def read_cxl(cxl_file):
+    """
+    :param cxl_file: CXL file name
+    :return: content of the CXL file as bytes
+    """
+    with open(cxl_file, "rb") as f:
+        return f.read()
+
+
+def parse_cxl(job, cxl, streaming=False, compact=False, ct_store=None, cache=None):
+    """
+    build the graph for a CXL file in a worker process; the configuration and the connection and appearance indexes,
+    which are only used while the graph is built, are removed before the graph is returned to the main process
+    :param job: BatchJob named tuple
+    :param cxl: content of the CXL file as bytes
+    :param streaming: parse the CXL incrementally
+    :param compact: return the graph as a CompactGraph
+    :param ct_store: CTStore the c-codes are validated against
+    :param cache: CmapCache used to skip parsing CXL files that have not changed
+    :return: the graph created from the CXL
+    """
+    config = BATCH.get_worker_config().for_cmap(job.concept_name, job.cxl_file, job.output_path)
+    cmap = None
+    if cache:
+        cache_key = cache.get_key(config, cxl)
+        cmap = cache.get(cache_key, config)
+    if cmap is None:
+        cmap = CMAP.CxlCmap(config, io.BytesIO(cxl))
+        if streaming:
+            cmap.load_streaming()
+        else:
+            cmap.load()
+        if cache:
+            cache.put(cache_key, cmap)
+    cmap.cxl_file = job.cxl_file
+    cmap.connection, cmap.connection_from, cmap.connection_to, cmap.appearances = {}, {}, {}, {}
+    if compact:
+        import compact_graph as CG
+        cmap = CG.CompactGraph(cmap)
+    if ct_store:
+        import ct_store as CTS
+        CTS.validate_cmap(ct_store, cmap)
+    GA.analyze_cmap(cmap)
+    cmap.config = None
+    return cmap
+
+
+class CmapPipeline:
+    """
+    read, parse and write a corpus of CXL files with independently sized stages
+    """
+    def __init__(self, cfg_path, outputs=None, load_options=None, readers=DEFAULT_READERS, parsers=None,
+                 writers=DEFAULT_WRITERS, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        :param cfg_path: directory containing the configuration file
+        :param outputs: list of cxl_load.OUTPUT_WRITERS names to create for each CMAP (default all)
+        :param load_options: dictionary with the streaming, compact, cache and ct_store cxl_load.load_cmap options
+        :param readers: number of CXL files read at the same time
+        :param parsers: number of worker processes parsing CXL files (defaults to the number of CPUs)
+        :param writers: number of graphs whose outputs are written at the same time
+        :param queue_size: maximum number of items waiting in each queue between stages
+        """
+        self.cfg_path = cfg_path
+        self.outputs = outputs if outputs else list(LOAD.OUTPUT_WRITERS)
+        load_options = load_options if load_options else {}
+        self.streaming = load_options.get("streaming", False)
+        self.compact = load_options.get("compact", False)
+        self.ct_store = load_options.get("ct_store")
+        self.cache = load_options.get("cache")
+        self.readers = readers
+        self.parsers = parsers if parsers else os.cpu_count()
+        self.writers = writers
+        self.queue_size = queue_size
+        self.config = None
+        self.results = []
+
+    def run(self, jobs):
+        """
+        process the CXL files and report the status of each file as it completes
+        :param jobs: list of cxl_batch.BatchJob named tuples
+        :return: list of cxl_batch.BatchResult named tuples
+        """
+        start = time.perf_counter()
+        self.results = []
+        asyncio.run(self._run(jobs))
+        BATCH.print_summary(self.results, start)
+        return self.results
+
+    async def _run(self, jobs):
+        self.config = CFG.Configuration(None, "", path=self.cfg_path)
+        parse_queue = asyncio.Queue(self.queue_size)
+        write_queue = asyncio.Queue(self.queue_size)
+        job_iterator = iter(jobs)
+        with ProcessPoolExecutor(self.parsers, initializer=BATCH.init_worker, initargs=(self.cfg_path,)) as process_pool, \
+                ThreadPoolExecutor(self.readers + self.writers * len(self.outputs)) as thread_pool:
+            readers = [asyncio.create_task(self._read(job_iterator, parse_queue, thread_pool))
+                       for n in range(self.readers)]
+            parsers = [asyncio.create_task(self._parse(parse_queue, write_queue, process_pool))
+                       for n in range(self.parsers)]
+            writers = [asyncio.create_task(self._write(write_queue, thread_pool)) for n in range(self.writers)]
+            await asyncio.gather(*readers)
+            for n in range(self.parsers):
+                await parse_queue.put(None)             # one end marker for each parser
+            await asyncio.gather(*parsers)
+            for n in range(self.writers):
+                await write_queue.put(None)
+            await asyncio.gather(*writers)
+
+    async def _read(self, job_iterator, parse_queue, thread_pool):
+        """
+        read stage: the readers share the job iterator so each job is read once
+        """
+        loop = asyncio.get_running_loop()
+        for job in job_iterator:
+            start = time.perf_counter()
+            try:
+                cxl = await loop.run_in_executor(thread_pool, read_cxl, job.cxl_file)
+            except OSError as e:
+                self._add_result(job, start, f"{type(e).__name__}: {e}")
+                continue
+            await parse_queue.put((job, start, cxl))
+
+    async def _parse(self, parse_queue, write_queue, process_pool):
+        """
+        parse stage: build each graph in a worker process and attach the main process configuration to it
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await parse_queue.get()
+            if item is None:
+                return
+            job, start, cxl = item
+            try:
+                cmap = await loop.run_in_executor(process_pool, parse_cxl, job, cxl, self.streaming, self.compact,
+                                                  self.ct_store, self.cache)
+            except Exception as e:
+                self._add_result(job, start, f"{type(e).__name__}: {e}")
+                continue
+            cmap.config = self.config.for_cmap(job.concept_name, job.cxl_file, job.output_path)
+            await write_queue.put((job, start, cmap))
+
+    async def _write(self, write_queue, thread_pool):
+        """
+        write stage: create the outputs of a graph concurrently
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                return
+            job, start, cmap = item
+            try:
+                os.makedirs(job.output_path, exist_ok=True)
+            except OSError as e:
+                self._add_result(job, start, f"{type(e).__name__}: {e}")
+                continue
+            output_results = await asyncio.gather(*[
+                loop.run_in_executor(thread_pool, LOAD.create_output, output, cmap, cmap.config)
+                for output in self.outputs])
+            errors = [f"{result.output} {result.error}" for result in output_results if result.error]
+            self._add_result(job, start, "; ".join(errors) if errors else None, cmap.diagnostics)
+
+    def _add_result(self, job, start, error, diagnostics=None):
+        """
+        record and print the status and diagnostics of a CXL file
+        :param job: BatchJob named tuple
+        :param start: time the CXL file was started
+        :param error: error message or None if all the outputs were created
+        :param diagnostics: list of the graph's diagnostics, including the CT store validation diagnostics
+        """
+        result = BATCH.BatchResult(job.cxl_file, "FAILED" if error else "OK", time.perf_counter() - start, error,
+                                   diagnostics=list(diagnostics) if diagnostics else None)
+        self.results.append(result)
+        BATCH.print_result(result)
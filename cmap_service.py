@@ -0,0 +1,293 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import io
+import os
+import sys
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import xml.etree.ElementTree as ET
+import cxl_batch as BATCH
+import cxl_cmap as CMAP
+import cxl_report as REP
+import graphml_writer as GML
+import graph_analysis as GA
+import bc_factory as BCF
+
+"""
+cmap_service runs cxl_load as a local HTTP service so CMAPs can be processed without starting a new program for each
+one. The configuration, including the compiled node type rules, is loaded once in each worker process and reused for
+every request. Requests are processed in a pool of worker processes; when all the workers are busy and the queue of
+waiting requests is full the service responds with 503 so clients can retry later. If a worker process dies the
+request it was processing fails with 500 and the pool is replaced so later requests are processed.
+Endpoints:
+POST /cmap?concept_name=<root concept name>[&outputs=bc,report,graphml] with the CXL export as the request body
+GET /metrics for the request counts and latency percentiles
+GET /health
+Example:
+python cxl_load.py --serve 8360 -d "c:\\cmaps\\cxl\\data"
+curl --data-binary @VS-SYSBP-Metamodel3.cxl "http://localhost:8360/cmap?concept_name=Systolic%20Blood%20Pressure"
+"""
+
+SERVICE_OUTPUTS = ("bc", "report", "graphml")
+DEFAULT_PORT = 8360
+DEFAULT_QUEUE_SIZE = 16
+MAX_CXL_BYTES = 64 * 1024 * 1024
+LATENCY_SAMPLES = 10000                 # number of recent request latencies kept for the percentiles
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+def process_cxl(cxl, concept_name, outputs=SERVICE_OUTPUTS):
+    """
+    load a CXL export held in memory and create the requested outputs
+    :param cxl: CXL export as bytes
+    :param concept_name: name of the root concept of the CMAP
+    :param outputs: names of the SERVICE_OUTPUTS to create
+    :return: dictionary of the outputs keyed by output name
+    """
+    config = BATCH.get_worker_config().for_cmap(concept_name, "")
+    cmap = CMAP.CxlCmap(config, io.BytesIO(cxl))
+    cmap.load()
+    GA.analyze_cmap(cmap)
+    response = {"diagnostics": [diagnostic._asdict() for diagnostic in cmap.diagnostics]}
+    if "bc" in outputs:
+        response["bc"] = BCF.BCFactory(cmap, config).create_bc().to_dict()
+    if "report" in outputs:
+        report = REP.CxlReport(cmap, config)
+        node_headers, edge_headers = config.report_headers("nodes"), config.report_headers("edges")
+        response["report"] = {"nodes": [dict(zip(node_headers, row)) for row in report.node_rows()],
+                              "edges": [dict(zip(edge_headers, row)) for row in report.edge_rows()]}
+    if "graphml" in outputs:
+        response["graphml"] = GML.GraphMLWriter(cmap).to_string()
+    return response
+
+
+class ServiceMetrics:
+    """
+    thread safe request counts and latencies
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "client_errors": 0, "server_errors": 0, "rejected": 0}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.start = time.time()
+
+    def record(self, status, seconds):
+        """
+        :param status: HTTP status code of the response
+        :param seconds: time taken to respond to the request
+        """
+        with self.lock:
+            self.counts["requests"] += 1
+            if status == 503:
+                self.counts["rejected"] += 1
+            elif status >= 500:
+                self.counts["server_errors"] += 1
+            elif status >= 400:
+                self.counts["client_errors"] += 1
+            else:
+                self.counts["ok"] += 1
+                self.latencies.append(seconds)
+
+    def get_metrics(self, in_flight):
+        """
+        :param in_flight: number of requests being processed or waiting for a worker
+        :return: dictionary of the request counts and the latency percentiles of recent successful requests
+        """
+        with self.lock:
+            latencies = sorted(self.latencies)
+            metrics = dict(self.counts)
+        metrics["in_flight"] = in_flight
+        metrics["uptime_seconds"] = time.time() - self.start
+        metrics["latency_seconds"] = {f"p{p}": get_percentile(latencies, p) for p in LATENCY_PERCENTILES}
+        metrics["latency_seconds"]["max"] = latencies[-1] if latencies else None
+        return metrics
+
+
+def get_percentile(values, percentile):
+    """
+    :param values: sorted list of values
+    :param percentile: percentile from 0 to 100
+    :return: the nearest-rank percentile of the values or None if there are no values
+    """
+    if not values:
+        return None
+    rank = max(1, -(-percentile * len(values) // 100))
+    return values[rank - 1]
+
+
+def _shutdown(executor, wait=True):
+    """
+    shut down a worker pool, cancelling the requests still waiting for a worker where Python supports it (3.9+)
+    :param executor: ProcessPoolExecutor
+    :param wait: wait for the running requests to finish
+    """
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=wait, cancel_futures=True)
+    else:
+        executor.shutdown(wait=wait)
+
+
+class CmapService(ThreadingHTTPServer):
+    """
+    HTTP server that hands the CXL exports it receives to a pool of worker processes
+    """
+    daemon_threads = True
+
+    def __init__(self, address, cfg_path, workers=None, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        :param address: (host, port) tuple to listen on
+        :param cfg_path: directory containing the configuration file
+        :param workers: number of worker processes (defaults to the number of CPUs)
+        :param queue_size: number of requests that can wait for a worker before requests are rejected
+        """
+        super().__init__(address, CmapRequestHandler)
+        workers = workers if workers else os.cpu_count()
+        self.cfg_path = cfg_path
+        self.workers = workers
+        self.executor = self._create_executor()
+        self.capacity = workers + queue_size
+        self.in_flight = 0                  # requests being processed or waiting for a worker
+        self.metrics = ServiceMetrics()
+        self._lock = threading.Lock()
+
+    def acquire_slot(self):
+        """
+        :return: True if the request can be queued for a worker, False if the workers and queue are full
+        """
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release_slot(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=BATCH.init_worker,
+                                   initargs=(self.cfg_path,))
+
+    def replace_executor(self, broken_executor):
+        """
+        replace a pool that is broken because a worker process died; requests that see the same broken pool replace
+        it once
+        :param broken_executor: the ProcessPoolExecutor that raised BrokenProcessPool
+        """
+        with self._lock:
+            if self.executor is not broken_executor:
+                return
+            self.executor = self._create_executor()
+        _shutdown(broken_executor, wait=False)
+
+    def server_close(self):
+        super().server_close()
+        _shutdown(self.executor)
+
+
+class CmapRequestHandler(BaseHTTPRequestHandler):
+    """
+    handle the cmap, metrics and health requests
+    """
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            self._send_json(200, self.server.metrics.get_metrics(self.server.in_flight))
+        elif path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"unknown path {path}"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        status, body = self._process_cmap()
+        self._send_json(status, body)
+        self.server.metrics.record(status, time.perf_counter() - start)
+
+    def _process_cmap(self):
+        """
+        :return: tuple of the HTTP status code and the response dictionary
+        """
+        url = urlparse(self.path)
+        if url.path != "/cmap":
+            return 404, {"error": f"unknown path {url.path}"}
+        query = parse_qs(url.query)
+        concept_name = query.get("concept_name", [None])[0]
+        outputs = [o for o in ",".join(query.get("outputs", SERVICE_OUTPUTS)).split(",") if o]
+        if not concept_name:
+            return 400, {"error": "the concept_name query parameter is required"}
+        if set(outputs) - set(SERVICE_OUTPUTS):
+            return 400, {"error": f"outputs must be a comma separated list of {', '.join(SERVICE_OUTPUTS)}"}
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            return 400, {"error": "the Content-Length header must be a number"}
+        if length <= 0:
+            return 400, {"error": "the request body must contain the CXL export"}
+        if length > MAX_CXL_BYTES:
+            return 413, {"error": f"the CXL export is larger than {MAX_CXL_BYTES} bytes"}
+        cxl = self.rfile.read(length)
+        if not self.server.acquire_slot():
+            return 503, {"error": "all workers are busy, retry later"}
+        executor = self.server.executor
+        try:
+            return 200, executor.submit(process_cxl, cxl, concept_name, outputs).result()
+        except ET.ParseError as e:
+            return 400, {"error": f"the CXL export could not be parsed: {e}"}
+        except BrokenProcessPool as e:
+            self.server.replace_executor(executor)
+            return 500, {"error": f"the worker process failed: {e}"}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.server.release_slot()
+
+    def _send_json(self, status, body):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass                            # request latencies are reported by the metrics endpoint
+
+
+def serve(cfg_path, host="localhost", port=DEFAULT_PORT, workers=None, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    run the service until the program is interrupted
+    :param cfg_path: directory containing the configuration file
+    :param host: host name or address to listen on
+    :param port: port to listen on
+    :param workers: number of worker processes (defaults to the number of CPUs)
+    :param queue_size: number of requests that can wait for a worker before requests are rejected
+    """
+    with CmapService((host, port), cfg_path, workers, queue_size) as service:
+        print(f"serving CMAPs on http://{host}:{port}/cmap (press Ctrl+C to stop)")
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,233 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import sys
+from array import array
+from collections.abc import Mapping
+
+"""
+CompactGraph is a memory efficient copy of a loaded CxlCmap graph for keeping many CMAPs in memory at once. Vertexes
+are numbered and stored as slotted records, relationship labels are interned, and the source and target edges are
+stored in compressed sparse row (CSR) arrays of vertex and label numbers. VertexView objects provide the Vertex
+attributes on demand so the BCFactory, CxlReport and NetworkGraph classes work unchanged on a CompactGraph. The
+CompactGraph is built from a loaded CxlCmap, so both graphs are in memory while it is built; it reduces memory only
+where loaded graphs are kept, such as graphs waiting in the pipeline write queue, and not where each graph is dropped
+as soon as its outputs are written.
+"""
+
+
+class VertexRecord:
+    """ the fixed fields of a vertex; additional short-comment attributes are kept in attrs """
+    __slots__ = ("id", "label", "type", "color", "parent_id", "is_root", "ct_subset", "concept_name", "c_code", "attrs")
+
+    def __init__(self, vertex, attrs):
+        """
+        :param vertex: Vertex object from the loaded CxlCmap graph
+        :param attrs: dictionary of the additional vertex attributes or None
+        """
+        self.id = vertex.id
+        self.label = vertex.label
+        self.type = sys.intern(vertex.type) if vertex.type else vertex.type
+        self.color = sys.intern(vertex.color) if vertex.color else vertex.color
+        self.parent_id = vertex.parent_id
+        self.is_root = vertex.is_root
+        self.ct_subset = vertex.ct_subset
+        self.concept_name = vertex.concept_name
+        self.c_code = vertex.c_code
+        self.attrs = attrs
+
+
+class VertexView:
+    """ read-only view of a CompactGraph vertex with the same attributes as a Vertex """
+    __slots__ = ("_graph", "_number")
+
+    def __init__(self, graph, number):
+        """
+        :param graph: the CompactGraph the vertex belongs to
+        :param number: the vertex number in the CompactGraph
+        """
+        self._graph = graph
+        self._number = number
+
+    @property
+    def id(self):
+        return self._graph.records[self._number].id
+
+    @property
+    def label(self):
+        return self._graph.records[self._number].label
+
+    @property
+    def type(self):
+        return self._graph.records[self._number].type
+
+    @property
+    def color(self):
+        return self._graph.records[self._number].color
+
+    @property
+    def parent_id(self):
+        return self._graph.records[self._number].parent_id
+
+    @property
+    def is_root(self):
+        return self._graph.records[self._number].is_root
+
+    @property
+    def ct_subset(self):
+        return self._graph.records[self._number].ct_subset
+
+    @property
+    def concept_name(self):
+        return self._graph.records[self._number].concept_name
+
+    @property
+    def c_code(self):
+        return self._graph.records[self._number].c_code
+
+    @property
+    def source(self):
+        """
+        :return: list of (VertexView, relationship) tuples for the source vertexes of this vertex
+        """
+        return self._graph.get_edges(self._number, self._graph.source_offsets, self._graph.source_vertexes,
+                                     self._graph.source_links)
+
+    @property
+    def target(self):
+        """
+        :return: list of (VertexView, relationship) tuples for the target vertexes of this vertex
+        """
+        return self._graph.get_edges(self._number, self._graph.target_offsets, self._graph.target_vertexes,
+                                     self._graph.target_links)
+
+    def __getattr__(self, name):
+        """
+        look up the additional attributes (e.g. role, mandatory) loaded from the concept short-comment
+        :param name: attribute name
+        :return: attribute value
+        """
+        attrs = self._graph.records[self._number].attrs
+        if attrs is None or name not in attrs:
+            raise AttributeError(f"Vertex {self.id} has no attribute {name}")
+        return attrs[name]
+
+    def __eq__(self, other):
+        return isinstance(other, VertexView) and other._graph is self._graph and other._number == self._number
+
+    def __hash__(self):
+        return hash((id(self._graph), self._number))
+
+
+class VertexViews(Mapping):
+    """ read-only dictionary of VertexView objects keyed by concept id """
+    def __init__(self, graph):
+        """
+        :param graph: the CompactGraph the vertexes belong to
+        """
+        self._graph = graph
+
+    def __getitem__(self, concept_id):
+        return VertexView(self._graph, self._graph.vertex_numbers[concept_id])
+
+    def __iter__(self):
+        return iter(self._graph.vertex_numbers)
+
+    def __len__(self):
+        return len(self._graph.records)
+
+
+class CompactGraph:
+    """
+    compact, read-only copy of a loaded CxlCmap graph
+    """
+    def __init__(self, cmap):
+        """
+        :param cmap: a loaded CxlCmap graph; it is not referenced after the CompactGraph has been created
+        """
+        self.config = cmap.config
+        self.cxl_file = cmap.cxl_file
+        self.linking_phrase = cmap.linking_phrase
+        self.keys = cmap.keys
+        self.concepts = list(cmap.concepts)
+        self.diagnostics = list(cmap.diagnostics)
+        self.vertex_numbers = {}                # vertex number keyed by concept id
+        self.records = []                       # VertexRecord objects by vertex number
+        self.link_labels = []                   # interned relationship labels by label number
+        self._link_numbers = {}
+        self._load_records(cmap)
+        self.target_offsets, self.target_vertexes, self.target_links = self._load_edges(cmap, "target")
+        self.source_offsets, self.source_vertexes, self.source_links = self._load_edges(cmap, "source")
+        self.vertexes = VertexViews(self)
+
+    def __iter__(self):
+        """
+        iterate over the vertexes in the order the concepts were loaded
+        :return: VertexView iterator
+        """
+        return (VertexView(self, self.vertex_numbers[concept_id]) for concept_id in self.concepts)
+
+    def get_edges(self, number, offsets, vertexes, links):
+        """
+        :param number: vertex number
+        :param offsets: CSR offsets array for the edge direction
+        :param vertexes: CSR vertex number array for the edge direction
+        :param links: CSR relationship label number array for the edge direction
+        :return: list of (VertexView, relationship) tuples
+        """
+        return [(VertexView(self, vertexes[i]), self.link_labels[links[i]])
+                for i in range(offsets[number], offsets[number + 1])]
+
+    def _load_records(self, cmap):
+        """
+        number the vertexes and create the vertex records
+        :param cmap: a loaded CxlCmap graph
+        """
+        fixed_fields = set(VertexRecord.__slots__) | {"source", "target"}
+        for concept_id, vertex in cmap.vertexes.items():
+            attrs = {key: value for key, value in vars(vertex).items() if key not in fixed_fields}
+            self.vertex_numbers[concept_id] = len(self.records)
+            self.records.append(VertexRecord(vertex, attrs if attrs else None))
+
+    def _load_edges(self, cmap, direction):
+        """
+        create the CSR arrays for the source or target edges keeping the edge order of each vertex
+        :param cmap: a loaded CxlCmap graph
+        :param direction: "source" or "target"
+        :return: tuple of the offsets, vertex number and relationship label number arrays
+        """
+        offsets = array("i", [0])
+        edge_vertexes = array("i")
+        edge_links = array("i")
+        for vertex in cmap.vertexes.values():
+            for node, relationship in getattr(vertex, direction):
+                edge_vertexes.append(self.vertex_numbers[node.id])
+                edge_links.append(self._get_link_number(relationship))
+            offsets.append(len(edge_vertexes))
+        return offsets, edge_vertexes, edge_links
+
+    def _get_link_number(self, relationship):
+        """
+        :param relationship: relationship label
+        :return: the number of the interned relationship label
+        """
+        number = self._link_numbers.get(relationship)
+        if number is None:
+            number = len(self.link_labels)
+            self._link_numbers[relationship] = number
+            self.link_labels.append(sys.intern(relationship) if relationship else relationship)
+        return number
@@ -0,0 +1,95 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import re
+from collections import namedtuple
+
+"""
+concept_parser parses the text of a CMAP concept once when the CXL file is loaded. It handles three formats:
+- label: "concept name (c-code)", e.g. Systolic Blood Pressure (C0005823)
+- short-comment: one "name: value" attribute per line, e.g. role: qualifier.result
+- long-comment: CT subset terms separated by semi-colons, e.g. SITTING (C62122) default; SUPINE (C62167)
+Text that cannot be parsed is reported as a Diagnostic instead of raising an exception.
+"""
+
+LABEL_PATTERN = re.compile(r"\s*([^(]*?)\s*\(\s*([^)]*?)\s*(?:\)|$)")
+TERM_PATTERN = re.compile(r"\s*([^(]*?)\s*\(\s*([^)]*?)\s*\)(.*)", re.DOTALL)
+DEFAULT_PATTERN = re.compile(r"default", re.IGNORECASE)
+
+RESERVED_ATTRIBUTES = frozenset(("id", "label", "color", "type", "parent_id", "source", "target", "is_root",
+                                 "ct_subset", "concept_name", "c_code"))    # Vertex attributes set by the loader
+
+Diagnostic = namedtuple("Diagnostic", "concept_id source message text")
+ParsedTerm = namedtuple("ParsedTerm", "sub_val c_code default")
+
+
+def parse_label(label):
+    """
+    split a concept label into the concept name and c-code
+    :param label: concept label formatted as "concept name (c-code)"
+    :return: tuple of the name and c-code; the c-code is None if the label does not include one
+    """
+    match = LABEL_PATTERN.match(label)
+    if match is None:
+        return label.strip(), None
+    return match.group(1), match.group(2) if match.group(2) else None
+
+
+def parse_attributes(concept_id, text, diagnostics):
+    """
+    parse the additional attributes in a concept short-comment; blank lines and RESERVED_ATTRIBUTES names are skipped
+    :param concept_id: concept id used in diagnostics
+    :param text: short-comment text with one "name: value" pair per line
+    :param diagnostics: list the Diagnostic for each line without a name and value, or with a reserved name, is
+    appended to
+    :return: dictionary with attribute name value pairs
+    """
+    attrs = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        name, separator, value = line.partition(":")
+        if not separator or not name.strip():
+            diagnostics.append(Diagnostic(concept_id, "short-comment", "attribute is not a name: value pair", line))
+            continue
+        if name.strip() in RESERVED_ATTRIBUTES:
+            diagnostics.append(Diagnostic(concept_id, "short-comment", "attribute name is set by the loader", line))
+            continue
+        attrs[name.strip()] = value.strip()
+    return attrs
+
+
+def parse_subset_terms(concept_id, text, diagnostics):
+    """
+    parse the CT subset terms in a concept long-comment; empty terms are skipped
+    :param concept_id: concept id used in diagnostics
+    :param text: long-comment text with the terms separated by semi-colons
+    :param diagnostics: list the Diagnostic for each term without a submission value and c-code is appended to
+    :return: list of ParsedTerm named tuples
+    """
+    terms = []
+    for term_value in text.split(";"):
+        if not term_value.strip():
+            continue
+        match = TERM_PATTERN.match(term_value)
+        if match is None or not match.group(2):
+            diagnostics.append(Diagnostic(concept_id, "long-comment", "CT term is not formatted as value (c-code)",
+                                          term_value.strip()))
+            continue
+        terms.append(ParsedTerm(match.group(1), match.group(2),
+                                "Yes" if DEFAULT_PATTERN.search(match.group(3)) else "No"))
+    return terms
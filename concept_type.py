@@ -21,24 +21,48 @@ ConceptType identifies the type of a given concept. This class will be refactore
 The means of identifying a type in the CMAP (e.g. border_color, background_color, border_shape, etc) will be linked
 to the Concept Model. This class could help with conformance checking by reporting unknown concept types.
 """
+from collections import namedtuple
+
 DEFAULT_NS = {"cxl": "http://cmap.ihmc.us/xml/cmap/"}
+Appearance = namedtuple("Appearance", "background_color border_color border_shape")
 
 class ConceptType:
-    def __init__(self, concept_id, map_element, config):
+    def __init__(self, concept_id, appearance, config):
         """
         constructor
-        :param concept_id:  the CXL XML concept id used to lookup the associated concept-appearance element
-        :param map_element: the CXL XML export map element, as parsed by xml.etree.ElementTree, used to lookup the
-        concept appearance which in turn is used to determine the concept type
+        :param concept_id:  the CXL XML concept id of the concept to assign a type to
+        :param appearance: the Appearance named tuple built from the CXL concept-appearance element of the concept;
+        the concept appearance is used to determine the concept type
         :param config: a configuration object with program configuration data
         """
         self.id = concept_id
-        self.map_elem = map_element
+        self.appearance = appearance
         self.cfg = config
         self.node_type = self._set_concept_type()
         self.type = self.node_type.label
         self.color = self.node_type.node_color
 
+    @staticmethod
+    def load_appearances(map_element):
+        """
+        index the concept appearances in the CMAP by concept id so that each concept type is resolved in one lookup
+        :param map_element: the CXL XML export map element, as parsed by xml.etree.ElementTree
+        :return: dictionary of Appearance named tuples with the concept id as the key
+        """
+        appearances = {}
+        for c in map_element.findall("cxl:concept-appearance-list/cxl:concept-appearance", DEFAULT_NS):
+            appearances[c.get("id")] = ConceptType.get_appearance(c)
+        return appearances
+
+    @staticmethod
+    def get_appearance(appearance_element):
+        """
+        :param appearance_element: a CXL XML concept-appearance element
+        :return: Appearance named tuple with the attributes used to determine the concept type
+        """
+        return Appearance(appearance_element.get("background-color", None),
+                          appearance_element.get("border-color", None), appearance_element.get("border-shape", None))
+
     def is_root_node(self):
         """
         :return: returns a boolean indicataing if a node is the root node
@@ -49,11 +73,9 @@ class ConceptType:
         """
         identifies and assigns the concept type; in the future Types will be identified by a Concept Model; after
         the Concept Model has been created the strings will be replaced with type objects
-        :return: string indicating concept type that is determined by appearance
-        """
-        c = self.map_elem.find("cxl:concept-appearance-list/cxl:concept-appearance/[@id='" + self.id + "']", DEFAULT_NS)
-        border_shape = c.get("border-shape", None)
-        background_color = c.get("background-color", None)
-        border_color = c.get("border-color", None)
-        node_type = self.cfg.get_concept_type(background_color, border_color, border_shape)
-        return node_type
+        :return: node type determined by appearance; the unknown node type if the concept has no appearance
+        """
+        if self.appearance is None:
+            return self.cfg.unknown_node_type
+        return self.cfg.get_concept_type(self.appearance.background_color, self.appearance.border_color,
+                                         self.appearance.border_shape)
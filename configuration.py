@@ -16,33 +16,52 @@ TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR TH
 SOFTWARE.
 """
 import os
+import copy
 import json
 import node_type as NT
+import node_type_matcher as NTM
 
 CONFIG_FILE_NAME = "cmap_config.json"
+DEFAULT_BC_ROLES = {                    # used when the config file has no bc_roles setting
+    "qualifier.variable.units": "units",
+    "qualifier.result": "result",
+    "topic.test_code": "test_code",
+    "topic": "qualifier",
+    "qualifier.synonym.name": "test_name",
+    "qualifier.synonym.loinc": "loinc_code",
+    "qualifier.record": "qualifier",
+    "qualifier.variable": "qualifier",
+    "qualifier.grouping": "qualifier",
+    "timing": "timing"
+}
 DATA_PATH = os.path.dirname(os.path.realpath(__file__)) + '\\data'
 
 class Configuration:
     """
     provides basic configuration information for the cxl_load application
     """
-    def __init__(self, concept_name,  concept_file_name, cfg_file_name=CONFIG_FILE_NAME, path=DATA_PATH):
+    def __init__(self, concept_name,  concept_file_name, cfg_file_name=CONFIG_FILE_NAME, path=DATA_PATH,
+                 output_path=None):
         """
         constructor
         :param concept_name: name of the root concept for the CMAP - this is the main concept described by the CMAP
         :param concept_file_name: name of the CXL file created as an export from the CMAP
         :param cfg_file_name: name of the JSON configuration file (default provided)
         :param path: name of the path to the data directory (default provided)
+        :param output_path: directory the generated files are written to (defaults to the data directory)
         """
         self.concept_name = concept_name
         self.cfg_file = os.path.join(path, cfg_file_name)
         self.data_file = os.path.join(path, concept_file_name)
         self.config = dict()
         self.data_path = path
+        self.output_path = output_path if output_path else path
         self._load_config()
         self.node_types = []
+        self._node_type_labels = {}
         self._load_node_types()
         self.unknown_node_type = self._set_unknown_node_type()
+        self.type_matcher = NTM.NodeTypeMatcher(self.node_types, self.unknown_node_type)
 
     def _load_config(self):
         """
@@ -54,12 +73,13 @@ class Configuration:
 
     def _load_node_types(self):
         """
-        load the list of node types found in the config file into a list of node type objects
+        load the list of node types found in the config file into a list of node type objects and index them by label
         """
         for type in self.config["node_types"]:
             self.node_types.append(NT.NodeType(type["name"], type.get("label"), type.get("node_color"),
                                    type.get("source_links"), type.get("target_links"), type.get("background_color"),
                                    type.get("border_color"), type.get("border_shape")))
+            self._node_type_labels.setdefault(self.node_types[-1].label, self.node_types[-1])
 
     def get_node_type(self, name):
         """
@@ -67,10 +87,7 @@ class Configuration:
         :param name: name of the node type to return
         :return: node type if a match is found, otherwise None
         """
-        for node_type in self.node_types:
-            if node_type.label == name:
-                return node_type
-        return None
+        return self._node_type_labels.get(name)
 
     def get_concept_type(self, background_color=None, border_color=None, border_shape=None):
         """
@@ -80,28 +97,7 @@ class Configuration:
         :param border_shape: border shape of the concept in the CMAP (e.g. rectangle)
         :return: concept type object
         """
-        concept_type = self.unknown_node_type
-        for node in self.node_types:
-            if self._is_type_match(node, background_color, border_color, border_shape):
-                concept_type = node
-                break
-        return concept_type
-
-    def _is_type_match(self, node, background_color, border_color, border_shape):
-        """
-        does the detailed matching between configuration nodes and CMAP nodes to determine if a node is a match
-        :param node: node type object
-        :param background_color: background color of the concept in the CMAP (e.g. 255,255,150,255)
-        :param border_color: border color of the concept in the CMAP (e.g. 0,0,255,255)
-        :param border_shape: border shape of the concept in the CMAP (e.g. rectangle)
-        :return: boolean
-        """
-        is_type_match = True
-        if (border_color is not None and node.border_color is not None and border_color != node.border_color) or \
-                (background_color is not None and node.background_color is not None and background_color != node.background_color) or \
-                (border_shape is not None and node.border_shape is not None and border_shape != node.border_shape):
-            is_type_match = False
-        return is_type_match
+        return self.type_matcher.match(background_color, border_color, border_shape)
 
     def _set_unknown_node_type(self):
         """
@@ -110,25 +106,77 @@ class Configuration:
         """
         return NT.NodeType("Unknown", "Unknown", "#FFFFFF", "0,0,0,0", "0,0,0,0", "Unknown")
 
+    def for_cmap(self, concept_name, concept_file_name, output_path=None):
+        """
+        create a configuration for another CMAP that shares the already loaded config file settings and node types
+        :param concept_name: name of the root concept for the CMAP
+        :param concept_file_name: name of the CXL file created as an export from the CMAP
+        :param output_path: directory the generated files are written to (defaults to the data directory)
+        :return: configuration object
+        """
+        cmap_config = copy.copy(self)
+        cmap_config.concept_name = concept_name
+        cmap_config.data_file = os.path.join(self.data_path, concept_file_name)
+        cmap_config.output_path = output_path if output_path else self.data_path
+        return cmap_config
+
     @property
     def data_path_dir(self):
         return self.data_path
 
+    @property
+    def output_path_dir(self):
+        return self.output_path
+
     @property
     def graphml_file(self):
-        return os.path.join(self.data_path, self.config["graphml_file_name"])
+        return os.path.join(self.output_path, self.config["graphml_file_name"])
 
     @property
     def json_tree_file(self):
-        return os.path.join(self.data_path, self.config["json_tree_file_name"])
+        return os.path.join(self.output_path, self.config["json_tree_file_name"])
 
     @property
     def json_force_file(self):
-        return os.path.join(self.data_path, self.config["json_force_file_name"])
+        return os.path.join(self.output_path, self.config["json_force_file_name"])
 
     @property
     def report_file(self):
-        return os.path.join(self.data_path, self.config["report_file_name"])
+        return os.path.join(self.output_path, self.config["report_file_name"])
+
+    @property
+    def corpus_report_file(self):
+        return os.path.join(self.output_path, self.config["corpus_report_file_name"])
+
+    @property
+    def bc_roles(self):
+        """
+        :return: dictionary of BC handler names (e.g. units) keyed by lower case DEC role (e.g. qualifier.result)
+        """
+        bc_roles = self.config.get("bc_roles", DEFAULT_BC_ROLES)
+        return {role.strip().lower(): handler for role, handler in bc_roles.items()}
+
+    @property
+    def cardinality_rules(self):
+        """
+        :return: list of cardinality rule dictionaries with the node type name, link, direction (target for links from
+        the node or source for links to the node) and the min and max number of linked nodes
+        """
+        return self.config.get("cardinality_rules", [])
+
+    @property
+    def report_format(self):
+        return self.config.get("report_format", "xlsx")
+
+    def report_table_file(self, table, extension):
+        """
+        name of the delimited text file for one of the report tables (e.g. cmap_report_nodes.csv)
+        :param table: name of the report table (nodes or edges)
+        :param extension: file extension (csv or tsv)
+        :return: file name including the output path
+        """
+        report_name = os.path.splitext(self.config["report_file_name"])[0]
+        return os.path.join(self.output_path, f"{report_name}_{table}.{extension}")
 
     def report_headers(self, worksheet_name):
         """
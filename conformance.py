@@ -0,0 +1,300 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import json
+import pathlib
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import configuration as CFG
+import cxl_cmap as CMAP
+import cxl_batch as BATCH
+
+"""
+conformance checks CMAPs against the metamodel in the configuration file. The node types are compiled once into an
+index of the permitted (source type, relationship, target type) triples, and each relationship in a CMAP is checked
+once against it. The cardinality_rules in the configuration file set the number of nodes a node type is linked to by a
+relationship (e.g. a DEC has at most one CD). The findings are printed and can be saved as SARIF or JSON, and the
+program exits with status 1 when a finding is at or above the --fail_on level so it can be used as a pre-commit check.
+Examples:
+python conformance.py VS-SYSBP-Metamodel3.cxl -d "c:\\cmaps\\cxl\\data"
+python conformance.py "c:\\cmaps\\cxl\\release" -o conformance.sarif --fail_on warning
+"""
+
+Finding = namedtuple("Finding", "rule_id level message cxl_file concept_id label")
+CardinalityRule = namedtuple("CardinalityRule", "type_label link direction min max level")
+
+LEVELS = ("note", "warning", "error")
+RULES = {
+    "link-not-permitted": "The relationship is not permitted between the node types by the metamodel.",
+    "cardinality": "The node is linked to fewer or more nodes by a relationship than the metamodel allows.",
+    "unknown-node-type": "The node does not match a node type in the metamodel.",
+    "cxl-load-error": "The CXL file could not be loaded.",
+}
+DIRECTIONS = ("target", "source")
+TOOL_NAME = "cmap-conformance"
+SARIF_VERSION = "2.1.0"
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+_worker_checker = None                  # conformance checker created once per worker process from its configuration
+
+
+class ConformanceChecker:
+    """
+    check the relationships and cardinality of the nodes in a CMAP graph against the metamodel
+    """
+    def __init__(self, config):
+        """
+        :param config: a configuration object that provides the node types and cardinality rules
+        """
+        self.cfg = config
+        self.node_types = {node_type.label: node_type for node_type in config.node_types}
+        self.links_from = {label: frozenset(node_type.valid_target_links or ())
+                           for label, node_type in self.node_types.items()}
+        self.links_to = {label: frozenset(node_type.valid_source_links or ())
+                         for label, node_type in self.node_types.items()}
+        self.permitted = frozenset((source, link, target) for source, links in self.links_from.items()
+                                   for link in links for target in self.node_types if link in self.links_to[target])
+        self.cardinality_rules = self._compile_cardinality_rules(config)
+
+    def _compile_cardinality_rules(self, config):
+        """
+        :param config: configuration object with the cardinality rules
+        :return: dictionary of lists of CardinalityRule named tuples keyed by node type label
+        """
+        type_labels = {node_type.name: node_type.label for node_type in config.node_types}
+        rules = {}
+        for rule in config.cardinality_rules:
+            if rule["node_type"] not in type_labels:
+                raise ValueError(f"unknown node type {rule['node_type']} in cardinality rule for {rule['link']}")
+            direction = rule.get("direction", "target")
+            level = rule.get("level", "error")
+            if direction not in DIRECTIONS or level not in LEVELS:
+                raise ValueError(f"cardinality rule for {rule['node_type']} {rule['link']} must have a direction of "
+                                 f"{' or '.join(DIRECTIONS)} and a level of {', '.join(LEVELS)}")
+            label = type_labels[rule["node_type"]]
+            rules.setdefault(label, []).append(CardinalityRule(label, rule["link"], direction, rule.get("min"),
+                                                               rule.get("max"), level))
+        return rules
+
+    def check(self, cmap, cxl_file=""):
+        """
+        check each relationship once from its source node and the cardinality rules of each node
+        :param cmap: the graph created from the CMAP CXL file
+        :param cxl_file: name of the CXL file the findings are reported for
+        :return: list of Finding named tuples
+        """
+        findings = []
+        for vertex in cmap:
+            if vertex.type not in self.node_types:
+                findings.append(Finding("unknown-node-type", "warning", f"{vertex.label} has the node type "
+                                        f"{vertex.type}", cxl_file, vertex.id, vertex.label))
+            linked = {}                 # ids of the linked nodes keyed by (direction, link)
+            for node, link in vertex.target:
+                linked_ids = linked.setdefault(("target", link), set())
+                if node.id in linked_ids:
+                    continue            # a relationship is added to the graph for each of its CXL connections
+                linked_ids.add(node.id)
+                self._check_link(vertex, link, node, cxl_file, findings)
+            for node, link in vertex.source:
+                linked.setdefault(("source", link), set()).add(node.id)
+            for rule in self.cardinality_rules.get(vertex.type, ()):
+                self._check_cardinality(vertex, rule, len(linked.get((rule.direction, rule.link), ())), cxl_file,
+                                        findings)
+        return findings
+
+    def _check_link(self, source, link, target, cxl_file, findings):
+        """
+        add a finding when the relationship is not permitted between the node types; when only one of the node types
+        is known only that node type's links are checked
+        :param source: vertex the relationship is from
+        :param link: relationship name
+        :param target: vertex the relationship is to
+        :param cxl_file: name of the CXL file the findings are reported for
+        :param findings: list the finding is added to
+        """
+        if (source.type, link, target.type) in self.permitted:
+            return
+        reasons = []
+        if source.type in self.links_from and link not in self.links_from[source.type]:
+            reasons.append(f"{link} is not permitted from a {source.type}")
+        if target.type in self.links_to and link not in self.links_to[target.type]:
+            reasons.append(f"{link} is not permitted to a {target.type}")
+        if reasons:
+            findings.append(Finding("link-not-permitted", "error", f"{source.label} {link} {target.label}: "
+                                    f"{'; '.join(reasons)}", cxl_file, source.id, source.label))
+
+    @staticmethod
+    def _check_cardinality(vertex, rule, count, cxl_file, findings):
+        """
+        add a finding when the number of linked nodes is outside the range set by the rule
+        :param vertex: vertex the rule applies to
+        :param rule: CardinalityRule named tuple
+        :param count: number of distinct nodes linked to the vertex by the rule's relationship and direction
+        :param cxl_file: name of the CXL file the findings are reported for
+        :param findings: list the finding is added to
+        """
+        if (rule.min is None or count >= rule.min) and (rule.max is None or count <= rule.max):
+            return
+        if rule.min == rule.max:
+            expected = f"exactly {rule.min}"
+        elif rule.max is None:
+            expected = f"at least {rule.min}"
+        elif rule.min is None:
+            expected = f"at most {rule.max}"
+        else:
+            expected = f"{rule.min} to {rule.max}"
+        direction = "from" if rule.direction == "target" else "to"
+        findings.append(Finding("cardinality", rule.level, f"{vertex.label} has {count} {rule.link} links {direction} "
+                                f"it; a {rule.type_label} has {expected}", cxl_file, vertex.id, vertex.label))
+
+
+def check_cxl_file(checker, cxl_file):
+    """
+    load a CXL file and check it against the metamodel
+    :param checker: ConformanceChecker
+    :param cxl_file: CXL file name
+    :return: list of Finding named tuples
+    """
+    try:
+        cmap = CMAP.CxlCmap(checker.cfg, cxl_file)
+        cmap.load_streaming()
+    except Exception as e:
+        return [Finding("cxl-load-error", "error", f"{type(e).__name__}: {e}", cxl_file, None, None)]
+    return checker.check(cmap, cxl_file)
+
+
+def _check_cxl_file(cxl_file):
+    """
+    check a CXL file in a worker process; the metamodel is compiled from the worker configuration loaded by
+    cxl_batch.init_worker the first time the worker checks a file
+    :param cxl_file: CXL file name
+    :return: list of Finding named tuples
+    """
+    global _worker_checker
+    if _worker_checker is None:
+        _worker_checker = ConformanceChecker(BATCH.get_worker_config())
+    return check_cxl_file(_worker_checker, cxl_file)
+
+
+def check_files(cxl_files, cfg_path, workers=None):
+    """
+    check a corpus of CXL files; more than one file is checked in a pool of worker processes unless workers is 1
+    :param cxl_files: list of CXL file names
+    :param cfg_path: directory containing the configuration file
+    :param workers: number of worker processes (defaults to the number of CPUs)
+    :return: list of Finding named tuples in the order of the CXL files
+    """
+    if len(cxl_files) < 2 or workers == 1:
+        checker = ConformanceChecker(CFG.Configuration(None, "", path=cfg_path))
+        return [finding for cxl_file in cxl_files for finding in check_cxl_file(checker, cxl_file)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=BATCH.init_worker, initargs=(cfg_path,)) as executor:
+        return [finding for findings in executor.map(_check_cxl_file, cxl_files) for finding in findings]
+
+
+def get_cxl_files(cxl_sources):
+    """
+    :param cxl_sources: list of CXL file names, directories, glob patterns or JSON manifests
+    :return: tuple of the list of CXL file names and a list of findings for the sources with no CXL files
+    """
+    cxl_files, findings = [], []
+    for source in cxl_sources:
+        files = [job.cxl_file for job in BATCH.get_batch_jobs(source, "")]
+        if not files:
+            findings.append(Finding("cxl-load-error", "error", "no CXL files found", source, None, None))
+        cxl_files.extend(files)
+    return cxl_files, findings
+
+
+def is_failure(findings, fail_on="error"):
+    """
+    :param findings: list of Finding named tuples
+    :param fail_on: lowest finding level that fails the check
+    :return: True if a finding is at or above the fail_on level
+    """
+    return any(LEVELS.index(finding.level) >= LEVELS.index(fail_on) for finding in findings)
+
+
+def to_sarif(findings):
+    """
+    :param findings: list of Finding named tuples
+    :return: the findings as a SARIF log dictionary
+    """
+    results = []
+    for finding in findings:
+        location = {"physicalLocation": {"artifactLocation": {"uri": _get_uri(finding.cxl_file)}}}
+        if finding.concept_id:
+            location["logicalLocations"] = [{"name": finding.label, "fullyQualifiedName": finding.concept_id,
+                                             "kind": "object"}]
+        results.append({"ruleId": finding.rule_id, "level": finding.level, "message": {"text": finding.message},
+                        "locations": [location]})
+    rules = [{"id": rule_id, "shortDescription": {"text": description}} for rule_id, description in RULES.items()]
+    return {"$schema": SARIF_SCHEMA, "version": SARIF_VERSION,
+            "runs": [{"tool": {"driver": {"name": TOOL_NAME, "rules": rules}}, "results": results}]}
+
+
+def _get_uri(file_name):
+    path = pathlib.Path(file_name)
+    return path.as_uri() if path.is_absolute() else path.as_posix()
+
+
+def print_findings(findings, file_count):
+    """
+    :param findings: list of Finding named tuples
+    :param file_count: number of CXL files checked
+    """
+    for finding in findings:
+        location = f" {finding.label} ({finding.concept_id})" if finding.concept_id else ""
+        print(f"{finding.cxl_file}:{location} {finding.level} {finding.rule_id}: {finding.message}")
+    counts = ", ".join(f"{len([f for f in findings if f.level == level])} {level}s" for level in reversed(LEVELS))
+    print(f"checked {file_count} CXL files: {counts}")
+
+
+def set_cmd_line_args():
+    """
+    Example: VS-SYSBP-Metamodel3.cxl -o conformance.sarif
+    :return: argparse object with command-line parameters
+    """
+    parser = argparse.ArgumentParser(description="check CMAP CXL files against the metamodel")
+    parser.add_argument("cxl_sources", nargs="+", help="CXL files, directories, glob patterns or JSON manifests")
+    parser.add_argument("-d", "--file_path", dest="file_path", help="Directory of the configuration file", required=False)
+    parser.add_argument("-o", "--findings_file", dest="findings_file", help="File the findings are saved to", required=False)
+    parser.add_argument("--format", dest="format", choices=["sarif", "json"], default="sarif", help="Format of the findings file (default sarif)", required=False)
+    parser.add_argument("--fail_on", dest="fail_on", choices=LEVELS, default="error", help="Lowest finding level that sets a failed exit status (default error)", required=False)
+    parser.add_argument("-w", "--workers", dest="workers", type=int, help="Number of worker processes (default number of CPUs)", required=False)
+    return parser.parse_args()
+
+
+def main():
+    args = set_cmd_line_args()
+    cfg_path = args.file_path if args.file_path else CFG.DATA_PATH
+    cxl_files, findings = get_cxl_files(args.cxl_sources)
+    findings.extend(check_files(cxl_files, cfg_path, args.workers))
+    print_findings(findings, len(cxl_files))
+    if args.findings_file:
+        with open(args.findings_file, "w", encoding="utf-8") as f:
+            if args.format == "sarif":
+                json.dump(to_sarif(findings), f, indent=2)
+            else:
+                json.dump([finding._asdict() for finding in findings], f, indent=2)
+    if is_failure(findings, args.fail_on):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
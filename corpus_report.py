@@ -0,0 +1,143 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from collections import Counter
+import XlsxWriter.xlsxwriter as XSL
+import cxl_report as REP
+
+"""
+CorpusReport combines the CMAP reports for many CMAPs into one Excel workbook. The report for each CMAP is reduced to
+a summary that can be created where the CMAP was loaded (e.g. in a batch worker process) and added to the corpus
+report. The node, edge, invalid link, and orphan rows are streamed to the workbook as each summary is added and the
+summary sheets are written when the report is closed.
+"""
+
+
+class CorpusReport:
+    """
+    generate a single report listing the components and problems found in a corpus of CMAPs
+    """
+    def __init__(self, config):
+        """
+        :param config: a configuration object that provides access to the program's config setting
+        """
+        self.cfg = config
+        self.maps = []                                  # summary row for each CMAP
+        self.type_counts = {}                           # node type counts keyed by CMAP name
+        self.node_types = [node_type.label for node_type in config.node_types] + [config.unknown_node_type.label]
+        self.invalid_relationships = Counter()          # invalid link counts keyed by (node type, link name)
+        self.invalid_relationship_maps = {}             # CMAP names keyed by (node type, link name)
+        self.edge_counts = Counter()                    # link counts for the corpus keyed by link name
+        self._rows = {}                                 # next row number keyed by worksheet name
+        self.workbook = XSL.Workbook(self.cfg.corpus_report_file, {"constant_memory": True})
+        self.bold = self.workbook.add_format({'bold': True})
+        self.summary_sheet = self._add_worksheet("Map Summary", ["Map", "Nodes", "Links", "Orphans", "Entry Points",
+                                                                 "Nodes With Invalid Links"])
+        self.type_sheet = self._add_worksheet("Type Counts", ["Map"] + self.node_types)
+        self.relationship_sheet = self._add_worksheet("Invalid Relationships", ["Node Type", "Invalid Link", "Count",
+                                                                                "Maps"])
+        self.edge_total_sheet = self._add_worksheet("Edge Totals", self.cfg.report_headers("edges"))
+        self.node_sheet = self._add_worksheet("CMAP Nodes", ["Map"] + self.cfg.report_headers("nodes"))
+        self.edge_sheet = self._add_worksheet("CMAP Edges", ["Map"] + self.cfg.report_headers("edges"))
+        self.invalid_sheet = self._add_worksheet("Invalid Links", ["Map", "Name", "Type", "Id", "Invalid Links"])
+        self.orphan_sheet = self._add_worksheet("Orphans And Entry Points", ["Map", "Name", "Type", "Id", "Orphan",
+                                                                             "Entry Point"])
+
+    @staticmethod
+    def summarize(cmap_name, cmap, config):
+        """
+        reduce a loaded CMAP to the rows and counts used in the corpus report
+        :param cmap_name: name of the CMAP used in the report (e.g. the CXL file name)
+        :param cmap: a graph structure build from the CMAP CXL format
+        :param config: a configuration object that provides access to the program's config setting
+        :return: dictionary summarizing the CMAP
+        """
+        report = REP.CxlReport(cmap, config)
+        nodes = []
+        invalid_relationships = Counter()
+        for vertex in cmap:
+            nodes.append(report.get_node_row(vertex))
+            for link in report.get_invalid_link_names(vertex):
+                invalid_relationships[(vertex.type, link)] += 1
+        return {"name": cmap_name, "nodes": nodes, "edges": list(report.edge_rows()),
+                "invalid_relationships": invalid_relationships}
+
+    def add_summary(self, summary):
+        """
+        add the rows for one CMAP to the corpus report
+        :param summary: dictionary created by summarize
+        """
+        name = summary["name"]
+        type_counts = Counter()
+        orphans = entry_points = invalid_nodes = 0
+        for row in summary["nodes"]:
+            label, node_type, id, is_orphan, is_entry_point = row[:5]
+            invalid_links = row[7]
+            type_counts[node_type] += 1
+            self._write_row(self.node_sheet, [name] + row)
+            if invalid_links:
+                invalid_nodes += 1
+                self._write_row(self.invalid_sheet, [name, label, node_type, id, invalid_links])
+            if is_orphan or is_entry_point:
+                orphans += 1 if is_orphan else 0
+                entry_points += 1 if is_entry_point else 0
+                self._write_row(self.orphan_sheet, [name, label, node_type, id, is_orphan, is_entry_point])
+        for row in summary["edges"]:
+            self._write_row(self.edge_sheet, [name] + row)
+            self.edge_counts[row[0]] += row[1]
+        for relationship, count in summary["invalid_relationships"].items():
+            self.invalid_relationships[relationship] += count
+            self.invalid_relationship_maps.setdefault(relationship, set()).add(name)
+        self.type_counts[name] = type_counts
+        self.maps.append([name, len(summary["nodes"]), sum(row[1] for row in summary["edges"]), orphans, entry_points,
+                          invalid_nodes])
+
+    def close(self):
+        """
+        write the summary worksheets and close the workbook
+        """
+        for row in sorted(self.maps):
+            self._write_row(self.summary_sheet, row)
+            self._write_row(self.type_sheet, [row[0]] + [self.type_counts[row[0]][node_type]
+                                                         for node_type in self.node_types])
+        for (node_type, link), count in self.invalid_relationships.most_common():
+            self._write_row(self.relationship_sheet, [node_type, link, count,
+                                                      len(self.invalid_relationship_maps[(node_type, link)])])
+        for edge, count in self.edge_counts.most_common():
+            self._write_row(self.edge_total_sheet, [edge, count])
+        self.workbook.close()
+
+    def _add_worksheet(self, name, headers):
+        """
+        add a worksheet with a header record
+        :param name: worksheet name
+        :param headers: list of column headers
+        :return: worksheet object
+        """
+        worksheet = self.workbook.add_worksheet(name)
+        worksheet.write_row(0, 0, headers, self.bold)
+        return worksheet
+
+    def _write_row(self, worksheet, row):
+        """
+        write a row after the last row written to the worksheet
+        :param worksheet: worksheet object
+        :param row: list of column values
+        """
+        row_number = self._rows.get(worksheet.name, 1)
+        worksheet.write_row(row_number, 0, row)
+        self._rows[worksheet.name] = row_number + 1
@@ -0,0 +1,255 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import json
+import os
+import subset as SUB
+import term as TERM
+
+"""
+TerminologyIndex is a corpus level index of the CDISC controlled terminology subsets used by the CMAPs. Each Term is
+kept once for its c-code, submission value and default flag, and each Subset once for its c-code, name and terms, so
+the subsets that recur across many BCs (e.g. units, anatomical locations) are shared rather than repeated for every
+CMAP. Inverted indexes are kept as subsets are added so impact analysis queries are dictionary lookups:
+- the BCs that use a term c-code
+- the subsets of a codelist c-code; a subset's codelist is the codelist it is linked to by isSubsetOf or the c-code
+  prefix of a sponsor subset c-code (e.g. C71620 for C71620-001)
+- the BCs that use a subset c-code and the subsets used by a BC
+The index is saved as JSON so it can be queried without reloading the CMAPs.
+Examples:
+python cxl_load.py -b "c:\\cmaps\\cxl\\release" --ct_index "c:\\cmaps\\output\\ct_index.json"
+python ct_index.py "c:\\cmaps\\output\\ct_index.json" --term C49670 --codelist C71620
+"""
+
+SUBSET_LINK = "isSubsetOf"
+
+
+class TerminologyIndex:
+    """
+    interned CT subsets and terms with inverted indexes for the BCs and codelists that use them
+    """
+    def __init__(self):
+        self.terms = {}                     # Term keyed by (c_code, sub_val, default)
+        self.subsets = {}                   # Subset keyed by subset key (c_code, name, term keys)
+        self.subset_codelists = {}          # set of codelist c-codes keyed by subset key
+        self.subset_bcs = {}                # set of BC names keyed by subset key
+        self.bc_subsets = {}                # dictionary of subset keys, used as an ordered set, keyed by BC name
+        self.term_bcs = {}                  # set of BC names keyed by term c-code
+        self.codelist_subsets = {}          # dictionary of subset keys, used as an ordered set, keyed by codelist
+        self.c_code_subsets = {}            # dictionary of subset keys, used as an ordered set, keyed by c-code
+
+    def intern_term(self, ct_term):
+        """
+        :param ct_term: Term object
+        :return: the indexed Term with the same c-code, submission value and default flag
+        """
+        return self.terms.setdefault((ct_term.c_code, ct_term.sub_val, ct_term.default), ct_term)
+
+    def intern_subset(self, ct_subset):
+        """
+        :param ct_subset: Subset object; if it is added to the index its terms are replaced by the indexed terms
+        :return: the indexed Subset with the same c-code, name and terms
+        """
+        key = get_subset_key(ct_subset)
+        indexed = self.subsets.get(key)
+        if indexed is None:
+            ct_subset.terms = [self.intern_term(ct_term) for ct_term in ct_subset.terms]
+            indexed = self.subsets[key] = ct_subset
+            self.c_code_subsets.setdefault(ct_subset.c_code, {})[key] = None
+        return indexed
+
+    def add_cmap(self, cmap, bc_name=None):
+        """
+        add the CT subsets of a loaded CMAP to the index
+        :param cmap: the graph created from the CMAP CXL file
+        :param bc_name: name the BC is indexed by (defaults to the CXL file name without its extension)
+        """
+        self.add_subsets(*get_cmap_subsets(cmap, bc_name))
+
+    def add_subsets(self, bc_name, cmap_subsets):
+        """
+        add the CT subsets used by a BC to the index, replacing any subsets added for the BC before
+        :param bc_name: name of the BC
+        :param cmap_subsets: list of (Subset, codelist c-code) tuples created by get_cmap_subsets
+        """
+        if bc_name in self.bc_subsets:
+            self.remove_bc(bc_name)
+        bc_keys = self.bc_subsets.setdefault(bc_name, {})
+        for ct_subset, codelist in cmap_subsets:
+            ct_subset = self.intern_subset(ct_subset)
+            key = get_subset_key(ct_subset)
+            bc_keys[key] = None
+            self.subset_bcs.setdefault(key, set()).add(bc_name)
+            if codelist:
+                self.subset_codelists.setdefault(key, set()).add(codelist)
+                self.codelist_subsets.setdefault(codelist, {})[key] = None
+            for ct_term in ct_subset.terms:
+                self.term_bcs.setdefault(ct_term.c_code, set()).add(bc_name)
+
+    def remove_bc(self, bc_name):
+        """
+        remove a BC from the index along with the subsets no other BC uses
+        :param bc_name: name of the BC
+        """
+        for key in self.bc_subsets.pop(bc_name, {}):
+            for ct_term in self.subsets[key].terms:
+                self.term_bcs.get(ct_term.c_code, set()).discard(bc_name)
+            self.subset_bcs[key].discard(bc_name)
+            if not self.subset_bcs[key]:
+                self._remove_subset(key)
+
+    def _remove_subset(self, key):
+        """
+        :param key: subset key of a subset no BC uses
+        """
+        ct_subset = self.subsets.pop(key)
+        del self.subset_bcs[key]
+        self.c_code_subsets[ct_subset.c_code].pop(key)
+        for codelist in self.subset_codelists.pop(key, ()):
+            self.codelist_subsets[codelist].pop(key)
+
+    def get_term_bcs(self, c_code):
+        """
+        :param c_code: CT term c-code (e.g. C49670)
+        :return: sorted list of the names of the BCs that use the term
+        """
+        return sorted(self.term_bcs.get(c_code, ()))
+
+    def get_codelist_subsets(self, c_code):
+        """
+        :param c_code: codelist c-code (e.g. C71620)
+        :return: list of the Subsets of the codelist
+        """
+        return [self.subsets[key] for key in self.codelist_subsets.get(c_code, ())]
+
+    def get_subset_bcs(self, c_code):
+        """
+        :param c_code: subset c-code (e.g. C71620-001)
+        :return: sorted list of the names of the BCs that use a subset with the c-code
+        """
+        return sorted({bc_name for key in self.c_code_subsets.get(c_code, ()) for bc_name in self.subset_bcs[key]})
+
+    def get_bc_subsets(self, bc_name):
+        """
+        :param bc_name: name of the BC
+        :return: list of the Subsets used by the BC
+        """
+        return [self.subsets[key] for key in self.bc_subsets.get(bc_name, ())]
+
+    def save(self, file_name):
+        """
+        save the subsets with the BCs and codelists that use them as JSON
+        :param file_name: JSON file name
+        """
+        subsets = [{"c_code": ct_subset.c_code, "name": ct_subset.name,
+                    "codelists": sorted(self.subset_codelists.get(key, ())), "bcs": sorted(self.subset_bcs[key]),
+                    "terms": [[ct_term.c_code, ct_term.sub_val, ct_term.default] for ct_term in ct_subset.terms]}
+                   for key, ct_subset in self.subsets.items()]
+        with open(file_name, "w", encoding="utf-8") as f:
+            json.dump({"subsets": subsets}, f, indent=1)
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        :param file_name: JSON file created by save
+        :return: TerminologyIndex
+        """
+        with open(file_name, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        bc_subsets = {}
+        for entry in saved["subsets"]:
+            ct_subset = SUB.Subset(entry["c_code"], entry["name"])
+            ct_subset.terms = [TERM.Term(c_code, sub_val, default) for c_code, sub_val, default in entry["terms"]]
+            for bc_name in entry["bcs"]:
+                bc_subsets.setdefault(bc_name, []).extend((ct_subset, codelist)
+                                                          for codelist in entry["codelists"] or [None])
+        index = cls()
+        for bc_name, cmap_subsets in bc_subsets.items():
+            index.add_subsets(bc_name, cmap_subsets)
+        return index
+
+
+def get_subset_key(ct_subset):
+    """
+    :param ct_subset: Subset object
+    :return: tuple of the subset c-code, name and the c-code, submission value and default flag of each term
+    """
+    return (ct_subset.c_code, ct_subset.name,
+            tuple((ct_term.c_code, ct_term.sub_val, ct_term.default) for ct_term in ct_subset.terms))
+
+
+def get_cmap_subsets(cmap, bc_name=None):
+    """
+    find the CT subsets of a loaded CMAP and the codelist each one is a subset of; the result is small enough to be
+    returned from a batch worker process. BCs are named by their CXL file rather than their root concept label so the
+    CMAPs of a release that share a root concept label are indexed separately
+    :param cmap: the graph created from the CMAP CXL file
+    :param bc_name: name the BC is indexed by (defaults to the CXL file name without its extension)
+    :return: tuple of the BC name and a list of (Subset, codelist c-code) tuples
+    """
+    if bc_name is None:
+        bc_name = os.path.splitext(os.path.basename(str(cmap.cxl_file)))[0]
+    cmap_subsets = [(vertex.ct_subset, get_codelist(vertex)) for vertex in cmap.vertexes.values()
+                    if vertex.ct_subset is not None]
+    return bc_name, cmap_subsets
+
+
+def get_codelist(vertex):
+    """
+    :param vertex: vertex with a CT subset
+    :return: c-code of the codelist the vertex is linked to by isSubsetOf, the prefix of a sponsor subset c-code
+    (e.g. C71620 for C71620-001), or None
+    """
+    for node, link in vertex.target:
+        if link == SUBSET_LINK and node.c_code:
+            return node.c_code
+    c_code = vertex.ct_subset.c_code
+    if c_code and "-" in c_code:
+        return c_code.split("-", 1)[0]
+    return None
+
+
+def set_cmd_line_args():
+    """
+    Example: ct_index.json --term C49670
+    :return: argparse object with command-line parameters
+    """
+    parser = argparse.ArgumentParser(description="query a controlled terminology index created by cxl_load")
+    parser.add_argument("index_file", help="JSON CT index file created with cxl_load --ct_index")
+    parser.add_argument("--term", dest="terms", nargs="+", default=[], help="Term c-codes to list the BCs of", required=False)
+    parser.add_argument("--codelist", dest="codelists", nargs="+", default=[], help="Codelist c-codes to list the subsets of", required=False)
+    parser.add_argument("--subset", dest="subsets", nargs="+", default=[], help="Subset c-codes to list the BCs of", required=False)
+    parser.add_argument("--bc", dest="bcs", nargs="+", default=[], help="BC names (CXL file names without the extension) to list the subsets of", required=False)
+    return parser.parse_args()
+
+
+def main():
+    args = set_cmd_line_args()
+    index = TerminologyIndex.load(args.index_file)
+    for c_code in args.terms:
+        print(f"term {c_code}: {', '.join(index.get_term_bcs(c_code))}")
+    for c_code in args.codelists:
+        print(f"codelist {c_code}: {', '.join(f'{s.name} ({s.c_code})' for s in index.get_codelist_subsets(c_code))}")
+    for c_code in args.subsets:
+        print(f"subset {c_code}: {', '.join(index.get_subset_bcs(c_code))}")
+    for bc_name in args.bcs:
+        print(f"bc {bc_name}: {', '.join(f'{s.name} ({s.c_code})' for s in index.get_bc_subsets(bc_name))}")
+
+
+if __name__ == "__main__":
+    main()
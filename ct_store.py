@@ -0,0 +1,335 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import contextlib
+import csv
+import functools
+import json
+import os
+import pathlib
+import re
+import sqlite3
+from collections import namedtuple
+import concept_parser as PARSE
+import ct_index as CTI
+
+"""
+CTStore is a local reference store of a CDISC Controlled Terminology release used to validate the c-codes in CMAPs.
+The release is published as tab delimited text or Excel files; each is converted once into a SQLite database with the
+codelists keyed by c-code and the terms keyed by codelist and c-code, with an index on the term c-code. The source
+files' sizes and modification times are kept in the database, so later runs open the existing database and only
+rebuild it when a release file changes. Lookups are cached in memory for each process.
+validate_cmap checks the label c-codes, the CT subset c-codes and the subset term c-codes of a loaded CMAP and adds a
+Diagnostic for each one that is not in the release. Labels whose code is not an NCI c-code (e.g. DEC82515) are skipped.
+Examples:
+python ct_store.py SDTM_Terminology.txt -o ct.sqlite
+python cxl_load.py -f VS-SYSBP-Metamodel3.cxl -c "Systolic Blood Pressure (C0005823)" --ct_store ct.sqlite
+"""
+
+Codelist = namedtuple("Codelist", "c_code name submission_value extensible")
+CtTerm = namedtuple("CtTerm", "codelist_c_code c_code submission_value preferred_term")
+
+SCHEMA_VERSION = "1"
+DEFAULT_CACHE_SIZE = 4096
+C_CODE_PATTERN = re.compile(r"C\d+$")
+RELEASE_COLUMNS = {"c_code": "Code", "codelist_c_code": "Codelist Code", "extensible": "Codelist Extensible (Yes/No)",
+                   "codelist_name": "Codelist Name", "submission_value": "CDISC Submission Value",
+                   "preferred_term": "NCI Preferred Term"}
+SCHEMA = """
+CREATE TABLE release (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE codelist (c_code TEXT PRIMARY KEY, name TEXT, submission_value TEXT, extensible TEXT) WITHOUT ROWID;
+CREATE TABLE term (codelist_c_code TEXT, c_code TEXT, submission_value TEXT, preferred_term TEXT,
+                   PRIMARY KEY (codelist_c_code, c_code)) WITHOUT ROWID;
+CREATE INDEX term_c_code ON term (c_code);
+"""
+
+
+class CTStore:
+    """
+    read-only lookups of the codelists and terms in a CT release database
+    """
+    def __init__(self, db_file, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        :param db_file: SQLite database created by build_store
+        :param cache_size: number of lookups of each kind kept in memory
+        """
+        self.db_file = db_file
+        self.cache_size = cache_size
+        self._connection = None
+        self._set_caches()
+
+    def _set_caches(self):
+        self.get_codelist = functools.lru_cache(maxsize=self.cache_size)(self._get_codelist)
+        self.get_term = functools.lru_cache(maxsize=self.cache_size)(self._get_term)
+        self.get_term_codelists = functools.lru_cache(maxsize=self.cache_size)(self._get_term_codelists)
+
+    def __getstate__(self):
+        """
+        the database connection and caches are not pickled, so the store can be passed to worker processes
+        :return: dictionary of the object state
+        """
+        return {"db_file": self.db_file, "cache_size": self.cache_size}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._connection = None
+        self._set_caches()
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            uri = pathlib.Path(os.path.abspath(self.db_file)).as_uri() + "?mode=ro"
+            self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self._connection
+
+    def _get_codelist(self, c_code):
+        """
+        :param c_code: codelist c-code
+        :return: Codelist named tuple or None if the codelist is not in the release
+        """
+        row = self.connection.execute("SELECT c_code, name, submission_value, extensible FROM codelist "
+                                      "WHERE c_code = ?", (c_code,)).fetchone()
+        return Codelist(*row) if row else None
+
+    def _get_term(self, codelist_c_code, c_code):
+        """
+        :param codelist_c_code: codelist c-code
+        :param c_code: term c-code
+        :return: CtTerm named tuple or None if the term is not in the codelist
+        """
+        row = self.connection.execute("SELECT codelist_c_code, c_code, submission_value, preferred_term FROM term "
+                                      "WHERE codelist_c_code = ? AND c_code = ?", (codelist_c_code, c_code)).fetchone()
+        return CtTerm(*row) if row else None
+
+    def _get_term_codelists(self, c_code):
+        """
+        :param c_code: term c-code
+        :return: tuple of the c-codes of the codelists that include the term
+        """
+        rows = self.connection.execute("SELECT codelist_c_code FROM term WHERE c_code = ?", (c_code,)).fetchall()
+        return tuple(row[0] for row in rows)
+
+    def has_c_code(self, c_code):
+        """
+        :param c_code: c-code of a codelist or term
+        :return: True if the c-code is a codelist or a term in the release
+        """
+        return self.get_codelist(c_code) is not None or bool(self.get_term_codelists(c_code))
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def open_store(db_file, release_files=None, cache_size=DEFAULT_CACHE_SIZE):
+    """
+    open the CT store, building it first when it does not exist or a release file has changed since it was built
+    :param db_file: SQLite database file name
+    :param release_files: list of CT release text or Excel files the store is built from
+    :param cache_size: number of lookups of each kind kept in memory
+    :return: CTStore
+    """
+    if release_files and get_release_sources(release_files) != _read_sources(db_file):
+        build_store(db_file, release_files)
+    elif not os.path.exists(db_file):
+        raise FileNotFoundError(f"the CT store {db_file} does not exist; build it from a CT release first")
+    return CTStore(db_file, cache_size)
+
+
+def get_release_sources(release_files):
+    """
+    :param release_files: list of CT release file names
+    :return: list of [file name, size, modification time] lists identifying the release files
+    """
+    sources = []
+    for release_file in release_files:
+        stat = os.stat(release_file)
+        sources.append([os.path.abspath(release_file), stat.st_size, stat.st_mtime_ns])
+    return sources
+
+
+def _read_sources(db_file):
+    """
+    :param db_file: SQLite database file name
+    :return: the release sources the database was built from, or None if it does not exist or has an older schema
+    """
+    if not os.path.exists(db_file):
+        return None
+    try:
+        with contextlib.closing(sqlite3.connect(db_file)) as connection:
+            release = dict(connection.execute("SELECT key, value FROM release").fetchall())
+    except sqlite3.Error:
+        return None
+    if release.get("schema_version") != SCHEMA_VERSION:
+        return None
+    return json.loads(release.get("sources", "null"))
+
+
+def build_store(db_file, release_files):
+    """
+    convert CT release files into a SQLite database; the database is written to a temporary file and then replaces
+    the existing database so readers never see a partly built store
+    :param db_file: SQLite database file name
+    :param release_files: list of CT release text (.txt) or Excel (.xls, .xlsx) files
+    """
+    temp_file = db_file + ".tmp"
+    if os.path.exists(temp_file):
+        os.remove(temp_file)
+    connection = sqlite3.connect(temp_file)
+    try:
+        connection.executescript(SCHEMA)
+        for release_file in release_files:
+            _load_release(connection, read_release_rows(release_file))
+        connection.executemany("INSERT INTO release VALUES (?, ?)",
+                               [("schema_version", SCHEMA_VERSION),
+                                ("sources", json.dumps(get_release_sources(release_files)))])
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_file, db_file)
+
+
+def _load_release(connection, rows):
+    """
+    :param connection: SQLite connection to the database being built
+    :param rows: iterator of release rows as dictionaries keyed by RELEASE_COLUMNS keys
+    """
+    codelists, terms = [], []
+    for row in rows:
+        if row["codelist_c_code"]:
+            terms.append((row["codelist_c_code"], row["c_code"], row["submission_value"], row["preferred_term"]))
+        else:
+            codelists.append((row["c_code"], row["codelist_name"], row["submission_value"], row["extensible"]))
+    connection.executemany("INSERT OR REPLACE INTO codelist VALUES (?, ?, ?, ?)", codelists)
+    connection.executemany("INSERT OR REPLACE INTO term VALUES (?, ?, ?, ?)", terms)
+
+
+def read_release_rows(release_file):
+    """
+    read the rows of a CT release; codelist rows have an empty codelist code
+    :param release_file: CT release text (.txt) or Excel (.xls, .xlsx) file
+    :return: iterator of dictionaries keyed by RELEASE_COLUMNS keys
+    """
+    if release_file.lower().endswith((".xls", ".xlsx")):
+        rows = _read_excel_rows(release_file)
+    else:
+        rows = _read_text_rows(release_file)
+    header = [str(column).strip() for column in next(rows)]
+    missing = [name for name in RELEASE_COLUMNS.values() if name not in header]
+    if missing:
+        raise ValueError(f"the CT release {release_file} has no {', '.join(missing)} columns")
+    columns = {key: header.index(name) for key, name in RELEASE_COLUMNS.items()}
+    for row in rows:
+        if len(row) >= len(header) and str(row[columns["c_code"]]).strip():
+            yield {key: str(row[index]).strip() for key, index in columns.items()}
+
+
+def _read_text_rows(release_file):
+    with open(release_file, "r", encoding="utf-8", errors="replace", newline="") as f:
+        yield from csv.reader(f, delimiter="\t")
+
+
+def _read_excel_rows(release_file):
+    """
+    read the rows of the first worksheet with the release columns
+    :param release_file: CT release Excel file
+    :return: iterator of lists of cell values
+    """
+    import xlrd                             # imported here so text releases and CT lookups do not load it
+    workbook = xlrd.open_workbook(release_file, on_demand=True)
+    try:
+        for sheet in workbook.sheets():
+            if sheet.nrows and RELEASE_COLUMNS["codelist_c_code"] in [str(value).strip()
+                                                                      for value in sheet.row_values(0)]:
+                for row_number in range(sheet.nrows):
+                    yield sheet.row_values(row_number)
+                return
+        raise ValueError(f"the CT release {release_file} has no worksheet with the release columns")
+    finally:
+        workbook.release_resources()
+
+
+def validate_cmap(store, cmap):
+    """
+    check the label, CT subset and term c-codes of a loaded CMAP against the CT store and add a Diagnostic to the
+    CMAP's diagnostics for each one that is not in the release
+    :param store: CTStore
+    :param cmap: the graph created from the CMAP CXL file
+    """
+    diagnostics = cmap.diagnostics
+    for vertex in cmap.vertexes.values():
+        if vertex.c_code and C_CODE_PATTERN.match(vertex.c_code) and not store.has_c_code(vertex.c_code):
+            diagnostics.append(PARSE.Diagnostic(vertex.id, "label", "c-code is not in the CT release", vertex.label))
+        if vertex.ct_subset is not None:
+            _validate_subset(store, vertex, diagnostics)
+
+
+def _validate_subset(store, vertex, diagnostics):
+    """
+    check the codelist of a CT subset and that each term is in the codelist with the same submission value; when the
+    subset has no codelist each term only has to be in the release
+    :param store: CTStore
+    :param vertex: vertex with a CT subset
+    :param diagnostics: list the Diagnostics are added to
+    """
+    ct_subset = vertex.ct_subset
+    codelist = CTI.get_codelist(vertex)
+    if codelist is None and ct_subset.c_code and store.get_codelist(ct_subset.c_code):
+        codelist = ct_subset.c_code                 # the subset is the whole codelist
+    if codelist and store.get_codelist(codelist) is None:
+        diagnostics.append(PARSE.Diagnostic(vertex.id, "label", f"codelist {codelist} is not in the CT release",
+                                            vertex.label))
+        codelist = None
+    for ct_term in ct_subset.terms:
+        if codelist:
+            release_term = store.get_term(codelist, ct_term.c_code)
+            if release_term is None:
+                diagnostics.append(PARSE.Diagnostic(vertex.id, "long-comment", f"CT term is not in codelist "
+                                                    f"{codelist}", ct_term.label))
+            elif release_term.submission_value != ct_term.sub_val:
+                diagnostics.append(PARSE.Diagnostic(vertex.id, "long-comment", f"CT term submission value is "
+                                                    f"{release_term.submission_value} in the CT release",
+                                                    ct_term.label))
+        elif not store.get_term_codelists(ct_term.c_code):
+            diagnostics.append(PARSE.Diagnostic(vertex.id, "long-comment", "CT term is not in the CT release",
+                                                ct_term.label))
+
+
+def set_cmd_line_args():
+    """
+    Example: SDTM_Terminology.txt -o ct.sqlite
+    :return: argparse object with command-line parameters
+    """
+    parser = argparse.ArgumentParser(description="build a CT store from CDISC Controlled Terminology release files")
+    parser.add_argument("release_files", nargs="+", help="CT release text (.txt) or Excel (.xls, .xlsx) files")
+    parser.add_argument("-o", "--ct_store", dest="ct_store", help="SQLite CT store file to create", required=True)
+    return parser.parse_args()
+
+
+def main():
+    args = set_cmd_line_args()
+    build_store(args.ct_store, args.release_files)
+    with contextlib.closing(sqlite3.connect(args.ct_store)) as connection:
+        codelists = connection.execute("SELECT COUNT(*) FROM codelist").fetchone()[0]
+        terms = connection.execute("SELECT COUNT(*) FROM term").fetchone()[0]
+    print(f"created {args.ct_store} with {codelists} codelists and {terms} terms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import glob
+import json
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import configuration as CFG
+import cxl_load as LOAD
+import graph_analysis as GA
+import bc_factory as BCF
+
+"""
+cxl_batch processes a corpus of CMAP CXL exports in a single program run. The CXL files are given as a directory, a
+glob pattern, or a JSON manifest that lists each CXL file with the name of its root concept. Each CXL file is
+processed in a worker process and the outputs for each CMAP are written to their own sub-directory of the output path.
+Example manifest:
+[{"cxl_file": "VS-SYSBP-Metamodel3.cxl", "concept_name": "Systolic Blood Pressure (C0005823)"}]
+"""
+
+BatchJob = namedtuple("BatchJob", "cxl_file concept_name output_path")
+BatchResult = namedtuple("BatchResult", "cxl_file status seconds error summary bc ct diagnostics",
+                         defaults=(None, None, None, None))
+
+_worker_config = None                  # configuration loaded once per worker process
+
+
+def get_batch_jobs(batch_source, output_root):
+    """
+    create the list of CXL files to process from a directory, glob pattern or JSON manifest
+    :param batch_source: directory, glob pattern or JSON manifest file name
+    :param output_root: directory in which a sub-directory is created for the output of each CMAP
+    :return: list of BatchJob named tuples
+    """
+    if os.path.isdir(batch_source):
+        cxl_files = [(f, None) for f in sorted(glob.glob(os.path.join(batch_source, "*.cxl")))]
+    elif batch_source.lower().endswith(".json"):
+        cxl_files = _read_manifest(batch_source)
+    else:
+        cxl_files = [(f, None) for f in sorted(glob.glob(batch_source))]
+    jobs = []
+    for cxl_file, concept_name in cxl_files:
+        cmap_name = os.path.splitext(os.path.basename(cxl_file))[0]
+        concept_name = concept_name if concept_name else cmap_name
+        jobs.append(BatchJob(os.path.abspath(cxl_file), concept_name, os.path.join(output_root, cmap_name)))
+    return jobs
+
+
+def _read_manifest(manifest_file):
+    """
+    read the CXL file names and root concept names from a JSON manifest; relative CXL file names are relative to the
+    directory of the manifest
+    :param manifest_file: JSON manifest file name
+    :return: list of (cxl file name, concept name) tuples
+    """
+    with open(manifest_file, "r") as f:
+        manifest = json.load(f)
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_file))
+    return [(os.path.join(manifest_dir, entry["cxl_file"]), entry.get("concept_name")) for entry in manifest]
+
+
+def run_batch(jobs, cfg_path, workers=None, load_options=None, corpus_report=None, bc_bundle=None, outputs=None,
+              ct_index=None):
+    """
+    process the CXL files in a pool of worker processes and report the status of each file as it completes
+    :param jobs: list of BatchJob named tuples
+    :param cfg_path: directory containing the configuration file
+    :param workers: number of worker processes (defaults to the number of CPUs)
+    :param load_options: dictionary of keyword arguments for cxl_load.load_cmap
+    :param corpus_report: CorpusReport the summary of each loaded CMAP is added to; closed when the batch ends
+    :param bc_bundle: BCBundle the BC of each loaded CMAP is written to; closed when the batch ends
+    :param outputs: list of cxl_load.OUTPUT_WRITERS names to create for each CMAP (default all)
+    :param ct_index: TerminologyIndex the CT subsets of each loaded CMAP are added to
+    :return: list of BatchResult named tuples
+    """
+    start = time.perf_counter()
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cfg_path,)) as executor:
+            futures = [executor.submit(process_job, job, load_options, corpus_report is not None,
+                                       bc_bundle is not None, outputs, ct_index is not None) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result._replace(summary=None, bc=None, ct=None))
+                print_result(result)
+                if result.summary:
+                    corpus_report.add_summary(result.summary)
+                if result.bc:
+                    bc_bundle.add(*result.bc)
+                if result.ct:
+                    ct_index.add_subsets(*result.ct)
+    finally:
+        # write the CMAPs completed so far if a worker process fails
+        if corpus_report:
+            corpus_report.close()
+        if bc_bundle:
+            bc_bundle.close()
+    print_summary(results, start)
+    return results
+
+
+def init_worker(cfg_path):
+    """
+    load the configuration once for each worker process; used as the initializer of the batch, pipeline, service and
+    conformance worker pools
+    :param cfg_path: directory containing the configuration file
+    """
+    global _worker_config
+    _worker_config = CFG.Configuration(None, "", path=cfg_path)
+
+
+def get_worker_config():
+    """
+    :return: the configuration loaded by init_worker in this worker process
+    """
+    return _worker_config
+
+
+def process_job(job, load_options=None, summarize=False, bundle_bc=False, outputs=None, index_ct=False):
+    """
+    load a single CXL file and generate the GraphML, report and BC outputs for it
+    :param job: BatchJob named tuple
+    :param load_options: dictionary of keyword arguments for cxl_load.load_cmap
+    :param summarize: return the corpus report summary of the loaded CMAP in the result
+    :param bundle_bc: return the serialized BC in the result for the BC bundle instead of writing a BC file
+    :param outputs: list of cxl_load.OUTPUT_WRITERS names to create (default all)
+    :param index_ct: return the CT subsets of the loaded CMAP in the result for the terminology index
+    :return: BatchResult named tuple with the graph's diagnostics, including the CT store validation diagnostics
+    """
+    start = time.perf_counter()
+    try:
+        os.makedirs(job.output_path, exist_ok=True)
+        config = get_worker_config().for_cmap(job.concept_name, job.cxl_file, job.output_path)
+        cmap_graph = LOAD.load_cmap(config, **(load_options if load_options else {}))
+        GA.analyze_cmap(cmap_graph)
+        diagnostics = list(cmap_graph.diagnostics)
+        outputs = [output for output in (outputs if outputs else LOAD.OUTPUT_WRITERS)
+                   if not (bundle_bc and output == "bc")]
+        output_results = LOAD.create_outputs(cmap_graph, config, outputs) if outputs else []
+        summary = None
+        if summarize:
+            import corpus_report as CORP
+            summary = CORP.CorpusReport.summarize(os.path.basename(job.output_path), cmap_graph, config)
+        bc = _serialize_bc(cmap_graph, config) if bundle_bc else None
+        ct = None
+        if index_ct:
+            import ct_index as CTI
+            ct = CTI.get_cmap_subsets(cmap_graph)
+    except Exception as e:
+        return BatchResult(job.cxl_file, "FAILED", time.perf_counter() - start, f"{type(e).__name__}: {e}")
+    errors = [f"{result.output} {result.error}" for result in output_results if result.error]
+    if errors:
+        return BatchResult(job.cxl_file, "FAILED", time.perf_counter() - start, "; ".join(errors), summary, bc, ct,
+                           diagnostics)
+    return BatchResult(job.cxl_file, "OK", time.perf_counter() - start, None, summary, bc, ct, diagnostics)
+
+
+def _serialize_bc(cmap_graph, config):
+    """
+    create the BC in the worker process so only the serialized BC is returned to the main process
+    :param cmap_graph: the graph created from the cmap cxl file
+    :param config: configuration object with config parameters
+    :return: tuple of the BC conceptId and the BC serialized as JSON
+    """
+    bc = BCF.BCFactory(cmap_graph, config).create_bc()
+    return bc.conceptId, bc.serialize_json()
+
+
+def print_result(result):
+    """
+    print the status and diagnostics of a processed CXL file
+    :param result: BatchResult named tuple
+    """
+    if result.error:
+        print(f"{result.status} {result.cxl_file} ({result.seconds:.2f}s): {result.error}")
+    else:
+        print(f"{result.status} {result.cxl_file} ({result.seconds:.2f}s)")
+    LOAD.print_diagnostics(result.diagnostics if result.diagnostics else [], "    ")
+
+
+def print_summary(results, start):
+    """
+    print the number of CXL files processed, failed and with diagnostics
+    :param results: list of BatchResult named tuples
+    :param start: time the batch was started
+    """
+    failed = len([result for result in results if result.status != "OK"])
+    diagnostics = [result.diagnostics for result in results if result.diagnostics]
+    print(f"processed {len(results)} CXL files ({failed} failed, {len(diagnostics)} with "
+          f"{sum(len(d) for d in diagnostics)} diagnostics) in {time.perf_counter() - start:.2f} seconds")
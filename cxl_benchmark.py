@@ -0,0 +1,224 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import configuration as CFG
+import cxl_cmap as CMAP
+import cxl_generator as GEN
+import graphml_writer as GML
+import bc_factory as BCF
+
+"""
+cxl_benchmark times each stage of processing a CMAP on synthetic CXL files of increasing size. Each stage is run
+several times and the fastest time is kept. The results are saved as JSON so a later run can be compared with a
+baseline. For each stage the scaling exponent between sizes is reported: about 1 is linear, about 2 is quadratic.
+Examples:
+python cxl_benchmark.py -o benchmark.json
+python cxl_benchmark.py --sizes 100 1000 10000 100000 -r 1 -o benchmark.json --baseline benchmark-main.json
+"""
+
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_REPEATS = 3
+REGRESSION_THRESHOLD = 1.2                # a stage is flagged when it is this much slower than the baseline
+MIN_SECONDS = 0.01                        # stage times below this are mostly noise and are not compared
+
+
+class CxlBenchmark:
+    """
+    time the load, GraphML, report and BC stages on generated CMAPs
+    """
+    def __init__(self, config, work_dir, repeats=DEFAULT_REPEATS, seed=0):
+        """
+        :param config: a configuration object; the generated CXL files and outputs are written to work_dir
+        :param work_dir: directory for the generated CXL files and the outputs of each stage
+        :param repeats: number of times each stage is run
+        :param seed: random seed for the CXL generator
+        """
+        self.cfg = config
+        self.work_dir = work_dir
+        self.repeats = repeats
+        self.seed = seed
+        self.stages = [("load", self._load), ("graphml", self._graphml), ("report", self._report),
+                       ("bc_create", self._bc_create), ("bc_save", self._bc_save)]
+        if self._has_networkx():
+            self.stages.insert(2, ("network_graph", self._network_graph))
+
+    def run(self, sizes):
+        """
+        :param sizes: list of concept counts to generate CMAPs for
+        :return: dictionary of the benchmark results
+        """
+        results = []
+        for size in sizes:
+            results.append(self.run_size(size))
+            print_size_result(results[-1])
+        return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                "platform": platform.platform(), "repeats": self.repeats, "results": results,
+                "scaling": get_scaling(results)}
+
+    def run_size(self, size):
+        """
+        generate a CMAP with the given number of concepts and time each stage
+        :param size: number of concepts
+        :return: dictionary with the CMAP size and the time in seconds of each stage
+        """
+        cxl_file = os.path.join(self.work_dir, f"synthetic-{size}.cxl")
+        generator = GEN.CxlGenerator(self.cfg, size, seed=self.seed)
+        config = self.cfg.for_cmap(generator.save_cxl(cxl_file), cxl_file, self.work_dir)
+        state = {"config": config}
+        stages = {}
+        for name, stage in self.stages:
+            times = []
+            for n in range(self.repeats):
+                start = time.perf_counter()
+                stage(state)
+                times.append(time.perf_counter() - start)
+            stages[name] = min(times)
+        cmap = state["cmap"]
+        return {"concepts": generator.concept_count, "vertexes": len(cmap.vertexes),
+                "edges": sum(len(v.target) for v in cmap.vertexes.values()),
+                "cxl_bytes": os.path.getsize(cxl_file), "stages": stages}
+
+    @staticmethod
+    def _load(state):
+        state["cmap"] = CMAP.CxlCmap(state["config"])
+        state["cmap"].load()
+
+    @staticmethod
+    def _network_graph(state):
+        import network_graph as NG
+        graph = NG.NetworkGraph(state["cmap"])
+        graph.save_graphml(state["config"].graphml_file)
+
+    @staticmethod
+    def _graphml(state):
+        GML.GraphMLWriter(state["cmap"]).save_graphml(state["config"].graphml_file)
+
+    @staticmethod
+    def _report(state):
+        import cxl_report as REP
+        REP.CxlReport(state["cmap"], state["config"]).create_report()
+
+    @staticmethod
+    def _bc_create(state):
+        state["bc"] = BCF.BCFactory(state["cmap"], state["config"]).create_bc()
+
+    @staticmethod
+    def _bc_save(state):
+        BCF.BCFactory(state["cmap"], state["config"]).save_bc(state["bc"])
+
+    @staticmethod
+    def _has_networkx():
+        try:
+            import networkx
+        except ImportError:
+            return False
+        return True
+
+
+def get_scaling(results):
+    """
+    estimate how each stage scales with the CMAP size as the exponent k in time = c * size ** k between successive
+    sizes; stages faster than MIN_SECONDS are skipped
+    :param results: list of size results ordered by size
+    :return: dictionary of lists of exponents keyed by stage name
+    """
+    scaling = {}
+    for smaller, larger in zip(results, results[1:]):
+        for stage, seconds in larger["stages"].items():
+            base_seconds = smaller["stages"].get(stage)
+            if not base_seconds or base_seconds < MIN_SECONDS or larger["concepts"] == smaller["concepts"]:
+                continue
+            exponent = math.log(seconds / base_seconds) / math.log(larger["concepts"] / smaller["concepts"])
+            scaling.setdefault(stage, []).append(round(exponent, 2))
+    return scaling
+
+
+def compare_results(results, baseline):
+    """
+    compare the stage times with a baseline run of the same sizes
+    :param results: benchmark results dictionary
+    :param baseline: benchmark results dictionary of an earlier run
+    :return: list of (concepts, stage, baseline seconds, seconds) tuples for the stages slower than the threshold;
+    stages faster than MIN_SECONDS are not compared
+    """
+    baseline_sizes = {result["concepts"]: result["stages"] for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        for stage, seconds in result["stages"].items():
+            base_seconds = baseline_sizes.get(result["concepts"], {}).get(stage)
+            if base_seconds and seconds >= MIN_SECONDS and seconds > base_seconds * REGRESSION_THRESHOLD:
+                regressions.append((result["concepts"], stage, base_seconds, seconds))
+    return regressions
+
+
+def print_size_result(result):
+    """
+    print the stage times for one CMAP size
+    :param result: size result dictionary
+    """
+    stages = ", ".join(f"{stage} {seconds:.4f}s" for stage, seconds in result["stages"].items())
+    print(f"{result['concepts']} concepts ({result['cxl_bytes']} bytes): {stages}")
+
+
+def set_cmd_line_args():
+    """
+    Example: --sizes 100 1000 10000 -o benchmark.json
+    :return: argparse object with command-line parameters
+    """
+    parser = argparse.ArgumentParser(description="time each stage of CMAP processing on synthetic CXL files")
+    parser.add_argument("--sizes", dest="sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of concepts in the generated CMAPs", required=False)
+    parser.add_argument("-r", "--repeats", dest="repeats", type=int, default=DEFAULT_REPEATS, help="Number of times each stage is run", required=False)
+    parser.add_argument("-d", "--file_path", dest="file_path", help="Directory of the configuration file", required=False)
+    parser.add_argument("-w", "--work_path", dest="work_path", help="Directory for the generated CXL files and outputs (default a temporary directory)", required=False)
+    parser.add_argument("-o", "--results_file", dest="results_file", help="JSON file the results are saved to", required=False)
+    parser.add_argument("--baseline", dest="baseline", help="JSON results file of an earlier run to compare with", required=False)
+    parser.add_argument("--seed", dest="seed", type=int, default=0, help="Random seed for the generated CMAPs", required=False)
+    return parser.parse_args()
+
+
+def main():
+    args = set_cmd_line_args()
+    cfg_path = args.file_path if args.file_path else CFG.DATA_PATH
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.work_path if args.work_path else temp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        config = CFG.Configuration(None, "", path=cfg_path, output_path=work_dir)
+        results = CxlBenchmark(config, work_dir, args.repeats, args.seed).run(sorted(args.sizes))
+    for stage, exponents in results["scaling"].items():
+        print(f"{stage} scaling exponents: {exponents}")
+    if args.results_file:
+        with open(args.results_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_results(results, json.load(f))
+        for concepts, stage, base_seconds, seconds in regressions:
+            print(f"REGRESSION {stage} at {concepts} concepts: {base_seconds:.4f}s -> {seconds:.4f}s")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
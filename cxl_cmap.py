@@ -20,6 +20,8 @@ import vertex as V
 from collections import namedtuple
 import concept_type as TYPE
 import subset as SUB
+import concept_parser as PARSE
+import stage_profiler as SP
 
 """
 Rules:
@@ -28,77 +30,140 @@ Rules:
 """
 
 DEFAULT_NS = {"cxl": "http://cmap.ihmc.us/xml/cmap/"}
+CXL_NS = "{http://cmap.ihmc.us/xml/cmap/}"
 Connection = namedtuple("Connection", "id from_id to_id")
 
 class CxlCmap:
     """
     parse the CMAP CXL file and create a graph from the nodes and relationships
     """
-    def __init__(self, config):
+    def __init__(self, config, cxl_source=None):
         """
         :param config: a configuration object that provides access to the program's config setting
+        :param cxl_source: CXL file name or binary file object to parse instead of the config data file (e.g. an
+        uploaded CXL export held in memory)
         """
-        self.cxl_file = config.data_file                           # CXL CMAP export to parse
+        self.cxl_file = cxl_source if cxl_source is not None else config.data_file  # CXL CMAP export to parse
         self.skip_concepts = config.config["skip_concept_labels"]  # list of concepts in the CMAP that are not used and skipped
         self.config = config                                       # configuration object
         self.vertexes = {}                                         # concepts represented as a node in a graph
         self.linking_phrase = {}
         self.keys = {}                                             # legend keys - not part of the graph
-        self.connection = {}
+        self.connection = {}                                       # connections keyed by (from id, to id)
+        self.connection_from = {}                                  # connected to ids keyed by from id
+        self.connection_to = {}                                    # connected from ids keyed by to id
+        self.appearances = {}                                      # concept appearances indexed by concept id
         self.concepts = []
-        self.iter_count = 0
+        self.diagnostics = []                                      # Diagnostic named tuples for unparsable text
         self.cxl_root = None
         self.key_id = None
 
-    def load(self):
+    def load(self, profiler=None):
         """
         parse the CMAP CXL file and create a graph from the concepts and relationships
+        :param profiler: StageProfiler that records the parse, concepts, node typing and edge wiring stages
         :return: a list of concept ids
         """
-        cxl_tree = self._parse_cxl_file()
-        cxl_root = self._load_root(cxl_tree)
-        map_elem = self._get_map_elem(cxl_root)
-        self._set_key_id(map_elem)
-        self.concepts = self._load_concepts(map_elem)
-        self._add_node_types(map_elem)
-        self._load_parent_edges()
-        self._load_linking_phrases(map_elem)
-        self._load_connection_edges(map_elem)
-        self._add_connections()                                    # add source and targets to vertexes
+        with SP.profile_stage(profiler, "parse"):
+            cxl_tree = self._parse_cxl_file()
+            cxl_root = self._load_root(cxl_tree)
+            map_elem = self._get_map_elem(cxl_root)
+            elements = (map_elem.findall("./cxl:concept-list/cxl:concept", DEFAULT_NS),
+                        map_elem.findall("./cxl:linking-phrase-list/cxl:linking-phrase", DEFAULT_NS),
+                        map_elem.findall("./cxl:connection-list/cxl:connection", DEFAULT_NS),
+                        TYPE.ConceptType.load_appearances(map_elem))
+        self._build_graph(*elements, profiler=profiler)
         return self.concepts
 
-    def __iter__(self):
+    def load_streaming(self, profiler=None):
         """
-        create an interator to iterate over the vertexes in the CMAP graph
+        parse the CMAP CXL file incrementally and create a graph from the concepts and relationships; elements are
+        discarded as soon as they are read so the layout metadata in large CXL exports is never held in memory
+        :param profiler: StageProfiler that records the parse, concepts, node typing and edge wiring stages
+        :return: a list of concept ids
         """
-        return self
+        with SP.profile_stage(profiler, "parse"):
+            elements = self._stream_cxl_file()
+        self._build_graph(*elements, profiler=profiler)
+        return self.concepts
 
-    def __next__(self):
+    def _build_graph(self, concepts, links, connections, appearances, profiler=None):
+        """
+        create the graph from the concept, linking phrase and connection elements (or their attribute dictionaries)
+        :param concepts: list of CXL concept elements
+        :param links: list of CXL linking-phrase elements
+        :param connections: list of CXL connection elements
+        :param appearances: dictionary of Appearance named tuples with the concept id as the key
+        :param profiler: StageProfiler that records the concepts, node typing and edge wiring stages
+        """
+        with SP.profile_stage(profiler, "concepts"):
+            self._set_key_id(concepts)
+            self.concepts = self._load_concepts(concepts)
+        with SP.profile_stage(profiler, "node typing"):
+            self._add_node_types(appearances)
+        with SP.profile_stage(profiler, "edge wiring"):
+            self._load_parent_edges()
+            self._load_linking_phrases(links)
+            self._load_connection_edges(connections)
+            self._add_connections()                                # add source and targets to vertexes
+
+    def __getstate__(self):
+        """
+        flatten the vertex source and target references to concept ids so that pickling a large graph does not
+        recurse from vertex to vertex; the configuration is not pickled, it is reattached by the code that unpickles
+        the graph
+        :return: dictionary of the object state
+        """
+        state = self.__dict__.copy()
+        state["config"] = None
+        state["vertexes"] = [({key: value for key, value in vars(v).items() if key not in ("source", "target")},
+                              [(node.id, link) for node, link in v.source],
+                              [(node.id, link) for node, link in v.target]) for v in self.vertexes.values()]
+        return state
+
+    def __setstate__(self, state):
+        """
+        restore the object state and rebuild the vertex source and target references
+        :param state: dictionary of the object state created by __getstate__
+        """
+        vertex_states = state.pop("vertexes")
+        self.__dict__.update(state)
+        self.vertexes = {}
+        for attrs, source, target in vertex_states:
+            node = V.Vertex.__new__(V.Vertex)
+            node.__dict__.update(attrs)
+            self.vertexes[node.id] = node
+        for attrs, source, target in vertex_states:
+            node = self.vertexes[attrs["id"]]
+            node.source = [(self.vertexes[id], link) for id, link in source]
+            node.target = [(self.vertexes[id], link) for id, link in target]
+
+    def __iter__(self):
         """
-        iterator that gets the next Vertex object in the vertex dictionary using the concepts list as keys
-        :return: a Vertex object
+        create an iterator over the Vertex objects in the CMAP graph in the order of the concepts list; each iterator
+        is independent so the graph can be read by several output writers at the same time
+        :return: Vertex iterator
         """
-        if self.iter_count >= len(self.vertexes.keys()):
-            raise StopIteration
-        node = self.vertexes[self.concepts[self.iter_count]]
-        self.iter_count += 1
-        return node
+        return (self.vertexes[concept_id] for concept_id in self.concepts)
 
-    def _load_connection_edges(self, map_elem):
+    def _load_connection_edges(self, connections):
         """
-        load all the connections in the connection dictionary as Connection named tuples
-        :param map_elem: a CXL map element used to find all the connections
+        load all the connections in the connection dictionary as Connection named tuples and index them by from-id
+        and to-id so that the connected nodes of a linking phrase can be looked up directly
+        :param connections: the CXL connection elements
         """
-        for c in map_elem.findall("./cxl:connection-list/cxl:connection", DEFAULT_NS):
+        for c in connections:
             connect = Connection(c.get("id"), c.get("from-id"), c.get("to-id"))
-            self.connection[c.get("from-id") + "." + c.get("to-id")] = connect
+            if (connect.from_id, connect.to_id) not in self.connection:
+                self.connection_from.setdefault(connect.from_id, []).append(connect.to_id)
+                self.connection_to.setdefault(connect.to_id, []).append(connect.from_id)
+            self.connection[(connect.from_id, connect.to_id)] = connect
 
     def _add_connections(self):
         """
         add the connections as source and target nodes for nodes in the graph with the associated linking phrase
         """
-        for connect_ids, connection in self.connection.items():
-            from_id, to_id = connect_ids.split(".")
+        for (from_id, to_id), connection in self.connection.items():
             if from_id in self.vertexes and to_id in self.vertexes:
                 # case of dotted line direct connection
                 # TODO - not sure what this line means - how do we intpret it
@@ -116,28 +181,31 @@ class CxlCmap:
                 from_node.add_target(to_node, self.linking_phrase[from_id])
                 to_node.add_source(from_node, self.linking_phrase[from_id])
             else:
-                raise ValueError(f"ID not in to_id or from_id: {from_node.label} to node {to_node.label} with link: {self.linking_phrase[from_id]}")
+                raise ValueError(f"ID not in to_id or from_id: connection {connection.id} from {from_id} to {to_id}")
 
     def _get_connected_from_node(self, from_id):
-        return [self.vertexes[connection.from_id] for connection in self.connection.values() if connection.to_id == from_id][0]
+        """
+        :param from_id: linking phrase id
+        :return: the first vertex connected to the linking phrase
+        """
+        return self.vertexes[self.connection_to[from_id][0]]
 
     def _get_connected_to_node(self, to_id):
-        return [self.vertexes[connection.to_id] for connection in self.connection.values() if connection.from_id == to_id][0]
+        """
+        :param to_id: linking phrase id
+        :return: the first vertex the linking phrase connects to
+        """
+        return self.vertexes[self.connection_from[to_id][0]]
 
     def _get_connected_from_link(self, from_id, to_id):
-        from_link = None
-        for connect_ids, connection  in self.connection.items():
-            if connection.to_id == to_id and connection.from_id == from_id:
-                from_link = self.linking_phrase[connection.from_id]
-                break;
-        return from_link
+        return self.linking_phrase[from_id] if (from_id, to_id) in self.connection else None
 
-    def _load_linking_phrases(self, map_elem):
+    def _load_linking_phrases(self, links):
         """
         load the linking phrases in the CMAP CXL file for each given relationship between concepts
-        :param map_elem: the CMAP CXL file map element
+        :param links: the CXL linking-phrase elements
         """
-        for link in map_elem.findall("./cxl:linking-phrase-list/cxl:linking-phrase", DEFAULT_NS):
+        for link in links:
             self.linking_phrase[link.get("id")] = link.get("label")
 
     def _load_parent_edges(self):
@@ -149,25 +217,29 @@ class CxlCmap:
                 v.add_source(self.vertexes[v.parent_id], "has attribute") # add parent vertex as source
                 self.vertexes[v.parent_id].add_target(v, "has attribute") # add vertex as target of parent
 
-    def _add_node_types(self, map_elem):
+    def _add_node_types(self, appearances):
         """
         assign the content type as determined by a ContentType object for each vertex; identify the root concept
-        :param map_elem: the map element in the CMAP CXL file
+        :param appearances: dictionary of Appearance named tuples with the concept id as the key
         """
+        self.appearances = appearances
         for id, v in self.vertexes.items():
-            c_type = TYPE.ConceptType(id, map_elem, self.config)
+            c_type = TYPE.ConceptType(id, self.appearances.get(id), self.config)
             v.type = c_type.type
             v.color = c_type.color
             if c_type.is_root_node():
                 v.is_root = True
+                if v.c_code is None:
+                    self.diagnostics.append(PARSE.Diagnostic(id, "label", "root concept label has no c-code", v.label))
 
-    def _load_concepts(self, map_elem):
+    def _load_concepts(self, concept_elems):
         """
-        create Vertex objects from each concept found in the CMAP except those with labels in the skip list
-        :param map_elem: a CXL map element used to find all the concepts in the CMAP
+        create Vertex objects from each concept found in the CMAP except those with labels in the skip list; the
+        label, short-comment and long-comment are parsed once here and the results are kept on the vertex
+        :param concept_elems: the CXL concept elements found in the CMAP
         """
         concepts = []
-        for c in map_elem.findall("./cxl:concept-list/cxl:concept", DEFAULT_NS):
+        for c in concept_elems:
             label = c.get("label")
             is_key = self._is_a_key(c)
             if is_key:
@@ -176,24 +248,21 @@ class CxlCmap:
                 concepts.append(c.get("id"))
                 attrs = self._get_additional_attributes(c)
                 node = V.Vertex(c.get("id"), label.replace('\n', ''), parent_id=c.get("parent-id"), **attrs)
+                node.concept_name, node.c_code = PARSE.parse_label(node.label)
                 self.vertexes[c.get("id")] = node
                 self._add_codelist_subset(c, node)
         return concepts
 
     def _get_additional_attributes(self, concept):
         """
-        additional attributes are formatted as newline delimitted json in the concept short-comment
+        additional attributes are formatted as newline delimitted name: value pairs in the concept short-comment
         :param concept: concept element from CMAP cxl file
         :return: dictionary with attribute name value pairs
         """
-        kwargs = {}
         attrs = concept.get("short-comment", "")
         if not attrs:
-            return kwargs
-        for key_value in attrs.split("\n"):
-            pair = key_value.split(":")
-            kwargs[pair[0]] = pair[1].strip()
-        return kwargs
+            return {}
+        return PARSE.parse_attributes(concept.get("id"), attrs, self.diagnostics)
 
     def _add_codelist_subset(self, concept, node):
         """
@@ -204,24 +273,14 @@ class CxlCmap:
         subset_terms = concept.get("long-comment", "")
         if not subset_terms:
             return              # no subset to add to the node
+        if node.c_code is None:
+            self.diagnostics.append(PARSE.Diagnostic(node.id, "label", "CT subset label has no c-code", node.label))
         # example long-comment on CD node: SITTING (C62122) default; SUPINE (C62167); STANDING (C62166)
-        cl_subset = SUB.Subset(c_code=node.label.split("(")[1].strip()[:-1], name=node.label.split("(")[0].strip())
-        for term_value in subset_terms.split(";"):
-            parts = self._parse_cd_subset(term_value)
-            cl_subset.add_term(c_code=parts[1], sub_val=parts[0], default=parts[2])
+        cl_subset = SUB.Subset(c_code=node.c_code, name=node.concept_name)
+        for term in PARSE.parse_subset_terms(node.id, subset_terms, self.diagnostics):
+            cl_subset.add_term(c_code=term.c_code, sub_val=term.sub_val, default=term.default)
         node.add_ct_subset(cl_subset)
 
-    def _parse_cd_subset(self, term_value):
-        subset = []
-        parts = term_value.strip().split("(")
-        subset.append(parts[0].strip())
-        subset.append(parts[1].strip().split(")")[0])
-        if "default" in parts[1].lower():
-            subset.append("Yes")
-        else:
-            subset.append("No")
-        return subset
-
     def _is_a_key(self, c):
         is_key = False
         if c.get("label") == "????":
@@ -230,23 +289,15 @@ class CxlCmap:
             is_key = True
         return is_key
 
-    def _set_key_id(self, map_elem):
+    def _set_key_id(self, concept_elems):
         """
         Sets key_id which is the Key Concept that is the parent of the individual keys. This assumes there is only
         one container box in the CMAP
-        :param map_elem: the map element in the CMAP CXL file
-        """
-        for c in map_elem.findall("./cxl:concept-list/cxl:concept[@label='????']", DEFAULT_NS):
-            self.key_id = c.get("id")
-
-    @staticmethod
-    def _get_name_ccode_from_label(label):
-        """
-        takes a CMAP concept label and creates separate name a c-code values in a named tuple
-        value in a named tuple
-        :param label: CD or DEC concept label formatted as "concept name (c-code)"
-        :return: named tuple with name and c_code components
+        :param concept_elems: the CXL concept elements found in the CMAP
         """
+        for c in concept_elems:
+            if c.get("label") == "????":
+                self.key_id = c.get("id")
 
     @staticmethod
     def _load_root(cxl_tree):
@@ -259,3 +310,29 @@ class CxlCmap:
     def _parse_cxl_file(self):
         ET.register_namespace('cxl', "http://cmap.ihmc.us/xml/cmap/")
         return ET.parse(self.cxl_file)
+
+    def _stream_cxl_file(self):
+        """
+        read the concepts, linking phrases, connections and concept appearances from the CXL file using iterparse;
+        only the attributes used to build the graph are kept and every element is removed from the tree once read
+        :return: tuple of concept attributes, linking phrase attributes, connection attributes and appearances
+        """
+        concepts, links, connections, appearances = [], [], [], {}
+        list_items = {CXL_NS + "concept-list": (CXL_NS + "concept", concepts),
+                      CXL_NS + "linking-phrase-list": (CXL_NS + "linking-phrase", links),
+                      CXL_NS + "connection-list": (CXL_NS + "connection", connections)}
+        parents = []
+        for event, elem in ET.iterparse(self.cxl_file, events=("start", "end")):
+            if event == "start":
+                parents.append(elem)
+                continue
+            parents.pop()
+            parent = parents[-1] if parents else None
+            if parent is not None and parent.tag in list_items and elem.tag == list_items[parent.tag][0]:
+                list_items[parent.tag][1].append(dict(elem.attrib))
+            elif parent is not None and parent.tag == CXL_NS + "concept-appearance-list":
+                appearances[elem.get("id")] = TYPE.ConceptType.get_appearance(elem)
+            elem.clear()
+            if parent is not None:
+                parent.remove(elem)
+        return concepts, links, connections, appearances
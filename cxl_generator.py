@@ -0,0 +1,210 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import argparse
+import random
+from xml.sax.saxutils import quoteattr
+import configuration as CFG
+
+"""
+cxl_generator writes synthetic CMAP CXL exports that follow the metamodel in cmap_config.json. Each map has one
+observation concept (root) with DECs linked by hasDEC. Each DEC has a role from the bc_roles setting and is linked
+by hasCD to a CD. The CDs of roles that need CT are enumerated, with CT subset terms in the long-comment, and are
+linked by isSubsetOf to a codelist. Concept appearances use the colors and shapes of the configured node types, so
+the generated maps load the same way as CMAPs exported from CmapTools.
+Example:
+python cxl_generator.py -n 10000 -o synthetic-10000.cxl
+"""
+
+ENUMERATED_ROLE_HANDLERS = ("units", "test_code", "test_name", "qualifier")
+DEFAULT_APPEARANCE = {"background_color": "237,244,246,255", "border_color": "0,0,0,255",
+                      "border_shape": "rounded-rectangle"}
+CXL_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<cmap xmlns:dcterms="http://purl.org/dc/terms/" xmlns="http://cmap.ihmc.us/xml/cmap/" \
+xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:vcard="http://www.w3.org/2001/vcard-rdf/3.0#">
+    <res-meta>
+        <dc:title>{title}</dc:title>
+        <dc:format>x-cmap/x-storable</dc:format>
+    </res-meta>
+    <map width="{width}" height="{height}">
+"""
+CXL_FOOTER = """    </map>
+</cmap>
+"""
+
+
+class CxlGenerator:
+    """
+    generate a synthetic CXL file with a given number of concepts
+    """
+    def __init__(self, config, concepts=100, terms_per_subset=4, seed=None):
+        """
+        :param config: a configuration object that provides the node types and BC roles of the metamodel
+        :param concepts: number of concepts in the generated CMAP (at least 3; may be exceeded by up to 2)
+        :param terms_per_subset: maximum number of CT terms in each CT subset
+        :param seed: random seed so the same CMAP can be generated again
+        """
+        self.cfg = config
+        self.concepts = max(3, concepts)
+        self.terms_per_subset = terms_per_subset
+        self.random = random.Random(seed)
+        self.node_types = {node_type.name: node_type for node_type in config.node_types}
+        self.roles = list(config.bc_roles.items())
+        self.concept_name = "Synthetic Observation (C900000)"
+        self._concepts = []                     # (id, label, short-comment, long-comment, node type name)
+        self._links = []                        # (id, label)
+        self._connections = []                  # (id, from id, to id)
+        self._next_id = 0
+
+    @property
+    def concept_count(self):
+        return len(self._concepts)
+
+    def save_cxl(self, file_name):
+        """
+        generate the CMAP and write it as CXL
+        :param file_name: CXL file name
+        :return: the root concept name of the generated CMAP
+        """
+        self._create_cmap()
+        with open(file_name, "w", encoding="utf-8") as f:
+            f.write(CXL_HEADER.format(title=f"Synthetic-{len(self._concepts)}", width=1600,
+                                      height=40 * len(self._concepts)))
+            self._write_list(f, "concept-list", self._concept_elements())
+            self._write_list(f, "linking-phrase-list", (f'<linking-phrase id="{id}" label="{label}"/>'
+                                                        for id, label in self._links))
+            self._write_list(f, "connection-list", (f'<connection id="{id}" from-id="{from_id}" to-id="{to_id}"/>'
+                                                    for id, from_id, to_id in self._connections))
+            self._write_list(f, "concept-appearance-list", self._concept_appearance_elements())
+            self._write_list(f, "linking-phrase-appearance-list", (
+                f'<linking-phrase-appearance id="{id}" x="{200 + 40 * (n % 30)}" y="{20 * n}" width="41" '
+                f'height="11"/>' for n, (id, label) in enumerate(self._links)))
+            self._write_list(f, "connection-appearance-list", (
+                f'<connection-appearance id="{id}" from-pos="center" to-pos="center" arrowhead="yes"/>'
+                for id, from_id, to_id in self._connections))
+            f.write(CXL_FOOTER)
+        return self.concept_name
+
+    def _create_cmap(self):
+        """
+        create the concepts, linking phrases and connections of the CMAP
+        """
+        self._concepts, self._links, self._connections = [], [], []
+        root_id = self._add_concept(self.concept_name, "", "", "root_concept")
+        n = 0
+        while len(self._concepts) < self.concepts:
+            role, handler = self.roles[n % len(self.roles)]
+            mandatory = "Yes" if self.random.random() < 0.5 else "No"
+            dec_id = self._add_concept(f"Synthetic {role} DEC {n} (DEC{n:06d})",
+                                       f"mandatory: {mandatory}\nrole: {role}", "", "dec")
+            self._add_relationship(root_id, "hasDEC", dec_id)
+            if handler in ENUMERATED_ROLE_HANDLERS:
+                terms = "; ".join(f"TERM{n}_{t} (C{n:06d}{t:02d})" + (" default" if t == 0 else "")
+                                  for t in range(self.random.randint(1, self.terms_per_subset)))
+                cd_id = self._add_concept(f"Synthetic CD {n} (C{n:06d}-001)", "cd_type: enumerated", terms, "cd")
+                codelist_id = self._add_concept(f"Synthetic Codelist {n} (C{n:06d})", "", "", "codelist")
+                self._add_relationship(cd_id, "isSubsetOf", codelist_id)
+            else:
+                cd_id = self._add_concept("Numeric" if handler == "result" else "text", "cd_type: described", "",
+                                          "cd")
+            self._add_relationship(dec_id, "hasCD", cd_id)
+            n += 1
+
+    def _add_concept(self, label, short_comment, long_comment, type_name):
+        """
+        :return: the id of the new concept
+        """
+        id = self._get_id("C")
+        self._concepts.append((id, label, short_comment, long_comment, type_name))
+        return id
+
+    def _add_relationship(self, from_id, link_label, to_id):
+        """
+        add a linking phrase and the connections from the source concept to it and from it to the target concept
+        """
+        link_id = self._get_id("L")
+        self._links.append((link_id, link_label))
+        self._connections.append((self._get_id("X"), from_id, link_id))
+        self._connections.append((self._get_id("X"), link_id, to_id))
+
+    def _get_id(self, prefix):
+        """
+        :param prefix: one letter prefix identifying the kind of CXL element
+        :return: a unique CXL element id
+        """
+        self._next_id += 1
+        return f"{prefix}{self._next_id:08X}-SYN"
+
+    def _concept_elements(self):
+        for id, label, short_comment, long_comment, type_name in self._concepts:
+            comments = ""
+            if short_comment or long_comment:
+                comments = f" short-comment={quoteattr(short_comment)} " \
+                           f"long-comment={quoteattr(long_comment)}"
+            yield f'<concept id="{id}" label={quoteattr(label)}{comments}/>'
+
+    def _concept_appearance_elements(self):
+        for n, (id, label, short_comment, long_comment, type_name) in enumerate(self._concepts):
+            appearance = dict(DEFAULT_APPEARANCE)
+            node_type = self.node_types.get(type_name)
+            for attribute in DEFAULT_APPEARANCE:
+                if node_type is not None and getattr(node_type, attribute):
+                    appearance[attribute] = getattr(node_type, attribute)
+            yield f'<concept-appearance id="{id}" x="{40 + 300 * (n % 5)}" y="{40 * (n // 5)}" width="200" ' \
+                  f'height="20" font-name="Verdana" font-size="12" font-color="0,0,0,255" text-margin="4" ' \
+                  f'background-color="{appearance["background_color"]}" ' \
+                  f'border-color="{appearance["border_color"]}" border-thickness="1" ' \
+                  f'border-shape="{appearance["border_shape"]}" border-shape-rrarc="15.0" shadow-color="none"/>'
+
+    @staticmethod
+    def _write_list(f, list_name, elements):
+        """
+        write a CXL list element
+        :param f: text stream
+        :param list_name: CXL list element name (e.g. concept-list)
+        :param elements: iterable of the XML text of the list items
+        """
+        f.write(f"        <{list_name}>\n")
+        for element in elements:
+            f.write(f"            {element}\n")
+        f.write(f"        </{list_name}>\n")
+
+
+def set_cmd_line_args():
+    """
+    Example: -n 10000 -o synthetic-10000.cxl
+    :return: argparse object with command-line parameters
+    """
+    parser = argparse.ArgumentParser(description="generate a synthetic CMAP CXL export for testing and benchmarks")
+    parser.add_argument("-n", "--concepts", dest="concepts", type=int, default=100, help="Number of concepts to generate", required=False)
+    parser.add_argument("-o", "--cxl_file", dest="cxl_file", help="Name of the cxl file to write", required=True)
+    parser.add_argument("-d", "--file_path", dest="file_path", help="Directory of the configuration file", required=False)
+    parser.add_argument("-t", "--terms", dest="terms", type=int, default=4, help="Maximum number of terms in each CT subset", required=False)
+    parser.add_argument("--seed", dest="seed", type=int, help="Random seed", required=False)
+    return parser.parse_args()
+
+
+def main():
+    args = set_cmd_line_args()
+    config = CFG.Configuration(None, "", path=args.file_path if args.file_path else CFG.DATA_PATH)
+    generator = CxlGenerator(config, args.concepts, args.terms, args.seed)
+    concept_name = generator.save_cxl(args.cxl_file)
+    print(f"wrote {generator.concept_count} concepts to {args.cxl_file}; root concept: {concept_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,11 +16,16 @@ TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR TH
 SOFTWARE.
 """
 import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
 import configuration as CFG
 import cxl_cmap as CMAP
-import network_graph as NETG
-import cxl_report as REP
-import bc_factory as BCF
+import cmap_cache as CC
+import stage_profiler as SP
+import graph_analysis as GA
 
 """
 cxl_load is intended to be an example program that loads and processes CMAP CXL exports as part of CDISC 360.
@@ -31,6 +36,12 @@ python cxl_load.py -f 360-bc-HbA1C.cxl -c "Glycosylated hemoglobin A1c assay"
 python cxl_load.py -f 360-bc-HbA1C.cxl -c "Glycosylated hemoglobin A1c assay" -d "c:\\cmaps\\cxl\\data"
 python cxl_load.py -f HbA1C-Berlin-2020-01-22-ws2.cxl -c "Hemoglobin A1C to Hemoglobin Ratio Measurement (C111207)"
 python cxl_load.py -f VS-SYSBP-Metamodel3.cxl -c "Systolic Blood Pressure (C0005823)"
+python cxl_load.py -f VS-SYSBP-Metamodel3.cxl -c "Systolic Blood Pressure (C0005823)" --outputs bc
+python cxl_load.py -b "c:\\cmaps\\cxl\\release" -o "c:\\cmaps\\output" -w 8
+python cxl_load.py -b "c:\\cmaps\\cxl\\release\\manifest.json"
+python cxl_load.py --serve 8360 -w 4
+python cxl_load.py -b "c:\\cmaps\\cxl\\release" --pipeline -w 6 --readers 2 --writers 3 --queue_size 8
+python cxl_load.py -b "c:\\cmaps\\cxl\\release" --bc_bundle "c:\\cmaps\\output\\bcs.ndjson.gz" --bc_bundle_gzip
 """
 
 
@@ -40,11 +51,130 @@ def main():
     to create a report of the BC contents, generate a graphML version for visualization,
     """
     args = set_cmd_line_args()
-    config = CFG.Configuration(args.concept_name, args.cxl_file)
-    cmap_graph = load_cmap(config)
-    create_network_graph(cmap_graph, config)
-    create_cmap_report(cmap_graph, config)
-    create_serialized_bc(cmap_graph, config)
+    cfg_path = args.file_path if args.file_path else CFG.DATA_PATH
+    if args.batch:
+        load_batch(args, cfg_path)
+        return
+    if args.watch:
+        watch_cmaps(args, cfg_path)
+        return
+    if args.serve:
+        import cmap_service as SERVICE
+        SERVICE.serve(cfg_path, args.host, args.serve, args.workers, args.queue_size)
+        return
+    config = CFG.Configuration(args.concept_name, args.cxl_file, path=cfg_path, output_path=args.output_path)
+    os.makedirs(config.output_path_dir, exist_ok=True)
+    profiler = SP.StageProfiler(args.profile_cprofile is not None) if args.profile else None
+    cmap_graph = load_cmap(config, profiler=profiler, **get_load_options(args))
+    with SP.profile_stage(profiler, "analysis"):
+        analysis = GA.analyze_cmap(cmap_graph)
+    print_diagnostics(cmap_graph.diagnostics)
+    if args.analysis_file:
+        with open(args.analysis_file, "w", encoding="utf-8") as f:
+            json.dump(analysis, f, indent=2)
+    if args.ct_index:
+        ct_index = get_ct_index(args)
+        ct_index.add_cmap(cmap_graph)
+        ct_index.save(args.ct_index)
+    outputs = [output for output in args.outputs if not (args.bc_bundle and output == "bc")]
+    if profiler:
+        results = [profile_output(profiler, output, cmap_graph, config) for output in outputs]
+    else:
+        results = create_outputs(cmap_graph, config, outputs, executor=args.output_executor,
+                                 workers=args.output_workers)
+    if args.bc_bundle and "bc" in args.outputs:
+        results.append(profile_output(profiler, "bc", cmap_graph, config, get_bc_bundle(args, append=True)))
+    if profiler:
+        profiler.add_counts(get_graph_counts(cmap_graph))
+        profiler.add_counts({"cycles": len(analysis["cycles"]), "components": analysis["components"],
+                             "unreachable": len(analysis["unreachable"])})
+        profiler.save(args.profile, args.profile_cprofile)
+    for result in results:
+        print_output_result(result)
+    if [result for result in results if result.status != "OK"]:
+        sys.exit(1)
+
+
+def load_batch(args, cfg_path):
+    """
+    process a corpus of CXL files in a pool of worker processes; exits with an error status if any file failed or
+    has diagnostics
+    :param args: argparse object with command-line parameters
+    :param cfg_path: directory containing the configuration file
+    """
+    import cxl_batch as BATCH
+    output_root = args.output_path if args.output_path else cfg_path
+    jobs = BATCH.get_batch_jobs(args.batch, output_root)
+    if args.pipeline:
+        import cmap_pipeline as PIPE
+        pipeline = PIPE.CmapPipeline(cfg_path, args.outputs, get_load_options(args), args.readers, args.workers,
+                                     args.writers, args.queue_size)
+        if [result for result in pipeline.run(jobs) if result.status != "OK" or result.diagnostics]:
+            sys.exit(1)
+        return
+    corpus_report = None
+    if args.corpus_report:
+        import corpus_report as CORP
+        os.makedirs(output_root, exist_ok=True)
+        corpus_report = CORP.CorpusReport(CFG.Configuration(None, "", path=cfg_path, output_path=output_root))
+    bc_bundle = get_bc_bundle(args) if args.bc_bundle and "bc" in args.outputs else None
+    ct_index = get_ct_index(args) if args.ct_index else None
+    results = BATCH.run_batch(jobs, cfg_path, args.workers, get_load_options(args), corpus_report, bc_bundle,
+                              args.outputs, ct_index)
+    if ct_index:
+        ct_index.save(args.ct_index)
+    if [result for result in results if result.status != "OK" or result.diagnostics]:
+        sys.exit(1)
+
+
+def watch_cmaps(args, cfg_path):
+    """
+    watch a directory of CXL files and regenerate the outputs of changed files until the program is interrupted
+    :param args: argparse object with command-line parameters
+    :param cfg_path: directory containing the configuration file
+    """
+    import cxl_watch as WATCH
+    watcher = WATCH.CxlWatcher(args.watch, cfg_path, args.output_path if args.output_path else args.watch,
+                               get_load_options(args), args.outputs)
+    watcher.run(args.poll_interval)
+
+
+def get_load_options(args):
+    """
+    :param args: argparse object with command-line parameters
+    :return: dictionary of the load_cmap keyword arguments set on the command-line
+    """
+    cache = CC.CmapCache(args.cache_dir, args.cache_size) if args.cache_dir else None
+    ct_store = None
+    if args.ct_store:
+        import ct_store as CTS
+        ct_store = CTS.open_store(args.ct_store, args.ct_release)
+    return {"streaming": args.streaming, "compact": args.compact, "cache": cache, "ct_store": ct_store}
+
+
+def get_ct_index(args):
+    """
+    :param args: argparse object with command-line parameters
+    :return: TerminologyIndex loaded from the --ct_index file, or a new index if the file does not exist
+    """
+    import ct_index as CTI
+    if os.path.exists(args.ct_index):
+        return CTI.TerminologyIndex.load(args.ct_index)
+    os.makedirs(os.path.dirname(os.path.abspath(args.ct_index)), exist_ok=True)
+    return CTI.TerminologyIndex()
+
+
+def get_bc_bundle(args, append=False):
+    """
+    :param args: argparse object with command-line parameters
+    :param append: add the BCs to an existing bundle instead of replacing it
+    :return: BCBundle the BCs are written to
+    """
+    import bc_bundle as BCB
+    bundle_dir = os.path.dirname(os.path.abspath(args.bc_bundle))
+    os.makedirs(bundle_dir, exist_ok=True)
+    return BCB.BCBundle(args.bc_bundle, compress=args.bc_bundle_gzip, append=append)
+
 
 def create_cmap_report(cmap, config):
     """
@@ -52,6 +182,7 @@ def create_cmap_report(cmap, config):
     :param cmap: cmap graph object
     :param config: configuration object
     """
+    import cxl_report as REP
     report = REP.CxlReport(cmap, config)
     report.create_report()
 
@@ -63,29 +194,192 @@ def create_network_graph(cmap, config):
     :param cmap: the graph created from the cmap cxl file
     :param config: configuration object with config parameters
     """
-    graph = NETG.NetworkGraph(cmap)
+    import graphml_writer as GML
+    graph = GML.GraphMLWriter(cmap)
     graph.save_graphml(config.graphml_file)
 
 
-def load_cmap(config):
+def create_d3_tree(cmap, config):
+    """
+    create the D3 tree layout JSON file of the cmap graph for web visualizations
+    :param cmap: the graph created from the cmap cxl file
+    :param config: configuration object with config parameters
+    """
+    import d3_writer as D3
+    D3.D3TreeWriter(cmap).save_json(config.json_tree_file)
+
+
+def create_d3_force(cmap, config):
+    """
+    create the D3 force layout JSON file of the cmap graph for web visualizations
+    :param cmap: the graph created from the cmap cxl file
+    :param config: configuration object with config parameters
+    """
+    import d3_writer as D3
+    D3.D3ForceWriter(cmap).save_json(config.json_force_file)
+
+
+def load_cmap(config, streaming=False, compact=False, cache=None, profiler=None, ct_store=None):
     """
     load the cmap CXL file and create a graph from the contents
     :param config: configuration object with config parameters
+    :param streaming: parse the CXL file incrementally to limit memory use on large CXL exports
+    :param compact: return the graph as a CompactGraph to reduce the memory used by each loaded CMAP while it is kept;
+    the full graph is loaded first so the peak memory of the load is higher
+    :param cache: CmapCache used to skip parsing CXL files that have not changed
+    :param profiler: StageProfiler that records the time and memory used by each loading stage
+    :param ct_store: CTStore the c-codes are validated against; each c-code not in the CT release is added to the
+    graph's diagnostics
     :return: the graph created from the cmap cxl file
     """
-    cmap_graph = CMAP.CxlCmap(config)
-    cmap_graph.load()
+    cmap_graph = None
+    if cache:
+        with SP.profile_stage(profiler, "cache lookup"):
+            cache_key = cache.get_key(config)
+            cmap_graph = cache.get(cache_key, config)
+    if cmap_graph is None:
+        cmap_graph = CMAP.CxlCmap(config)
+        if streaming:
+            cmap_graph.load_streaming(profiler)
+        else:
+            cmap_graph.load(profiler)
+        if cache:
+            cache.put(cache_key, cmap_graph)
+    if compact:
+        import compact_graph as CG
+        with SP.profile_stage(profiler, "compact"):
+            cmap_graph = CG.CompactGraph(cmap_graph)
+    if ct_store:
+        import ct_store as CTS
+        with SP.profile_stage(profiler, "ct validation"):
+            CTS.validate_cmap(ct_store, cmap_graph)
     return cmap_graph
 
-def create_serialized_bc(cmap, config):
+
+def get_graph_counts(cmap):
+    """
+    count the contents of a loaded CMAP for the profile metrics
+    :param cmap: the graph created from the cmap cxl file
+    :return: dictionary of counts
+    """
+    subsets = [v.ct_subset for v in cmap.vertexes.values() if v.ct_subset is not None]
+    return {"vertexes": len(cmap.vertexes), "edges": sum(len(v.target) for v in cmap.vertexes.values()),
+            "connections": len(cmap.connection) if hasattr(cmap, "connection") else None,
+            "linking_phrases": len(cmap.linking_phrase), "keys": len(cmap.keys), "subsets": len(subsets),
+            "terms": sum(len(subset.terms) for subset in subsets), "diagnostics": len(cmap.diagnostics)}
+
+
+def create_serialized_bc(cmap, config, bundle=None):
     """
     serializes the internal BC graph as JSON and saves it to a file
     :param cmap_graph: internal graph of vertex objects created from CMAP
     :param config: configuration object with config parameters
+    :param bundle: BCBundle the BC is appended to and closed; a file is written for the BC if not provided
     """
+    import bc_factory as BCF
     bc_factory = BCF.BCFactory(cmap, config)
     bc = bc_factory.create_bc()
-    bc_factory.save_bc(bc)
+    if bundle is None:
+        bc_factory.save_bc(bc)
+        return
+    with bundle:
+        bc_factory.save_bc(bc, bundle)
+
+
+OUTPUT_WRITERS = {
+    "graphml": create_network_graph,
+    "report": create_cmap_report,
+    "bc": create_serialized_bc,
+    "tree": create_d3_tree,
+    "force": create_d3_force
+}
+OutputResult = namedtuple("OutputResult", "output status seconds error")
+
+
+def create_outputs(cmap, config, outputs=None, executor="thread", workers=None):
+    """
+    run the output writers concurrently; the writers only read the graph so they share it. A failed writer does
+    not stop the other writers. A single output is created without starting a pool
+    :param cmap: the graph created from the cmap cxl file
+    :param config: configuration object with config parameters
+    :param outputs: list of OUTPUT_WRITERS names to create (default all)
+    :param executor: "thread" to run the writers in a thread pool or "process" to run them in a process pool
+    :param workers: number of threads or processes (default one per output)
+    :return: list of OutputResult named tuples in the order of the outputs
+    """
+    outputs = outputs if outputs else list(OUTPUT_WRITERS)
+    if len(outputs) == 1 and executor == "thread":
+        return [create_output(outputs[0], cmap, config)]
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+    pool_executor = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with pool_executor(max_workers=workers if workers else len(outputs)) as pool:
+        futures = [pool.submit(create_output, output, cmap, config) for output in outputs]
+    return [future.result() for future in futures]
+
+
+def create_output(output, cmap, config, *writer_args):
+    """
+    create one output and time it
+    :param output: OUTPUT_WRITERS name of the output
+    :param cmap: the graph created from the cmap cxl file
+    :param config: configuration object with config parameters
+    :param writer_args: additional arguments passed to the output writer
+    :return: OutputResult named tuple
+    """
+    start = time.perf_counter()
+    try:
+        OUTPUT_WRITERS[output](cmap, config, *writer_args)
+    except Exception as e:
+        return OutputResult(output, "FAILED", time.perf_counter() - start, f"{type(e).__name__}: {e}")
+    return OutputResult(output, "OK", time.perf_counter() - start, None)
+
+
+def profile_output(profiler, output, cmap, config, *writer_args):
+    """
+    create one output as a profiled stage
+    :param profiler: StageProfiler or None when the program is not being profiled
+    :param output: OUTPUT_WRITERS name of the output
+    :param cmap: the graph created from the cmap cxl file
+    :param config: configuration object with config parameters
+    :param writer_args: additional arguments passed to the output writer
+    :return: OutputResult named tuple
+    """
+    with SP.profile_stage(profiler, output):
+        return create_output(output, cmap, config, *writer_args)
+
+
+def get_outputs(outputs):
+    """
+    :param outputs: comma separated OUTPUT_WRITERS names (e.g. bc,graphml)
+    :return: list of the output names in the order of OUTPUT_WRITERS
+    """
+    names = {output.strip().lower() for output in outputs.split(",") if output.strip()}
+    unknown = names - set(OUTPUT_WRITERS)
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(f"outputs must be a comma separated list of {', '.join(OUTPUT_WRITERS)}")
+    return [output for output in OUTPUT_WRITERS if output in names]
+
+
+def print_diagnostics(diagnostics, indent=""):
+    """
+    print the problems found in the CMAP labels and comments and the c-codes that are not in the CT release
+    :param diagnostics: list of concept_parser.Diagnostic named tuples
+    :param indent: text printed before each diagnostic
+    """
+    for diagnostic in diagnostics:
+        print(f"{indent}{diagnostic.source} of concept {diagnostic.concept_id}: {diagnostic.message}: "
+              f"{diagnostic.text!r}")
+
+
+def print_output_result(result):
+    """
+    print the status and time taken to create an output
+    :param result: OutputResult named tuple
+    """
+    if result.error:
+        print(f"{result.output} {result.status} ({result.seconds:.3f}s): {result.error}")
+    else:
+        print(f"{result.output} {result.status} ({result.seconds:.3f}s)")
 
 
 def set_cmd_line_args():
@@ -94,11 +388,44 @@ def set_cmd_line_args():
     :return: argparse object with command-line parameters
     """
     parser = argparse.ArgumentParser(description="parse the CMAP CXL export and convert it to biomedical concepts")
-    parser.add_argument("-c", "--concept", dest="concept_name", help="Name of main concept", required=True)
-    parser.add_argument("-f", "--cxl_file", dest="cxl_file", help="Name of cxl file to load (do not include the path)", required=True)
+    parser.add_argument("-c", "--concept", dest="concept_name", help="Name of main concept", required=False)
+    parser.add_argument("-f", "--cxl_file", dest="cxl_file", help="Name of cxl file to load (do not include the path)", required=False)
     parser.add_argument("-d", "--file_path", dest="file_path", help="Directory of cxl file to load", required=False)
     parser.add_argument("-j", "--json_file", dest="json_file", help="BC serialized as JSON", required=False)
+    parser.add_argument("-b", "--batch", dest="batch", help="Directory, glob pattern or JSON manifest of cxl files to load", required=False)
+    parser.add_argument("--watch", dest="watch", help="Directory of cxl files to watch and reprocess when changed", required=False)
+    parser.add_argument("--poll_interval", dest="poll_interval", type=float, default=0.5, help="Seconds between checks for changed files in watch mode", required=False)
+    parser.add_argument("--serve", dest="serve", type=int, help="Port to run the HTTP service on", required=False)
+    parser.add_argument("--host", dest="host", default="localhost", help="Host name or address the HTTP service listens on", required=False)
+    parser.add_argument("--queue_size", dest="queue_size", type=int, default=16, help="Number of HTTP service requests that can wait for a worker, or the size of each queue in pipeline mode", required=False)
+    parser.add_argument("-o", "--output_path", dest="output_path", help="Directory to write the generated files to", required=False)
+    parser.add_argument("-w", "--workers", dest="workers", type=int, help="Number of worker processes in batch, pipeline and service mode", required=False)
+    parser.add_argument("--pipeline", dest="pipeline", action="store_true", help="Read, parse and write the cxl files as overlapping stages in batch mode", required=False)
+    parser.add_argument("--readers", dest="readers", type=int, default=2, help="Number of cxl files read at the same time in pipeline mode", required=False)
+    parser.add_argument("--writers", dest="writers", type=int, default=2, help="Number of graphs whose outputs are written at the same time in pipeline mode", required=False)
+    parser.add_argument("--corpus_report", dest="corpus_report", action="store_true", help="Create one report for all the cxl files in batch mode", required=False)
+    parser.add_argument("-s", "--stream", dest="streaming", action="store_true", help="Parse large cxl files incrementally", required=False)
+    parser.add_argument("--compact", dest="compact", action="store_true", help="Keep the loaded graph in a compact form; the compact copy is built from the full graph, so it only saves memory where graphs are kept (e.g. the --pipeline write queue)", required=False)
+    parser.add_argument("--outputs", dest="outputs", type=get_outputs, default=list(OUTPUT_WRITERS), help=f"Comma separated list of the outputs to create ({','.join(OUTPUT_WRITERS)}); default all", required=False)
+    parser.add_argument("--output_executor", dest="output_executor", choices=["thread", "process"], default="thread", help="Create the outputs in a thread pool or a process pool", required=False)
+    parser.add_argument("--output_workers", dest="output_workers", type=int, help="Number of threads or processes used to create the outputs", required=False)
+    parser.add_argument("--cache_dir", dest="cache_dir", help="Directory used to cache the graphs of loaded cxl files", required=False)
+    parser.add_argument("--bc_bundle", dest="bc_bundle", help="JSON Lines file the BCs are written to instead of one JSON file per BC", required=False)
+    parser.add_argument("--bc_bundle_gzip", dest="bc_bundle_gzip", action="store_true", help="Compress the BC bundle with gzip", required=False)
+    parser.add_argument("--profile", dest="profile", help="JSON file the time, CPU and memory used by each stage are written to; the outputs are created one at a time", required=False)
+    parser.add_argument("--profile_cprofile", dest="profile_cprofile", help="File the cProfile statistics of the slowest stage are written to (requires --profile)", required=False)
+    parser.add_argument("--ct_store", dest="ct_store", help="SQLite CT store the c-codes are validated against", required=False)
+    parser.add_argument("--ct_release", dest="ct_release", nargs="+", help="CDISC CT release text or Excel files the CT store is built from when it is missing or out of date", required=False)
+    parser.add_argument("--ct_index", dest="ct_index", help="JSON terminology index the CT subsets of the loaded cxl files are added to", required=False)
+    parser.add_argument("--analysis", dest="analysis_file", help="JSON file the graph analysis (cycles, components, concepts unreachable from the root, degrees) is written to", required=False)
+    parser.add_argument("--cache_size", dest="cache_size", type=int, default=CC.DEFAULT_MAX_ENTRIES, help="Maximum number of cached graphs", required=False)
     args = parser.parse_args()
+    if args.pipeline and (not args.batch or args.corpus_report or args.bc_bundle or args.ct_index):
+        parser.error("--pipeline requires -b and cannot be used with --corpus_report, --bc_bundle or --ct_index")
+    if args.ct_release and not args.ct_store:
+        parser.error("--ct_release requires --ct_store")
+    if not args.batch and not args.watch and not args.serve and not (args.cxl_file and args.concept_name):
+        parser.error("the -f and -c arguments are required unless -b, --watch or --serve is used")
     return args
 
 
@@ -15,7 +15,10 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY
 TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-import XlsxWriter.xlsxwriter as XSL
+import csv
+from collections import Counter
+
+REPORT_DELIMITERS = {"csv": ",", "tsv": "\t"}
 
 
 class CxlReport:
@@ -32,15 +35,40 @@ class CxlReport:
 
     def create_report(self):
         """
-        generates an Excel spreadsheet documenting the contents of the CMAP for use as a Biomedical Concept
-        :return:
+        generates the report documenting the contents of the CMAP for use as a Biomedical Concept in the report format
+        set in the config file: an Excel spreadsheet (xlsx) or a pair of node and edge csv or tsv files
+        """
+        if self.cfg.report_format in REPORT_DELIMITERS:
+            self._create_delimited_report(self.cfg.report_format)
+        elif self.cfg.report_format == "xlsx":
+            self._create_workbook()
+        else:
+            raise ValueError(f"unknown report_format {self.cfg.report_format} in the config file; use one of "
+                             f"xlsx, {', '.join(REPORT_DELIMITERS)}")
+
+    def _create_workbook(self):
+        """
+        generates an Excel spreadsheet documenting the contents of the CMAP; the workbook is written in constant memory
+        mode so each row is streamed to disk once it has been written
         """
-        workbook = XSL.Workbook(self.cfg.report_file)
+        import XlsxWriter.xlsxwriter as XSL         # imported here so csv reports and other outputs do not load it
+        workbook = XSL.Workbook(self.cfg.report_file, {"constant_memory": True})
         bold = workbook.add_format({'bold': True})
         self._create_node_worksheet(workbook, bold)
         self._create_edge_worksheet(workbook, bold)
         workbook.close()
 
+    def _create_delimited_report(self, report_format):
+        """
+        generates the node and edge listings as delimited text files
+        :param report_format: csv or tsv
+        """
+        for table, rows in (("nodes", self.node_rows()), ("edges", self.edge_rows())):
+            with open(self.cfg.report_table_file(table, report_format), "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, delimiter=REPORT_DELIMITERS[report_format])
+                writer.writerow(self.cfg.report_headers(table))
+                writer.writerows(rows)
+
     def _create_edge_worksheet(self, workbook, bold):
         """
         generate the worksheet listing and describing the edges found in the CMAP
@@ -49,11 +77,8 @@ class CxlReport:
         """
         worksheet = workbook.add_worksheet("CMAP Edges")
         self._write_header_record(worksheet, bold)
-        row_number = 1
-        for edge in set(self.cmap.linking_phrase.values()):
-            worksheet.write(row_number, 0, edge)
-            worksheet.write(row_number, 1, list(self.cmap.linking_phrase.values()).count(edge))
-            row_number += 1
+        for row_number, row in enumerate(self.edge_rows(), start=1):
+            worksheet.write_row(row_number, 0, row)
 
     def _create_node_worksheet(self, workbook, bold):
         """
@@ -63,20 +88,39 @@ class CxlReport:
         """
         worksheet = workbook.add_worksheet("CMAP Nodes")
         self._write_header_record(worksheet, bold)
-        row_number = 1
-        for vertex in self.cmap:
+        for row_number, vertex in enumerate(self.cmap, start=1):
+            row = self.get_node_row(vertex)
             if vertex.is_root:
-                worksheet.write(row_number, 0, vertex.label, bold)
+                worksheet.write(row_number, 0, row[0], bold)
+                worksheet.write_row(row_number, 1, row[1:])
             else:
-                worksheet.write(row_number, 0, vertex.label)
-            worksheet.write(row_number, 1, vertex.type)
-            worksheet.write(row_number, 2, vertex.id)
-            worksheet.write(row_number, 3, self._is_orphan(len(vertex.source), len(vertex.target)))
-            worksheet.write(row_number, 4, self._is_entry_point(len(vertex.source), len(vertex.target)))
-            worksheet.write(row_number, 5, len(vertex.source)/2)
-            worksheet.write(row_number, 6, len(vertex.target)/2)
-            worksheet.write(row_number, 7, self._get_invalid_links(vertex))
-            row_number += 1
+                worksheet.write_row(row_number, 0, row)
+
+    def node_rows(self):
+        """
+        generate the report row describing each node in the CMAP
+        :return: iterator of lists of column values
+        """
+        return (self.get_node_row(vertex) for vertex in self.cmap)
+
+    def edge_rows(self):
+        """
+        generate the report row for each relationship name with the number of times it is used in the CMAP
+        :return: iterator of lists of column values
+        """
+        for edge, count in Counter(self.cmap.linking_phrase.values()).items():
+            yield [edge, count]
+
+    def get_node_row(self, vertex):
+        """
+        :param vertex: vertex object to describe
+        :return: list of column values describing the vertex
+        """
+        source_count = len(vertex.source)
+        target_count = len(vertex.target)
+        return [vertex.label, vertex.type, vertex.id, self._is_orphan(source_count, target_count),
+                self._is_entry_point(source_count, target_count), source_count/2, target_count/2,
+                self._get_invalid_links(vertex)]
 
     def _get_invalid_links(self, vertex):
         """
@@ -85,12 +129,19 @@ class CxlReport:
         :param vertex: vertext object that includes all references to and from the vertex (node)
         :return: a string of comma separated invalid link (relationship) names or empty string if all are valid
         """
+        return ", ".join(self.get_invalid_link_names(vertex))
+
+    def get_invalid_link_names(self, vertex):
+        """
+        :param vertex: vertext object that includes all references to and from the vertex (node)
+        :return: set of invalid link (relationship) names; empty for vertexes of an unknown node type
+        """
         node_type = self.cfg.get_node_type(vertex.type)
         if node_type is None:          # if invalid node then do not report links as invalid
-            return ""
+            return set()
         to_links = set([link[1] for link in vertex.source if link[1] not in node_type.valid_source_links])
         from_links = set([link[1] for link in vertex.target if link[1] not in node_type.valid_target_links])
-        return ", ".join(to_links | from_links)
+        return to_links | from_links
 
     def _is_entry_point(self, source_node_count, target_node_count):
         """
@@ -116,8 +167,5 @@ class CxlReport:
         :param worksheet: worksheet object - the active worksheet
         :return:
         """
-        col_number = 0
-        for header in self.cfg.report_headers(worksheet.name):
-            worksheet.write(0, col_number, header, bold)
-            col_number += 1
+        worksheet.write_row(0, 0, self.cfg.report_headers(worksheet.name), bold)
 
@@ -0,0 +1,197 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import json
+import time
+import hashlib
+import configuration as CFG
+import cxl_load as LOAD
+import graph_analysis as GA
+
+"""
+cxl_watch polls a directory of CMAP CXL exports and regenerates the outputs of the CXL files that changed. Each output
+(artifact) depends on the content of its CXL file and on every configuration setting except the settings that
+ARTIFACT_CONFIG_KEYS lists as used only by the other artifacts, so a change to one of those settings only regenerates
+the artifact that uses it. A setting that is not listed, including any new one, regenerates every artifact. The outputs for each
+CMAP are written to their own sub-directory of the output path, as in batch mode.
+"""
+
+ARTIFACT_CONFIG_KEYS = {                # configuration settings used only by one artifact
+    "graphml": ("graphml_file_name",),
+    "report": ("report_file_name", "report_format", "report_node_headers", "report_edge_headers"),
+    "bc": ("bc_roles",),
+    "tree": ("json_tree_file_name",),
+    "force": ("json_force_file_name",)
+}
+DEFAULT_POLL_INTERVAL = 0.5
+
+
+class CxlWatcher:
+    """
+    watch a directory of CXL files and regenerate only the artifacts whose CXL file or configuration settings changed
+    """
+    def __init__(self, watch_dir, cfg_path, output_root, load_options=None, outputs=None):
+        """
+        :param watch_dir: directory of CXL files to watch
+        :param cfg_path: directory containing the configuration file
+        :param output_root: directory in which a sub-directory is created for the output of each CMAP
+        :param load_options: dictionary of keyword arguments for cxl_load.load_cmap
+        :param outputs: list of the artifact names to create (default all)
+        """
+        self.watch_dir = watch_dir
+        self.cfg_path = cfg_path
+        self.output_root = output_root
+        self.load_options = load_options if load_options else {}
+        self.outputs = outputs if outputs else list(ARTIFACT_CONFIG_KEYS)
+        self.config = None
+        self.config_hashes = {}             # hash of the configuration settings each artifact may depend on
+        self._config_stat = None
+        self._file_stats = {}               # (modification time, size) keyed by CXL file name
+        self._file_hashes = {}              # content hash keyed by CXL file name
+        self._artifacts = {}                # (CXL hash, config hash) each artifact was created from keyed by file name
+
+    def run(self, poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+        poll the watch directory until the program is interrupted
+        :param poll_interval: seconds to wait between polls
+        """
+        print(f"watching {self.watch_dir} for changed CXL files (press Ctrl+C to stop)")
+        try:
+            while True:
+                self.poll()
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+
+    def poll(self):
+        """
+        check the configuration and CXL files for changes and regenerate the affected artifacts
+        :return: dictionary of regenerated artifact names keyed by CXL file name
+        """
+        self._check_config()
+        cxl_files = self._check_cxl_files()
+        updated = {}
+        for cxl_file in cxl_files:
+            artifacts = self._get_stale_artifacts(cxl_file)
+            if artifacts:
+                self._create_artifacts(cxl_file, artifacts)
+                updated[cxl_file] = artifacts
+        return updated
+
+    def _check_config(self):
+        """
+        reload the configuration file when it changes and hash the settings each artifact may depend on; the previous
+        configuration is kept while the file is missing or invalid, and an invalid file is reported once per change
+        """
+        cfg_file = os.path.join(self.cfg_path, CFG.CONFIG_FILE_NAME)
+        try:
+            stat = self._get_stat(cfg_file)
+        except OSError:
+            if self.config is None:
+                raise
+            return                          # e.g. replaced by an editor save; checked again on the next poll
+        if stat == self._config_stat:
+            return
+        try:
+            config = CFG.Configuration(None, "", path=self.cfg_path)
+        except (OSError, ValueError, KeyError) as e:
+            if self.config is None:
+                raise
+            self._config_stat = stat
+            print(f"keeping the previous configuration, {cfg_file} could not be loaded: {e}")
+            return
+        self.config = config
+        self._config_stat = stat
+        for artifact in ARTIFACT_CONFIG_KEYS:
+            other_keys = {key for other, config_keys in ARTIFACT_CONFIG_KEYS.items() if other != artifact
+                          for key in config_keys}
+            settings = {key: value for key, value in self.config.config.items() if key not in other_keys}
+            settings_json = json.dumps(settings, sort_keys=True).encode("utf-8")
+            self.config_hashes[artifact] = hashlib.sha256(settings_json).hexdigest()
+
+    def _check_cxl_files(self):
+        """
+        hash the content of new and modified CXL files; forget CXL files that have been removed
+        :return: list of CXL file names in the watch directory
+        """
+        cxl_files = sorted(entry.path for entry in os.scandir(self.watch_dir)
+                           if entry.is_file() and entry.name.lower().endswith(".cxl"))
+        for cxl_file in set(self._file_stats) - set(cxl_files):
+            self._file_stats.pop(cxl_file)
+            self._file_hashes.pop(cxl_file, None)
+            self._artifacts.pop(cxl_file, None)
+        for cxl_file in cxl_files:
+            try:
+                stat = self._get_stat(cxl_file)
+                if stat != self._file_stats.get(cxl_file):
+                    with open(cxl_file, "rb") as f:
+                        self._file_hashes[cxl_file] = hashlib.sha256(f.read()).hexdigest()
+                    self._file_stats[cxl_file] = stat
+            except FileNotFoundError:
+                pass                        # removed since the directory was read; forgotten on the next poll
+        return [cxl_file for cxl_file in cxl_files if cxl_file in self._file_hashes]
+
+    def _get_stale_artifacts(self, cxl_file):
+        """
+        :param cxl_file: CXL file name
+        :return: list of the artifacts created from a different CXL file content or configuration setting
+        """
+        created = self._artifacts.get(cxl_file, {})
+        return [artifact for artifact in self.outputs
+                if created.get(artifact) != (self._file_hashes[cxl_file], self.config_hashes[artifact])]
+
+    def _create_artifacts(self, cxl_file, artifacts):
+        """
+        load the CXL file, regenerate the stale artifacts and print the graph's diagnostics; a failed load or
+        artifact is not retried until its CXL file or configuration settings change again
+        :param cxl_file: CXL file name
+        :param artifacts: list of artifact names to create
+        """
+        start = time.perf_counter()
+        cmap_name = os.path.splitext(os.path.basename(cxl_file))[0]
+        output_path = os.path.join(self.output_root, cmap_name)
+        created = self._artifacts.setdefault(cxl_file, {})
+        errors = []
+        try:
+            os.makedirs(output_path, exist_ok=True)
+            config = self.config.for_cmap(cmap_name, os.path.abspath(cxl_file), output_path)
+            cmap_graph = LOAD.load_cmap(config, **self.load_options)
+            GA.analyze_cmap(cmap_graph)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            cmap_graph = None
+        if cmap_graph is not None:
+            results = LOAD.create_outputs(cmap_graph, config, artifacts)
+            errors.extend([f"{result.output} {result.error}" for result in results if result.error])
+        for artifact in artifacts:
+            created[artifact] = (self._file_hashes[cxl_file], self.config_hashes[artifact])
+        status = "FAILED" if errors else "updated"
+        print(f"{status} {cxl_file}: {', '.join(artifacts)} ({time.perf_counter() - start:.2f}s)")
+        for error in errors:
+            print(f"    {error}")
+        if cmap_graph is not None:
+            LOAD.print_diagnostics(cmap_graph.diagnostics, "    ")
+
+    @staticmethod
+    def _get_stat(file_name):
+        """
+        :param file_name: name of the file to check
+        :return: tuple of the modification time and size used to detect a changed file
+        """
+        stat = os.stat(file_name)
+        return stat.st_mtime_ns, stat.st_size
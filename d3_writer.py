@@ -0,0 +1,122 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+
+"""
+D3 JSON exports of the CMAP graph for web visualizations. D3TreeWriter writes the hierarchy below the root vertex for
+a D3 tree layout and D3ForceWriter writes the node and link lists for a D3 force layout. Both write the JSON one node
+or link at a time so no intermediate dictionary of the whole graph is created.
+"""
+
+
+class D3TreeWriter:
+    """
+    write the CMAP graph as a D3 hierarchy rooted at the root (observation concept) vertex
+    """
+    def __init__(self, cmap):
+        """
+        :param cmap is a graph structure build from the CMAP CXL format
+        """
+        self.cmap = cmap
+
+    def save_json(self, file_name):
+        """
+        save the D3 tree JSON; the children of a node are its target vertexes. A vertex that can be reached from more
+        than one parent, or that is part of a cycle, is only included the first time it is reached
+        :param file_name: JSON file name
+        """
+        root = self._get_root()
+        with open(file_name, "w", encoding="utf-8") as f:
+            if root is None:
+                f.write("{}")
+                return
+            visited = {root.id}
+            f.write(self._open_node(root, None))
+            stack = [[iter(root.target), False]]            # target iterator and has-children flag for each level
+            while stack:
+                level = stack[-1]
+                for node, relationship in level[0]:
+                    if node.id in visited:
+                        continue
+                    visited.add(node.id)
+                    f.write(", " if level[1] else "")
+                    level[1] = True
+                    f.write(self._open_node(node, relationship))
+                    stack.append([iter(node.target), False])
+                    break
+                else:
+                    stack.pop()
+                    f.write("]}")
+
+    def _get_root(self):
+        """
+        :return: the root vertex or None if the CMAP has no root concept
+        """
+        for vertex in self.cmap.vertexes.values():
+            if vertex.is_root:
+                return vertex
+        return None
+
+    @staticmethod
+    def _open_node(vertex, relationship):
+        """
+        :param vertex: vertex to write
+        :param relationship: name of the link from the parent vertex or None for the root vertex
+        :return: JSON text for the start of the node up to the opening bracket of the children list
+        """
+        node = f'{{"name": {json.dumps(vertex.label)}, "id": {json.dumps(vertex.id)}, ' \
+               f'"type": {json.dumps(vertex.type)}, "color": {json.dumps(vertex.color)}, '
+        if relationship is not None:
+            node += f'"relationship": {json.dumps(relationship)}, '
+        return node + '"children": ['
+
+
+class D3ForceWriter:
+    """
+    write the CMAP graph as D3 force layout nodes and links
+    """
+    def __init__(self, cmap):
+        """
+        :param cmap is a graph structure build from the CMAP CXL format
+        """
+        self.cmap = cmap
+
+    def save_json(self, file_name):
+        """
+        save the D3 force layout JSON; each link is written once from its source vertex
+        :param file_name: JSON file name
+        """
+        with open(file_name, "w", encoding="utf-8") as f:
+            f.write('{"nodes": [')
+            separator = ""
+            for id, v in self.cmap.vertexes.items():
+                f.write(f'{separator}{{"id": {json.dumps(id)}, "name": {json.dumps(v.label)}, '
+                        f'"type": {json.dumps(v.type)}, "color": {json.dumps(v.color)}, '
+                        f'"is_root": {json.dumps(v.is_root)}}}')
+                separator = ", "
+            f.write('], "links": [')
+            separator = ""
+            for id, v in self.cmap.vertexes.items():
+                targets = {}
+                for node, relationship in v.target:
+                    targets[node.id] = relationship
+                for target_id, relationship in targets.items():
+                    f.write(f'{separator}{{"source": {json.dumps(id)}, "target": {json.dumps(target_id)}, '
+                            f'"relationship": {json.dumps(relationship)}}}')
+                    separator = ", "
+            f.write(']}')
@@ -0,0 +1,256 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from collections import deque
+import concept_parser as PARSE
+
+"""
+GraphAnalysis checks the structure of a loaded CMAP graph (a CxlCmap or CompactGraph) without networkx. The vertexes
+are numbered and the distinct relationships between them are stored once as adjacency lists, so the topological
+order, the cycles, the weakly connected components, the vertexes reachable from the root and the degree statistics
+each take time proportional to the number of vertexes plus relationships. A relationship is added to the graph for
+each of its CXL connections, so repeated relationships between the same two vertexes are counted once. analyze_cmap
+is run on every load path (single file, batch, pipeline, watch and service) and adds the cycles and the concepts that
+cannot be reached from the root to the graph's diagnostics.
+"""
+
+
+class GraphAnalysis:
+    """
+    linear time structural analysis of a CMAP graph
+    """
+    def __init__(self, cmap):
+        """
+        :param cmap: the graph created from the CMAP CXL file
+        """
+        self.ids = []                           # concept id by vertex number
+        self.roots = []                         # vertex numbers of the root vertexes
+        numbers = {}
+        for vertex in cmap.vertexes.values():
+            numbers[vertex.id] = len(self.ids)
+            self.ids.append(vertex.id)
+            if vertex.is_root:
+                self.roots.append(numbers[vertex.id])
+        self.successors = [[] for n in self.ids]
+        self.predecessors = [[] for n in self.ids]
+        self.edge_count = 0
+        for vertex in cmap.vertexes.values():
+            number = numbers[vertex.id]
+            for target_number in dict.fromkeys(numbers[node.id] for node, link in vertex.target):
+                self.successors[number].append(target_number)
+                self.predecessors[target_number].append(number)
+                self.edge_count += 1
+
+    def topological_order(self):
+        """
+        order the vertexes so each vertex comes before the vertexes it links to (Kahn's algorithm)
+        :return: list of concept ids; vertexes in or downstream of a cycle are left out
+        """
+        in_degrees = [len(predecessors) for predecessors in self.predecessors]
+        ready = deque(number for number, in_degree in enumerate(in_degrees) if in_degree == 0)
+        order = []
+        while ready:
+            number = ready.popleft()
+            order.append(self.ids[number])
+            for successor in self.successors[number]:
+                in_degrees[successor] -= 1
+                if in_degrees[successor] == 0:
+                    ready.append(successor)
+        return order
+
+    def is_acyclic(self):
+        """
+        :return: True if the graph is a directed acyclic graph
+        """
+        return len(self.topological_order()) == len(self.ids)
+
+    def find_cycles(self):
+        """
+        find one cycle in each strongly connected component that has a cycle
+        :return: list of cycles, each a list of concept ids that starts and ends with the same concept id
+        """
+        cycles = []
+        for component in self._strongly_connected_components():
+            if len(component) > 1 or component[0] in self.successors[component[0]]:
+                cycles.append([self.ids[number] for number in self._get_cycle_path(component)])
+        return cycles
+
+    def _strongly_connected_components(self):
+        """
+        Tarjan's algorithm using an explicit stack so large graphs do not exceed the recursion limit
+        :return: list of strongly connected components, each a list of vertex numbers
+        """
+        index = [None] * len(self.ids)
+        low_link = [0] * len(self.ids)
+        on_stack = [False] * len(self.ids)
+        stack = []
+        components = []
+        next_index = 0
+        for start in range(len(self.ids)):
+            if index[start] is not None:
+                continue
+            work = [(start, 0)]
+            while work:
+                number, edge = work.pop()
+                if edge == 0:
+                    index[number] = low_link[number] = next_index
+                    next_index += 1
+                    stack.append(number)
+                    on_stack[number] = True
+                elif edge > 0:
+                    low_link[number] = min(low_link[number], low_link[self.successors[number][edge - 1]])
+                successors = self.successors[number]
+                while edge < len(successors):
+                    successor = successors[edge]
+                    edge += 1
+                    if index[successor] is None:
+                        work.append((number, edge))
+                        work.append((successor, 0))
+                        break
+                    if on_stack[successor]:
+                        low_link[number] = min(low_link[number], index[successor])
+                else:
+                    if low_link[number] == index[number]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            component.append(member)
+                            if member == number:
+                                break
+                        components.append(component)
+        return components
+
+    def _get_cycle_path(self, component):
+        """
+        search the strongly connected component from one of its vertexes for a relationship back to that vertex
+        :param component: list of the vertex numbers in a strongly connected component
+        :return: list of vertex numbers that starts and ends with the same vertex number
+        """
+        members = set(component)
+        start = component[0]
+        parents = {start: None}
+        pending = [start]
+        while pending:
+            number = pending.pop()
+            for successor in self.successors[number]:
+                if successor == start:
+                    path = [start]
+                    while number is not None:
+                        path.append(number)
+                        number = parents[number]
+                    return list(reversed(path))
+                if successor in members and successor not in parents:
+                    parents[successor] = number
+                    pending.append(successor)
+        return [start, start]
+
+    def weak_components(self):
+        """
+        :return: list of the weakly connected components, each a list of concept ids, largest first
+        """
+        component_of = [None] * len(self.ids)
+        components = []
+        for start in range(len(self.ids)):
+            if component_of[start] is not None:
+                continue
+            component_of[start] = len(components)
+            component = [start]
+            pending = [start]
+            while pending:
+                number = pending.pop()
+                for neighbor in self.successors[number] + self.predecessors[number]:
+                    if component_of[neighbor] is None:
+                        component_of[neighbor] = len(components)
+                        component.append(neighbor)
+                        pending.append(neighbor)
+            components.append([self.ids[number] for number in component])
+        return sorted(components, key=len, reverse=True)
+
+    def reachable_from_root(self):
+        """
+        :return: set of the concept ids reachable from the root vertexes by following relationships, including the
+        root vertexes
+        """
+        reached = [False] * len(self.ids)
+        pending = list(self.roots)
+        for number in pending:
+            reached[number] = True
+        while pending:
+            number = pending.pop()
+            for successor in self.successors[number]:
+                if not reached[successor]:
+                    reached[successor] = True
+                    pending.append(successor)
+        return {self.ids[number] for number, is_reached in enumerate(reached) if is_reached}
+
+    def unreachable_from_root(self):
+        """
+        :return: list of the concept ids that cannot be reached from a root vertex and so are not part of the BC
+        """
+        reachable = self.reachable_from_root()
+        return [concept_id for concept_id in self.ids if concept_id not in reachable]
+
+    def degree_statistics(self):
+        """
+        :return: dictionary of the in and out degree statistics and the number of orphan, entry point and leaf
+        vertexes
+        """
+        in_degrees = [len(predecessors) for predecessors in self.predecessors]
+        out_degrees = [len(successors) for successors in self.successors]
+        return {"in_degree": _get_statistics(in_degrees), "out_degree": _get_statistics(out_degrees),
+                "orphans": sum(1 for i, o in zip(in_degrees, out_degrees) if i == 0 and o == 0),
+                "entry_points": sum(1 for i, o in zip(in_degrees, out_degrees) if i == 0 and o > 0),
+                "leaves": sum(1 for i, o in zip(in_degrees, out_degrees) if i > 0 and o == 0)}
+
+    def analyze(self):
+        """
+        :return: dictionary summarizing the structure of the graph
+        """
+        cycles = self.find_cycles()
+        components = self.weak_components()
+        return {"vertexes": len(self.ids), "edges": self.edge_count, "acyclic": not cycles, "cycles": cycles,
+                "topological_order": self.topological_order(),
+                "components": len(components), "component_sizes": [len(component) for component in components],
+                "roots": [self.ids[number] for number in self.roots], "unreachable": self.unreachable_from_root(),
+                "degrees": self.degree_statistics()}
+
+
+def analyze_cmap(cmap):
+    """
+    analyze a loaded CMAP and add a diagnostic for each cycle and for each concept that cannot be reached from the root
+    :param cmap: the graph created from the CMAP CXL file
+    :return: dictionary created by GraphAnalysis.analyze
+    """
+    analysis = GraphAnalysis(cmap).analyze()
+    for cycle in analysis["cycles"]:
+        cmap.diagnostics.append(PARSE.Diagnostic(cycle[0], "graph", "concepts form a cycle",
+                                                 " -> ".join(cmap.vertexes[concept_id].label for concept_id in cycle)))
+    for concept_id in analysis["unreachable"]:
+        cmap.diagnostics.append(PARSE.Diagnostic(concept_id, "graph", "concept cannot be reached from the root concept",
+                                                 cmap.vertexes[concept_id].label))
+    return analysis
+
+
+def _get_statistics(degrees):
+    """
+    :param degrees: list of vertex degrees
+    :return: dictionary of the min, max and mean degree
+    """
+    if not degrees:
+        return {"min": None, "max": None, "mean": None}
+    return {"min": min(degrees), "max": max(degrees), "mean": sum(degrees) / len(degrees)}
@@ -0,0 +1,123 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import io
+
+"""
+GraphMLWriter writes the CMAP graph as GraphML directly from the CxlCmap vertexes without building a networkx graph.
+The nodes and edges are written one at a time in the same layout networkx uses, including the name, type, color and
+description attributes used to style the graph in yEd. In yEd use the Edit Property Mapper to set the node color.
+"""
+
+GRAPHML_HEADER = """<?xml version='1.0' encoding='utf-8'?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns" \
+xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" \
+xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">
+  <key id="d5" for="edge" attr.name="description" attr.type="string" />
+  <key id="d4" for="node" attr.name="color" attr.type="string" />
+  <key id="d3" for="node" attr.name="description" attr.type="string" />
+  <key id="d2" for="node" attr.name="type" attr.type="string" />
+  <key id="d1" for="node" attr.name="name" attr.type="string" />
+  <key id="d0" for="node" attr.name="id" attr.type="string" />
+  <graph edgedefault="directed">
+"""
+GRAPHML_FOOTER = """  </graph>
+</graphml>"""
+TEXT_ENTITIES = (("&", "&amp;"), (">", "&gt;"), ("<", "&lt;"))
+ATTRIBUTE_ENTITIES = TEXT_ENTITIES + (('"', "&quot;"), ("\n", "&#10;"), ("\r", "&#13;"), ("\t", "&#09;"))
+
+
+class GraphMLWriter:
+    """
+    stream the CMAP graph to a GraphML file
+    """
+    def __init__(self, cmap):
+        """
+        :param cmap is a graph structure build from the CMAP CXL format
+        """
+        self.cmap = cmap
+        self.node_count = 0
+        self.edge_count = 0
+
+    def save_graphml(self, file_name):
+        """
+        save the GraphML version of the graph
+        :param file_name: GraphML file name or a text stream to write the GraphML to
+        """
+        if hasattr(file_name, "write"):
+            self._write_graphml(file_name)
+        else:
+            with open(file_name, "w", encoding="utf-8") as f:
+                self._write_graphml(f)
+
+    def to_string(self):
+        """
+        :return: the GraphML version of the graph as a string
+        """
+        graphml = io.StringIO()
+        self._write_graphml(graphml)
+        return graphml.getvalue()
+
+    def _write_graphml(self, f):
+        """
+        write the nodes, then the edges; each edge is written once from its source vertex and when a vertex has
+        more than one edge to the same target the last relationship is used, as in a networkx DiGraph
+        :param f: text stream
+        """
+        self.node_count = 0
+        self.edge_count = 0
+        f.write(GRAPHML_HEADER)
+        for id, v in self.cmap.vertexes.items():
+            f.write(f'    <node id={self._attribute(id)}>\n'
+                    f'      <data key="d0">{self._text(id)}</data>\n'
+                    f'      <data key="d1">{self._text(v.label)}</data>\n'
+                    f'      <data key="d2">{self._text(v.type)}</data>\n'
+                    f'      <data key="d3">{self._text(v.label)}</data>\n'
+                    f'      <data key="d4">{self._text(v.color)}</data>\n'
+                    f'    </node>\n')
+            self.node_count += 1
+        for id, v in self.cmap.vertexes.items():
+            targets = {}
+            for node, relationship in v.target:
+                targets[node.id] = relationship
+            for target_id, relationship in targets.items():
+                f.write(f'    <edge source={self._attribute(id)} target={self._attribute(target_id)}>\n'
+                        f'      <data key="d5">{self._text(relationship)}</data>\n'
+                        f'    </edge>\n')
+            self.edge_count += len(targets)
+        f.write(GRAPHML_FOOTER)
+
+    @staticmethod
+    def _text(value):
+        return escape(str(value), TEXT_ENTITIES)
+
+    @staticmethod
+    def _attribute(value):
+        return '"' + escape(str(value), ATTRIBUTE_ENTITIES) + '"'
+
+
+def escape(text, entities):
+    """
+    escape XML special characters; xml.sax.saxutils is not used because it imports urllib, which slows start up
+    :param text: text to escape
+    :param entities: sequence of (character, entity) tuples replaced in order
+    :return: escaped text
+    """
+    for character, entity in entities:
+        if character in text:
+            text = text.replace(character, entity)
+    return text
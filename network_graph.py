@@ -15,17 +15,23 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY
 TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-import networkx as nx
+try:
+    import networkx as nx
+except ImportError:
+    nx = None                           # networkx is only needed to run graph algorithms on the CMAP graph
 
 
 class NetworkGraph:
     """
-    NetworkGraph uses the networkx module to create a GraphML representation of the CMAP graph
+    NetworkGraph uses the networkx module to create a networkx representation of the CMAP graph for graph algorithms;
+    the GraphMLWriter class writes the GraphML representation without networkx
     """
     def __init__(self, cmap):
         """
         :param cmap is a graph structure build from the CMAP CXL format
         """
+        if nx is None:
+            raise ImportError("the networkx module is required to create a NetworkGraph")
         self.g = nx.DiGraph()               # this is a directed graph
         self.cmap = cmap                    # this graph is built from the cmap graph
         self._add_nodes()
@@ -44,11 +50,9 @@ class NetworkGraph:
 
     def _add_edges(self):
         """
-        add the cmap edges to the GraphML version of the graph
+        add the cmap edges to the GraphML version of the graph; every edge is in the target list of its source vertex
         """
         for id, v in self.cmap.vertexes.items():
-            for s in v.source:
-                self.g.add_edge(s[0].id, id, description=s[1])
             for t in v.target:
                 self.g.add_edge(id, t[0].id, description=t[1])
 
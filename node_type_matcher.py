@@ -0,0 +1,85 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+NodeTypeMatcher compiles the node type rules from the config file into hash indexes. A rule matches a CMAP concept
+when each of its background color, border color, and border shape either equals the concept value or is not set, and
+a concept value that is not set matches every rule. When several rules match, the first one in the config file wins.
+Each index maps an appearance value to a bit mask of the rules it matches, so a lookup intersects three masks and takes
+the lowest set bit instead of testing every rule.
+"""
+class NodeTypeMatcher:
+    def __init__(self, node_types, unknown_node_type):
+        """
+        constructor
+        :param node_types: list of node type objects in config file order
+        :param unknown_node_type: node type object returned when no rule matches
+        """
+        self.node_types = node_types
+        self.unknown_node_type = unknown_node_type
+        self._all_rules = (1 << len(node_types)) - 1
+        self._background_color = self._compile_rules("background_color")
+        self._border_color = self._compile_rules("border_color")
+        self._border_shape = self._compile_rules("border_shape")
+        self._matches = {}                  # node types already resolved keyed on the appearance values
+
+    def match(self, background_color=None, border_color=None, border_shape=None):
+        """
+        find the first node type that matches the CMAP concept appearance
+        :param background_color: background color of the concept in the CMAP (e.g. 255,255,150,255)
+        :param border_color: border color of the concept in the CMAP (e.g. 0,0,255,255)
+        :param border_shape: border shape of the concept in the CMAP (e.g. rectangle)
+        :return: node type object
+        """
+        key = (background_color, border_color, border_shape)
+        node_type = self._matches.get(key)
+        if node_type is None:
+            rules = self._get_rules(self._background_color, background_color) & \
+                    self._get_rules(self._border_color, border_color) & \
+                    self._get_rules(self._border_shape, border_shape)
+            node_type = self.node_types[(rules & -rules).bit_length() - 1] if rules else self.unknown_node_type
+            self._matches[key] = node_type
+        return node_type
+
+    def _compile_rules(self, attribute):
+        """
+        index the rules by the value of one of the node type appearance attributes
+        :param attribute: name of the node type attribute (e.g. border_color)
+        :return: tuple of the bit mask of rules that do not set the attribute and a dictionary of bit masks of the
+        rules matched by each attribute value
+        """
+        wildcard_rules = 0
+        value_rules = {}
+        for rule_number, node_type in enumerate(self.node_types):
+            value = getattr(node_type, attribute)
+            if value is None:
+                wildcard_rules |= 1 << rule_number
+            else:
+                value_rules[value] = value_rules.get(value, 0) | 1 << rule_number
+        return wildcard_rules, {value: rules | wildcard_rules for value, rules in value_rules.items()}
+
+    def _get_rules(self, compiled_rules, value):
+        """
+        :param compiled_rules: tuple created by _compile_rules for one appearance attribute
+        :param value: concept appearance value for the attribute
+        :return: bit mask of the rules matched by the value
+        """
+        if value is None:
+            return self._all_rules
+        wildcard_rules, value_rules = compiled_rules
+        return value_rules.get(value, wildcard_rules)
@@ -0,0 +1,124 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import contextlib
+import cProfile
+import json
+import time
+import tracemalloc
+
+"""
+StageProfiler records the wall time, CPU time and peak memory of each stage of processing a CMAP (e.g. parse, node
+typing, edge wiring, graphml, report, bc) along with counts of what was loaded, and saves them as a JSON metrics file.
+Memory is measured with tracemalloc, which slows the program down, so profile one CMAP at a time with the stages run
+one after another rather than concurrently. Optionally each stage is run under cProfile and the statistics of the
+slowest stage are saved for use with pstats or snakeviz.
+"""
+
+
+def _reset_peak():
+    """
+    reset the peak traced memory so it is measured for the next stage; tracemalloc.reset_peak requires Python 3.9, so
+    on earlier versions tracing is restarted, which also resets the traced memory to zero
+    :return: the traced memory the stage starts from
+    """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start()
+    return tracemalloc.get_traced_memory()[0]
+
+
+class StageProfiler:
+    """
+    collect the time and memory used by each processing stage
+    """
+    def __init__(self, use_cprofile=False):
+        """
+        :param use_cprofile: run each stage under cProfile so the statistics of the slowest stage can be saved
+        """
+        self.use_cprofile = use_cprofile
+        self.stages = []                        # metrics dictionary for each stage in the order they ran
+        self.counts = {}                        # counts of the loaded CMAP contents keyed by name
+        self._slowest = None                    # (wall seconds, stage name, cProfile.Profile) of the slowest stage
+        self._start = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        context manager that records the metrics of the code run within it as a stage
+        :param name: stage name
+        """
+        memory_start = _reset_peak()
+        profile = cProfile.Profile() if self.use_cprofile else None
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = time.process_time() - cpu_start
+            memory_end, memory_peak = tracemalloc.get_traced_memory()
+            self.stages.append({"stage": name, "wall_seconds": wall_seconds, "cpu_seconds": cpu_seconds,
+                                "peak_memory_bytes": memory_peak, "memory_delta_bytes": memory_end - memory_start})
+            if profile and (self._slowest is None or wall_seconds > self._slowest[0]):
+                self._slowest = (wall_seconds, name, profile)
+
+    def add_counts(self, counts):
+        """
+        :param counts: dictionary of counts (e.g. vertexes, connections) to include in the metrics
+        """
+        self.counts.update(counts)
+
+    def get_metrics(self):
+        """
+        :return: dictionary of the stage metrics and counts
+        """
+        return {"total_wall_seconds": time.perf_counter() - self._start,
+                "peak_memory_bytes": max((s["peak_memory_bytes"] for s in self.stages), default=None),
+                "stages": self.stages, "counts": self.counts,
+                "slowest_stage": max(self.stages, key=lambda s: s["wall_seconds"])["stage"] if self.stages else None}
+
+    def save(self, file_name, cprofile_file=None):
+        """
+        save the metrics as JSON and stop tracing memory allocations
+        :param file_name: JSON metrics file name
+        :param cprofile_file: file name for the cProfile statistics of the slowest stage
+        """
+        metrics = self.get_metrics()
+        if cprofile_file and self._slowest:
+            self._slowest[2].dump_stats(cprofile_file)
+            metrics["cprofile"] = {"stage": self._slowest[1], "file": cprofile_file}
+        with open(file_name, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2)
+        tracemalloc.stop()
+
+
+def profile_stage(profiler, name):
+    """
+    :param profiler: StageProfiler or None when the program is not being profiled
+    :param name: stage name
+    :return: the profiler's stage context manager, or a context manager that does nothing when profiler is None
+    """
+    return profiler.stage(name) if profiler else contextlib.nullcontext()
@@ -0,0 +1,83 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import sys
+import shutil
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import configuration as CFG
+import cxl_generator as GEN
+
+"""
+shared fixtures for the tests: a configuration for a copy of the sample CMAP in a temporary directory, and a synthetic
+CMAP generated from the metamodel in the sample configuration file
+"""
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+SAMPLE_CXL_FILE = "VS-SYSBP-Metamodel3.cxl"
+SAMPLE_CONCEPT_NAME = "Systolic Blood Pressure (C0005823)"
+SYNTHETIC_CXL_FILE = "synthetic.cxl"
+
+
+@pytest.fixture
+def data_path(tmpdir):
+    """
+    :return: temporary data directory with copies of the sample configuration file and CMAP
+    """
+    for file_name in (CFG.CONFIG_FILE_NAME, SAMPLE_CXL_FILE):
+        shutil.copy(os.path.join(DATA_PATH, file_name), str(tmpdir))
+    return str(tmpdir)
+
+
+@pytest.fixture
+def config(data_path):
+    """
+    :return: configuration object for the sample CMAP
+    """
+    return CFG.Configuration(SAMPLE_CONCEPT_NAME, SAMPLE_CXL_FILE, path=data_path)
+
+
+@pytest.fixture
+def synthetic_config(config, data_path):
+    """
+    :return: configuration object for a generated CMAP with a few hundred concepts
+    """
+    generator = GEN.CxlGenerator(config, concepts=300, seed=1)
+    concept_name = generator.save_cxl(os.path.join(data_path, SYNTHETIC_CXL_FILE))
+    return config.for_cmap(concept_name, SYNTHETIC_CXL_FILE)
+
+
+def get_graph_contents(cmap):
+    """
+    :param cmap: a loaded CxlCmap or CompactGraph
+    :return: dictionary of the vertex attributes and the source and target edges keyed by concept id
+    """
+    contents = {}
+    for concept_id, vertex in cmap.vertexes.items():
+        ct_subset = vertex.ct_subset
+        contents[concept_id] = {
+            "label": vertex.label, "type": vertex.type, "color": vertex.color, "parent_id": vertex.parent_id,
+            "is_root": vertex.is_root, "concept_name": vertex.concept_name, "c_code": vertex.c_code,
+            "role": getattr(vertex, "role", None), "mandatory": getattr(vertex, "mandatory", None),
+            "ct_subset": None if ct_subset is None else
+            (ct_subset.c_code, ct_subset.name, [(t.c_code, t.sub_val, t.default) for t in ct_subset.terms]),
+            "source": [(node.id, link) for node, link in vertex.source],
+            "target": [(node.id, link) for node, link in vertex.target]}
+    return contents
@@ -0,0 +1,104 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import gzip
+import json
+import pytest
+import bc_bundle as BCB
+import bc_factory as BCF
+import cxl_cmap as CMAP
+
+"""
+BCBundle writes serialized BCs as JSON Lines, optionally as gzip members, and read_bc reads one BC back by conceptId
+"""
+
+
+def get_bc_json(number, version=0):
+    return json.dumps({"conceptId": f"BC{number}", "label": f"BC {number}", "version": version})
+
+
+def read_lines(file_name, compress):
+    with (gzip.open(file_name) if compress else open(file_name, "rb")) as f:
+        return f.read().splitlines()
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_bundle_round_trip(tmpdir, compress):
+    file_name = str(tmpdir.join("bcs.ndjson"))
+    with BCB.BCBundle(file_name, compress, block_size=200) as bundle:
+        for number in range(20):
+            bundle.add(f"BC{number}", get_bc_json(number))
+    assert len(read_lines(file_name, compress)) == 20
+    index = BCB.read_index(file_name)
+    assert index["compressed"] is compress
+    for number in range(20):
+        assert BCB.read_bc(file_name, f"BC{number}", index) == json.loads(get_bc_json(number))
+    assert BCB.read_bc(file_name, "BC99") is None
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_bundle_sample_bc(config, tmpdir, compress):
+    file_name = str(tmpdir.join("bcs.ndjson"))
+    cmap = CMAP.CxlCmap(config)
+    cmap.load()
+    bc_factory = BCF.BCFactory(cmap, config)
+    bc = bc_factory.create_bc()
+    with BCB.BCBundle(file_name, compress) as bundle:
+        bc_factory.save_bc(bc, bundle)
+    assert BCB.read_bc(file_name, bc.conceptId) == json.loads(bc.serialize_json())
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_bundle_append_replaces_bc(tmpdir, compress):
+    file_name = str(tmpdir.join("bcs.ndjson"))
+    with BCB.BCBundle(file_name, compress, block_size=100) as bundle:
+        for number in range(5):
+            bundle.add(f"BC{number}", get_bc_json(number))
+    for version in range(1, 4):
+        with BCB.BCBundle(file_name, compress, append=True) as bundle:
+            bundle.add("BC2", get_bc_json(2, version))
+    assert len(read_lines(file_name, compress)) == 5
+    assert len(BCB.read_index(file_name)["bcs"]) == 5
+    assert BCB.read_bc(file_name, "BC2")["version"] == 3
+    assert BCB.read_bc(file_name, "BC4") == json.loads(get_bc_json(4))
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_bundle_append_compress_mismatch(tmpdir, compress):
+    file_name = str(tmpdir.join("bcs.ndjson"))
+    with BCB.BCBundle(file_name, compress) as bundle:
+        bundle.add("BC1", get_bc_json(1))
+    with pytest.raises(ValueError):
+        BCB.BCBundle(file_name, not compress, append=True)
+    assert BCB.read_bc(file_name, "BC1") == json.loads(get_bc_json(1))
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_bundle_missing_index(tmpdir, compress):
+    file_name = str(tmpdir.join("bcs.ndjson"))
+    with BCB.BCBundle(file_name, compress, block_size=100) as bundle:
+        for number in range(5):
+            bundle.add(f"BC{number}", get_bc_json(number))
+    index = BCB.read_index(file_name)
+    os.remove(file_name + BCB.INDEX_FILE_EXT)
+    scanned = BCB.scan_bundle(file_name)
+    assert (scanned["compressed"], scanned["bcs"], scanned["lines"]) == (compress, index["bcs"], 5)
+    with BCB.BCBundle(file_name, compress, append=True) as bundle:
+        bundle.add("BC5", get_bc_json(5))
+    assert [BCB.read_bc(file_name, f"BC{number}")["label"] for number in range(6)] == \
+        [f"BC {number}" for number in range(6)]
@@ -0,0 +1,92 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import glob
+import cmap_cache as CC
+import cxl_load as LOAD
+from conftest import get_graph_contents
+
+"""
+CmapCache returns a cached graph only for the same CXL content, configuration and CACHE_VERSION
+"""
+
+
+def get_entries(cache_dir):
+    return glob.glob(os.path.join(cache_dir, "*" + CC.CACHE_FILE_EXT))
+
+
+def test_cache_miss_then_hit(config, tmpdir):
+    cache = CC.CmapCache(str(tmpdir.join("cache")))
+    key = cache.get_key(config)
+    assert cache.get(key, config) is None
+    cmap = LOAD.load_cmap(config, cache=cache)
+    assert len(get_entries(cache.cache_dir)) == 1
+    cached_cmap = cache.get(key, config)
+    assert cached_cmap is not cmap
+    assert cached_cmap.config is config
+    assert cached_cmap.cxl_file == config.data_file
+    assert get_graph_contents(cached_cmap) == get_graph_contents(cmap)
+
+
+def test_cache_entry_excludes_config(config, tmpdir):
+    cache = CC.CmapCache(str(tmpdir.join("cache")))
+    LOAD.load_cmap(config, cache=cache)
+    with open(get_entries(cache.cache_dir)[0], "rb") as f:
+        assert b"report_node_headers" not in f.read()
+
+
+def test_cache_key_changes(config, tmpdir, monkeypatch):
+    cache = CC.CmapCache(str(tmpdir.join("cache")))
+    key = cache.get_key(config)
+    LOAD.load_cmap(config, cache=cache)
+    config.config["skip_concept_labels"] = config.config["skip_concept_labels"] + ["Unused"]
+    assert cache.get_key(config) != key
+    with open(config.data_file, "ab") as f:
+        f.write(b"\n")
+    assert cache.get_key(config) != key
+    monkeypatch.setattr(CC, "CACHE_VERSION", CC.CACHE_VERSION + "-next")
+    config.config["skip_concept_labels"] = config.config["skip_concept_labels"][:-1]
+    with open(config.data_file, "rb+") as f:
+        f.truncate(os.path.getsize(config.data_file) - 1)
+    new_key = cache.get_key(config)
+    assert new_key != key
+    assert cache.get(new_key, config) is None
+
+
+def test_cache_unreadable_entry(config, tmpdir):
+    cache = CC.CmapCache(str(tmpdir.join("cache")))
+    key = cache.get_key(config)
+    LOAD.load_cmap(config, cache=cache)
+    with open(get_entries(cache.cache_dir)[0], "wb") as f:
+        f.write(b"not a pickle")
+    assert cache.get(key, config) is None
+    assert get_entries(cache.cache_dir) == []
+
+
+def test_cache_eviction(config, tmpdir):
+    cache = CC.CmapCache(str(tmpdir.join("cache")), max_entries=2)
+    cmap = LOAD.load_cmap(config)
+    for key in ("a", "b", "c"):
+        cache.put(key, cmap)
+    assert len(get_entries(cache.cache_dir)) == 2
+
+
+def test_cache_key_from_content(config, tmpdir):
+    cache = CC.CmapCache(str(tmpdir.join("cache")))
+    with open(config.data_file, "rb") as f:
+        assert cache.get_key(config, f.read()) == cache.get_key(config)
@@ -0,0 +1,66 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import pickle
+import bc_factory as BCF
+import compact_graph as CG
+import cxl_cmap as CMAP
+from conftest import get_graph_contents
+
+"""
+CompactGraph stores the vertexes and edges of a loaded CxlCmap in CSR arrays and must present the same graph
+"""
+
+
+def load_cmap(config):
+    """
+    :param config: configuration object for the CMAP to load
+    :return: the graph created by load
+    """
+    cmap = CMAP.CxlCmap(config)
+    cmap.load()
+    return cmap
+
+
+def test_compact_graph_sample(config):
+    cmap = load_cmap(config)
+    compact = CG.CompactGraph(cmap)
+    assert list(compact.vertexes) == list(cmap.vertexes)
+    assert len(compact.vertexes) == len(cmap.vertexes)
+    assert get_graph_contents(compact) == get_graph_contents(cmap)
+    assert [vertex.id for vertex in compact] == [vertex.id for vertex in cmap]
+
+
+def test_compact_graph_synthetic(synthetic_config):
+    cmap = load_cmap(synthetic_config)
+    compact = CG.CompactGraph(cmap)
+    assert get_graph_contents(compact) == get_graph_contents(cmap)
+    assert compact.diagnostics == cmap.diagnostics
+
+
+def test_compact_graph_bc(config):
+    cmap = load_cmap(config)
+    compact = CG.CompactGraph(cmap)
+    bc = BCF.BCFactory(cmap, config).create_bc()
+    compact_bc = BCF.BCFactory(compact, config).create_bc()
+    assert compact_bc.serialize_json() == bc.serialize_json()
+
+
+def test_compact_graph_pickle(config):
+    compact = CG.CompactGraph(load_cmap(config))
+    compact.config = None
+    assert get_graph_contents(pickle.loads(pickle.dumps(compact))) == get_graph_contents(compact)
@@ -0,0 +1,70 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import concept_parser as PARSE
+
+"""
+concept_parser reports malformed labels, short-comment attributes and long-comment CT terms as diagnostics
+"""
+
+
+def test_parse_label():
+    assert PARSE.parse_label("Systolic Blood Pressure (C0005823)") == ("Systolic Blood Pressure", "C0005823")
+    assert PARSE.parse_label("  Position ( C62122 ) ") == ("Position", "C62122")
+    assert PARSE.parse_label("Unit (C71620-001") == ("Unit", "C71620-001")
+    assert PARSE.parse_label("Result") == ("Result", None)
+    assert PARSE.parse_label("Result ()") == ("Result", None)
+
+
+def test_parse_attributes():
+    diagnostics = []
+    attrs = PARSE.parse_attributes("1", "role: qualifier.result\n\nmandatory: Yes\nnote: a: b", diagnostics)
+    assert attrs == {"role": "qualifier.result", "mandatory": "Yes", "note": "a: b"}
+    assert diagnostics == []
+
+
+def test_parse_attributes_malformed():
+    diagnostics = []
+    attrs = PARSE.parse_attributes("1", "role qualifier\n: Yes\nrole: topic", diagnostics)
+    assert attrs == {"role": "topic"}
+    assert diagnostics == [
+        PARSE.Diagnostic("1", "short-comment", "attribute is not a name: value pair", "role qualifier"),
+        PARSE.Diagnostic("1", "short-comment", "attribute is not a name: value pair", ": Yes")]
+
+
+def test_parse_attributes_reserved():
+    diagnostics = []
+    attrs = PARSE.parse_attributes("1", "c_code: C1\nconcept_name: Other\nrole: topic", diagnostics)
+    assert attrs == {"role": "topic"}
+    assert [(d.source, d.text) for d in diagnostics] == [("short-comment", "c_code: C1"),
+                                                         ("short-comment", "concept_name: Other")]
+
+
+def test_parse_subset_terms():
+    diagnostics = []
+    terms = PARSE.parse_subset_terms("1", "SITTING (C62122) default; SUPINE (C62167);; STANDING (C62166)", diagnostics)
+    assert terms == [PARSE.ParsedTerm("SITTING", "C62122", "Yes"), PARSE.ParsedTerm("SUPINE", "C62167", "No"),
+                     PARSE.ParsedTerm("STANDING", "C62166", "No")]
+    assert diagnostics == []
+
+
+def test_parse_subset_terms_malformed():
+    diagnostics = []
+    terms = PARSE.parse_subset_terms("1", "SITTING; SUPINE (); STANDING (C62166", diagnostics)
+    assert terms == []
+    assert [(d.concept_id, d.source, d.text) for d in diagnostics] == [
+        ("1", "long-comment", "SITTING"), ("1", "long-comment", "SUPINE ()"), ("1", "long-comment", "STANDING (C62166")]
@@ -0,0 +1,60 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import cxl_cmap as CMAP
+from conftest import get_graph_contents
+
+"""
+load_streaming parses the CXL file incrementally and must build the same graph as load
+"""
+
+
+def load_graphs(config):
+    """
+    :param config: configuration object for the CMAP to load
+    :return: tuple of the graphs created by load and load_streaming
+    """
+    cmap = CMAP.CxlCmap(config)
+    cmap.load()
+    streamed_cmap = CMAP.CxlCmap(config)
+    streamed_cmap.load_streaming()
+    return cmap, streamed_cmap
+
+
+def test_load_streaming_sample(config):
+    cmap, streamed_cmap = load_graphs(config)
+    assert len(cmap.vertexes) == 23
+    assert list(streamed_cmap.vertexes) == list(cmap.vertexes)
+    assert get_graph_contents(streamed_cmap) == get_graph_contents(cmap)
+
+
+def test_load_streaming_synthetic(synthetic_config):
+    cmap, streamed_cmap = load_graphs(synthetic_config)
+    assert len(cmap.vertexes) >= 300
+    assert list(streamed_cmap.vertexes) == list(cmap.vertexes)
+    assert get_graph_contents(streamed_cmap) == get_graph_contents(cmap)
+    assert streamed_cmap.diagnostics == cmap.diagnostics
+
+
+def test_load_root_and_edges(config):
+    cmap = CMAP.CxlCmap(config)
+    cmap.load()
+    roots = [vertex for vertex in cmap.vertexes.values() if vertex.is_root]
+    assert [(vertex.concept_name, vertex.c_code) for vertex in roots] == [("Systolic Blood Pressure", "BC0005823")]
+    for vertex in cmap.vertexes.values():
+        for node, link in vertex.target:
+            assert (vertex, link) in node.source
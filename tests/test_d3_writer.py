@@ -0,0 +1,103 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import json
+import cxl_cmap as CMAP
+import d3_writer as D3
+import graph_analysis as GA
+import graphml_writer as GML
+
+"""
+D3TreeWriter must include each vertex reachable from the root exactly once, even when a vertex has more than one parent
+or is part of a cycle, and D3ForceWriter must write the same links as the GraphML
+"""
+
+
+def load_cmap(config):
+    cmap = CMAP.CxlCmap(config)
+    cmap.load()
+    return cmap
+
+
+def add_cycle_and_shared_child(cmap):
+    """
+    link a leaf back to the root to create a cycle and link the root to a child of one of its children
+    :param cmap: a loaded CxlCmap
+    """
+    root = next(vertex for vertex in cmap.vertexes.values() if vertex.is_root)
+    leaf = next(vertex for vertex in cmap.vertexes.values() if not vertex.target)
+    leaf.add_target(root, "loops to")
+    root.add_source(leaf, "loops to")
+    children = {node.id for node, link in root.target}
+    grandchild = next(node for child, link in root.target for node, child_link in child.target
+                      if node.id not in children and node is not root)
+    root.add_target(grandchild, "shares")
+    grandchild.add_source(root, "shares")
+
+
+def get_tree_ids(node):
+    """
+    :param node: D3 tree node dictionary
+    :return: list of the ids of the node and all its descendants
+    """
+    ids = [node["id"]]
+    for child in node["children"]:
+        ids.extend(get_tree_ids(child))
+    return ids
+
+
+def assert_d3_outputs(cmap, tmpdir):
+    tree_file = str(tmpdir.join("tree.json"))
+    force_file = str(tmpdir.join("force.json"))
+    D3.D3TreeWriter(cmap).save_json(tree_file)
+    D3.D3ForceWriter(cmap).save_json(force_file)
+    with open(tree_file, encoding="utf-8") as f:
+        tree = json.load(f)
+    with open(force_file, encoding="utf-8") as f:
+        force = json.load(f)
+    tree_ids = get_tree_ids(tree)
+    assert len(tree_ids) == len(set(tree_ids))
+    assert set(tree_ids) == GA.GraphAnalysis(cmap).reachable_from_root()
+    graphml_writer = GML.GraphMLWriter(cmap)
+    graphml_writer.save_graphml(str(tmpdir.join("graph.graphml")))
+    assert len(force["nodes"]) == len(cmap.vertexes) == graphml_writer.node_count
+    assert len(force["links"]) == graphml_writer.edge_count
+
+
+def test_d3_sample(config, tmpdir):
+    assert_d3_outputs(load_cmap(config), tmpdir)
+
+
+def test_d3_synthetic(synthetic_config, tmpdir):
+    assert_d3_outputs(load_cmap(synthetic_config), tmpdir)
+
+
+def test_d3_cycle_and_shared_child(synthetic_config, tmpdir):
+    cmap = load_cmap(synthetic_config)
+    add_cycle_and_shared_child(cmap)
+    assert not GA.GraphAnalysis(cmap).is_acyclic()
+    assert_d3_outputs(cmap, tmpdir)
+
+
+def test_d3_tree_without_root(config, tmpdir):
+    cmap = load_cmap(config)
+    for vertex in cmap.vertexes.values():
+        vertex.is_root = False
+    tree_file = str(tmpdir.join("tree.json"))
+    D3.D3TreeWriter(cmap).save_json(tree_file)
+    with open(tree_file, encoding="utf-8") as f:
+        assert json.load(f) == {}
@@ -0,0 +1,70 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import concept_parser as PARSE
+import cxl_cmap as CMAP
+import graph_analysis as GA
+
+"""
+GraphAnalysis finds the topological order, cycles and unreachable concepts of a loaded CMAP, and analyze_cmap adds them
+to the graph's diagnostics
+"""
+
+
+def load_cmap(config):
+    cmap = CMAP.CxlCmap(config)
+    cmap.load()
+    return cmap
+
+
+def test_analyze_sample(config):
+    cmap = load_cmap(config)
+    analysis = GA.analyze_cmap(cmap)
+    assert analysis["acyclic"] and analysis["unreachable"] == []
+    order = analysis["topological_order"]
+    assert sorted(order) == sorted(cmap.vertexes)
+    position = {concept_id: number for number, concept_id in enumerate(order)}
+    for vertex in cmap.vertexes.values():
+        for node, link in vertex.target:
+            assert position[vertex.id] < position[node.id]
+    assert cmap.diagnostics == []
+
+
+def test_analyze_cycle(config):
+    cmap = load_cmap(config)
+    root = next(vertex for vertex in cmap.vertexes.values() if vertex.is_root)
+    leaf = next(vertex for vertex in cmap.vertexes.values() if not vertex.target)
+    leaf.add_target(root, "loops to")
+    root.add_source(leaf, "loops to")
+    analysis = GA.analyze_cmap(cmap)
+    assert not analysis["acyclic"]
+    assert leaf.id in analysis["cycles"][0] and root.id in analysis["cycles"][0]
+    assert analysis["cycles"][0][0] == analysis["cycles"][0][-1]
+    assert root.id not in analysis["topological_order"]
+    assert [(d.source, d.message) for d in cmap.diagnostics] == [("graph", "concepts form a cycle")]
+
+
+def test_analyze_unreachable(config):
+    cmap = load_cmap(config)
+    leaf = next(vertex for vertex in cmap.vertexes.values() if not vertex.target)
+    for parent, link in leaf.source:
+        parent.target = [(node, link) for node, link in parent.target if node is not leaf]
+    leaf.source = []
+    analysis = GA.analyze_cmap(cmap)
+    assert analysis["unreachable"] == [leaf.id]
+    assert cmap.diagnostics == [PARSE.Diagnostic(leaf.id, "graph", "concept cannot be reached from the root concept",
+                                                    leaf.label)]
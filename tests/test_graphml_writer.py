@@ -0,0 +1,62 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import pytest
+import cxl_cmap as CMAP
+import graphml_writer as GML
+import network_graph as NG
+
+nx = pytest.importorskip("networkx")
+
+"""
+GraphMLWriter writes the GraphML without networkx and must produce the same nodes and edges as the networkx graph
+"""
+
+
+def assert_same_graphml(cmap, tmpdir):
+    writer_file = str(tmpdir.join("writer.graphml"))
+    networkx_file = str(tmpdir.join("networkx.graphml"))
+    writer = GML.GraphMLWriter(cmap)
+    writer.save_graphml(writer_file)
+    network_graph = NG.NetworkGraph(cmap)
+    network_graph.save_graphml(networkx_file)
+    written = nx.read_graphml(writer_file)
+    expected = nx.read_graphml(networkx_file)
+    assert dict(written.nodes(data=True)) == dict(expected.nodes(data=True))
+    assert sorted(written.edges(data=True)) == sorted(expected.edges(data=True))
+    assert (writer.node_count, writer.edge_count) == (network_graph.node_count, network_graph.edge_count)
+    assert writer.to_string() == open(writer_file, encoding="utf-8").read()
+
+
+def test_graphml_sample(config, tmpdir):
+    cmap = CMAP.CxlCmap(config)
+    cmap.load()
+    assert_same_graphml(cmap, tmpdir)
+
+
+def test_graphml_synthetic(synthetic_config, tmpdir):
+    cmap = CMAP.CxlCmap(synthetic_config)
+    cmap.load()
+    assert_same_graphml(cmap, tmpdir)
+
+
+def test_graphml_escaping(config, tmpdir):
+    cmap = CMAP.CxlCmap(config)
+    cmap.load()
+    vertex = next(iter(cmap.vertexes.values()))
+    vertex.label = 'Result < 5 & "low"\n\tline'
+    assert_same_graphml(cmap, tmpdir)
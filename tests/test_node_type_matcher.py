@@ -0,0 +1,78 @@
+"""
+Copyright (c) 2020 Sam Hume
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import itertools
+import node_type as NT
+import node_type_matcher as NTM
+
+"""
+NodeTypeMatcher must select the same node type as testing each node type rule in config file order
+"""
+
+
+def match_rules_in_order(node_types, unknown_node_type, background_color, border_color, border_shape):
+    """
+    the node type matching the matcher replaced: the first rule whose set appearance values equal the concept values
+    """
+    for node in node_types:
+        if not ((border_color is not None and node.border_color is not None and border_color != node.border_color) or
+                (background_color is not None and node.background_color is not None and
+                 background_color != node.background_color) or
+                (border_shape is not None and node.border_shape is not None and border_shape != node.border_shape)):
+            return node
+    return unknown_node_type
+
+
+def get_appearances(node_types):
+    """
+    :param node_types: list of node type objects
+    :return: every combination of the rule values, no value and a value no rule uses for each appearance attribute
+    """
+    values = [sorted({getattr(node, attribute) for node in node_types} - {None}) + [None, "unused"]
+              for attribute in ("background_color", "border_color", "border_shape")]
+    return list(itertools.product(*values))
+
+
+def assert_same_matches(node_types, unknown_node_type):
+    matcher = NTM.NodeTypeMatcher(node_types, unknown_node_type)
+    for appearance in get_appearances(node_types):
+        expected = match_rules_in_order(node_types, unknown_node_type, *appearance)
+        assert matcher.match(*appearance) is expected, appearance
+        assert matcher.match(*appearance) is expected, appearance       # resolved from the matches already found
+
+
+def test_config_node_types(config):
+    assert_same_matches(config.node_types, config.unknown_node_type)
+    assert config.get_concept_type("255,255,150,255", "0,0,0,255", "rectangle").name == "dec"
+    assert config.get_concept_type(None, "255,0,0,255", None).name == "root_concept"
+
+
+def test_overlapping_node_types(config):
+    node_types = [NT.NodeType("a", "A", background_color="1", border_color="x"),
+                  NT.NodeType("b", "B", background_color="1"),
+                  NT.NodeType("c", "C", border_shape="oval"),
+                  NT.NodeType("d", "D", background_color="2", border_color="x", border_shape="oval"),
+                  NT.NodeType("e", "E"),
+                  NT.NodeType("f", "F", background_color="2")]
+    assert_same_matches(node_types, config.unknown_node_type)
+    assert_same_matches(node_types[:4], config.unknown_node_type)
+
+
+def test_no_node_types(config):
+    matcher = NTM.NodeTypeMatcher([], config.unknown_node_type)
+    assert matcher.match("1", "x", "oval") is config.unknown_node_type
+    assert matcher.match() is config.unknown_node_type